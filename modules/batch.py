@@ -0,0 +1,153 @@
+"""Runs several coffee clubs in one process, sharing the storage connection
+and worker pool between them, and stores a summary of every club's run.
+
+The manifest is a JSON file listing the clubs:
+
+    {
+        "clubs": [
+            {"name": "engineering", "workbook": "/data/Engineering.xlsx", "sheet": "Export View", "history": "clubs/engineering/"},
+            {"name": "sales", "workbook": "/data/Sales.xlsx"}
+        ]
+    }
+
+Only name and workbook are required. sheet defaults to excelSheet, history
+(the prefix the club's history is stored under) to 'clubs/<name>/', and a
+club may also name its own Azure "container" and local "folder".
+
+    python batch.py manifest.json
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from classes.club import Club
+from config import batchSummaryPath, excelSheet, MAX_ATTEMPTS, WORKERS
+from datamgmt.storage import get_storage, set_storage
+from matching.pool import set_executor
+from run import funcRun
+
+
+def loadManifest(path : str) -> list:
+    """Reads the clubs listed in the manifest at path.
+
+    Returns:
+    --------
+    list
+        a Club for each entry, in order
+    """
+
+    with open(path, 'r', encoding='utf-8') as f:
+        manifest = json.load(f)
+
+    clubs = []
+    for entry in manifest['clubs']:
+        clubs.append(Club.inFolder(
+            entry['name'],
+            entry['workbook'],
+            entry.get('sheet', excelSheet),
+            entry.get('history'),
+            entry.get('container'),
+            entry.get('folder')
+        ))
+    return clubs
+
+def runClub(club : Club, attempts : int = MAX_ATTEMPTS) -> dict:
+    """Runs one club's week with run.funcRun against the club's view of the
+    shared storage. A failure is recorded in the summary rather than raised,
+    so one club cannot stop the rest of the batch.
+
+    Returns:
+    --------
+    dict
+        the club's name, whether it succeeded, the seconds taken and, if it
+        succeeded, the metrics recorded, otherwise the error
+    """
+
+    backend = get_storage()
+    set_storage(club.storage(backend))
+    start = time.perf_counter()
+    summary = {'club': club.name, 'success': False}
+    try:
+        metrics = funcRun(attempts, club)
+    except Exception as e:
+        summary['error'] = f'{type(e).__name__}: {e}'
+    else:
+        summary['success'] = True
+        summary['metrics'] = metrics.serialize()
+    finally:
+        set_storage(backend)
+    summary['seconds'] = time.perf_counter() - start
+    return summary
+
+def runBatch(clubs : list, workers : int = WORKERS, summaryPath : str = batchSummaryPath, attempts : int = MAX_ATTEMPTS) -> dict:
+    """Runs every club in turn in this process, so the imports, the storage
+    connection and the worker pool used by the 'parallel' and 'sharded'
+    matchers are set up once for the whole batch, then stores the summary.
+
+    Parameters:
+    -----------
+    clubs : list
+        Club for each club to run
+    workers : int = WORKERS
+        number of worker processes shared by the clubs, defaulting to the
+        number of CPUs; the processes are only started if a club needs them
+    summaryPath : str = batchSummaryPath
+        path to store the summary as JSON; None to skip
+    attempts : int = MAX_ATTEMPTS
+        attempts each club gets, as for run.funcRun
+
+    Returns:
+    --------
+    dict
+        'clubs' holds each club's summary and 'aggregate' the totals across
+        them
+    """
+
+    started = time.time()
+    start = time.perf_counter()
+    executor = ProcessPoolExecutor(max_workers=workers)
+    set_executor(executor)
+    try:
+        summaries = [runClub(club, attempts) for club in clubs]
+    finally:
+        set_executor(None)
+        executor.shutdown(cancel_futures=True)
+
+    succeeded = [summary for summary in summaries if summary['success']]
+    summary = {
+        'started': started,
+        'clubs': summaries,
+        'aggregate': {
+            'clubs': len(summaries),
+            'succeeded': len(succeeded),
+            'failed': len(summaries) - len(succeeded),
+            'participants': sum(club['metrics']['values'].get('participants', 0) for club in succeeded),
+            'retries': sum(club['metrics']['counts'].get('retries', 0) for club in succeeded),
+            'seconds': time.perf_counter() - start
+        }
+    }
+
+    if summaryPath is not None:
+        os.makedirs(os.path.dirname(summaryPath) or '.', exist_ok=True)
+        with open(summaryPath, 'w', encoding='utf-8') as f:
+            json.dump(summary, f, indent=4)
+    return summary
+
+def main(argv : list = None) -> int:
+    parser = argparse.ArgumentParser(description='Runs the coffee clubs listed in a manifest in one process.')
+    parser.add_argument('manifest', help='JSON manifest listing the clubs')
+    parser.add_argument('--workers', type=int, default=WORKERS, help='worker processes shared by the clubs')
+    parser.add_argument('--summary', default=batchSummaryPath, help='path to store the summary as JSON')
+    args = parser.parse_args(argv)
+
+    summary = runBatch(loadManifest(args.manifest), args.workers, args.summary)
+    for club in summary['clubs']:
+        print(f'{club["club"]:24} {"ok" if club["success"] else club["error"]} {club["seconds"]:.2f}s')
+    return 0 if summary['aggregate']['failed'] == 0 else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
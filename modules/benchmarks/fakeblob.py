@@ -0,0 +1,263 @@
+import itertools
+import threading
+from email.utils import formatdate
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs
+
+# The well known key of the Azurite emulator; the fake does not check it
+emulatorKey = 'Eby8vdM02xNOcqFlqUwJPLlmEtlCDXJ1OUzFT50uSRZ6IFsuFq2UVErCz4I6tq/K1SZFPTOtr/KBHBeksoGMGw=='
+
+
+class FakeBlobStore():
+    """In-process stand in for Azure Blob Storage, serving the parts of the
+    REST API that datamgmt.blob uses (block and append blobs, ETag and
+    append position conditions, sealing, listing and ranged reads) from
+    memory on a loopback port, so the real SDK can be exercised offline.
+
+    Attributes:
+    -----------
+    blobs : dict
+        (container, name) mapped to a dict of the blob's data, etag and type
+    containers : set
+        names of the containers created
+    requests : int
+        number of requests served
+
+    Methods:
+    --------
+    start() -> str
+        Starts serving and returns a connection string for the store.
+    stop() -> None
+        Stops serving.
+    clear() -> None
+        Deletes every blob.
+    """
+
+    def __init__(self):
+        self.blobs = {}
+        self.containers = set()
+        self.requests = 0
+        self._etags = itertools.count(1)
+        self._lock = threading.Lock()
+        self._server = None
+
+    def start(self) -> str:
+        """Starts serving on a free loopback port and returns a connection
+        string for it, to pass to datamgmt.blob.BlobClients.
+        """
+
+        class Handler(_Handler):
+            store = self
+
+        self._server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        port = self._server.server_address[1]
+        return f'DefaultEndpointsProtocol=http;AccountName=devstoreaccount1;AccountKey={emulatorKey};BlobEndpoint=http://127.0.0.1:{port}/devstoreaccount1;'
+
+    def stop(self) -> None:
+        """Stops serving."""
+
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def clear(self) -> None:
+        """Deletes every blob, keeping the containers."""
+
+        with self._lock:
+            self.blobs.clear()
+
+    def newEtag(self) -> str:
+        """Returns a new, unique ETag."""
+
+        return '"0x%X"' % next(self._etags)
+
+
+class _Handler(BaseHTTPRequestHandler):
+    """Serves requests for the FakeBlobStore in store."""
+
+    protocol_version = 'HTTP/1.1'
+    # Keep-alive responses are small; with Nagle's algorithm on they wait for
+    # the client's delayed ACK, adding ~40 ms to every request
+    disable_nagle_algorithm = True
+    store = None
+
+    def log_message(self, *args) -> None:
+        pass
+
+    def _send(self, code : int, body : bytes = b'', headers : dict = None, error : str = None) -> None:
+        self.send_response(code)
+        self.send_header('x-ms-request-id', '0')
+        self.send_header('x-ms-version', '2021-04-10')
+        self.send_header('Date', formatdate(usegmt=True))
+        if error is not None:
+            self.send_header('x-ms-error-code', error)
+            if self.command != 'HEAD':
+                self.send_header('Content-Type', 'application/xml')
+            if not body:
+                body = f'<?xml version="1.0" encoding="utf-8"?><Error><Code>{error}</Code><Message>{error}</Message></Error>'.encode('utf-8')
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        if self.command != 'HEAD':
+            self.wfile.write(body)
+
+    def _parts(self) -> tuple:
+        """Returns (container, name, query) for the request's path style url."""
+
+        url = urlparse(self.path)
+        parts = url.path.strip('/').split('/', 2)
+        container = parts[1] if len(parts) > 1 else None
+        name = parts[2] if len(parts) > 2 else None
+        return container, name, parse_qs(url.query)
+
+    def _body(self) -> bytes:
+        length = int(self.headers.get('Content-Length') or 0)
+        return self.rfile.read(length) if length else b''
+
+    def _condition(self, blob : dict) -> int:
+        """Returns the status code for a failed If-Match or If-None-Match
+        header, or None if the request may go ahead.
+        """
+
+        ifMatch = self.headers.get('If-Match')
+        ifNoneMatch = self.headers.get('If-None-Match')
+        if ifMatch is not None and (blob is None or (ifMatch != '*' and ifMatch != blob['etag'])):
+            return 412
+        if ifNoneMatch is not None and blob is not None:
+            if ifNoneMatch == '*':
+                return 409 if self.command == 'PUT' else 412
+            if ifNoneMatch == blob['etag']:
+                return 304 if self.command in ('GET', 'HEAD') else 412
+        return None
+
+    def _properties(self, blob : dict) -> dict:
+        return {
+            'ETag': blob['etag'],
+            'Last-Modified': formatdate(usegmt=True),
+            'x-ms-blob-type': blob['type'],
+            'Content-Type': 'application/octet-stream'
+        }
+
+    def do_PUT(self) -> None:
+        store = self.store
+        container, name, query = self._parts()
+        body = self._body()
+        with store._lock:
+            store.requests += 1
+            if name is None:
+                if container in store.containers:
+                    return self._send(409, error='ContainerAlreadyExists')
+                store.containers.add(container)
+                return self._send(201, headers={'ETag': store.newEtag(), 'Last-Modified': formatdate(usegmt=True)})
+            if container not in store.containers:
+                return self._send(404, error='ContainerNotFound')
+
+            blob = store.blobs.get((container, name))
+            condition = self._condition(blob)
+            if condition == 409:
+                return self._send(409, error='BlobAlreadyExists')
+            if condition is not None:
+                return self._send(condition, error='ConditionNotMet')
+
+            comp = query.get('comp', [None])[0]
+            position = self.headers.get('x-ms-blob-condition-appendpos')
+            if comp in ('appendblock', 'seal'):
+                if blob is None:
+                    return self._send(404, error='BlobNotFound')
+                if position is not None and int(position) != len(blob['data']):
+                    return self._send(412, error='AppendPositionConditionNotMet')
+            if comp == 'seal':
+                blob['sealed'] = True
+                return self._send(200, headers={'ETag': blob['etag'], 'Last-Modified': formatdate(usegmt=True), 'x-ms-blob-sealed': 'true'})
+            if comp == 'appendblock':
+                if blob.get('sealed'):
+                    return self._send(409, error='BlobIsSealed')
+                offset = len(blob['data'])
+                blob['data'] += body
+                blob['etag'] = store.newEtag()
+                return self._send(201, headers={'ETag': blob['etag'], 'Last-Modified': formatdate(usegmt=True), 'x-ms-blob-append-offset': str(offset), 'x-ms-blob-committed-block-count': '1'})
+            if comp is not None:
+                return self._send(204)
+
+            blobType = self.headers.get('x-ms-blob-type', 'BlockBlob')
+            blob = {'data': body if blobType == 'BlockBlob' else b'', 'etag': store.newEtag(), 'type': blobType}
+            store.blobs[(container, name)] = blob
+            return self._send(201, headers={'ETag': blob['etag'], 'Last-Modified': formatdate(usegmt=True)})
+
+    def do_GET(self) -> None:
+        store = self.store
+        container, name, query = self._parts()
+        with store._lock:
+            store.requests += 1
+            if name is None and query.get('comp') == ['list']:
+                prefix = query.get('prefix', [''])[0]
+                items = ''
+                for (blobContainer, blobName), blob in sorted(store.blobs.items()):
+                    if blobContainer == container and blobName.startswith(prefix):
+                        items += f'<Blob><Name>{blobName}</Name><Properties><Content-Length>{len(blob["data"])}</Content-Length><BlobType>{blob["type"]}</BlobType><Etag>{blob["etag"]}</Etag></Properties></Blob>'
+                body = f'<?xml version="1.0" encoding="utf-8"?><EnumerationResults ContainerName="{container}"><Blobs>{items}</Blobs><NextMarker/></EnumerationResults>'.encode('utf-8')
+                return self._send(200, body, {'Content-Type': 'application/xml'})
+
+            blob = store.blobs.get((container, name))
+            if blob is None:
+                return self._send(404, error='BlobNotFound')
+            condition = self._condition(blob)
+            if condition == 304:
+                return self._send(304, headers={'ETag': blob['etag']})
+            if condition is not None:
+                return self._send(condition, error='ConditionNotMet')
+
+            data = blob['data']
+            headers = self._properties(blob)
+            requested = self.headers.get('x-ms-range') or self.headers.get('Range')
+            if not requested:
+                return self._send(200, data, headers)
+            if len(data) == 0:
+                return self._send(416, headers={'Content-Range': 'bytes */0'}, error='InvalidRange')
+            start, end = requested.split('=')[1].split('-')
+            start = int(start)
+            end = min(int(end), len(data) - 1) if end else len(data) - 1
+            headers['Content-Range'] = f'bytes {start}-{end}/{len(data)}'
+            return self._send(206, data[start:end + 1], headers)
+
+    def do_HEAD(self) -> None:
+        store = self.store
+        container, name, query = self._parts()
+        with store._lock:
+            store.requests += 1
+            if name is None:
+                if container in store.containers:
+                    return self._send(200, headers={'ETag': '"0x0"', 'Last-Modified': formatdate(usegmt=True)})
+                return self._send(404, error='ContainerNotFound')
+
+            blob = store.blobs.get((container, name))
+            if blob is None:
+                return self._send(404, error='BlobNotFound')
+            condition = self._condition(blob)
+            if condition is not None:
+                return self._send(condition, headers={'ETag': blob['etag']})
+
+            self.send_response(200)
+            for key, value in self._properties(blob).items():
+                self.send_header(key, value)
+            self.send_header('x-ms-request-id', '0')
+            self.send_header('x-ms-blob-content-length', str(len(blob['data'])))
+            self.send_header('Content-Length', str(len(blob['data'])))
+            self.end_headers()
+
+    def do_DELETE(self) -> None:
+        store = self.store
+        container, name, query = self._parts()
+        with store._lock:
+            store.requests += 1
+            blob = store.blobs.get((container, name))
+            if blob is None:
+                return self._send(404, error='BlobNotFound')
+            condition = self._condition(blob)
+            if condition is not None:
+                return self._send(condition, error='ConditionNotMet')
+            del store.blobs[(container, name)]
+            return self._send(202)
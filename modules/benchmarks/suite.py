@@ -0,0 +1,665 @@
+"""Benchmarks every stage of the pipeline on seeded synthetic rosters, offline
+against a FakeBlobStore and a temporary folder, and stores the timings as
+JSON so that runs can be compared.
+
+Run from the modules folder:
+
+    python -m benchmarks.suite --out before.json
+    python -m benchmarks.suite --out after.json --compare before.json
+
+Pass --memory to also measure the memory held by the people and meeting graph
+of a club, which is compared in the same way.
+"""
+import argparse
+import importlib
+import json
+import logging
+import os
+import platform
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from random import Random
+
+import config
+from benchmarks.fakeblob import FakeBlobStore
+
+SIZES = [10, 100, 1000, 10000, 50000]
+DEPTHS = [0, 4, 16]
+# Stages which list everyone's yet to meet pool (the greedy matcher and the
+# report) take time growing with the square of the roster, and the history
+# stages with the number of meetings, so those stages are only run up to
+# these sizes. The blossom matcher is slower again, at around O(n^3) in the
+# worst case
+CLUB_LIMIT = 5000
+MATCH_LIMIT = 2000
+GRAPH_LIMIT = 10000
+
+benchmarks = []
+
+
+def benchmark(name : str, limit : int = None, history : bool = False):
+    """Registers the decorated setup function as a benchmark. The setup is
+    called (untimed) before each repeat with (suite, size, depth) and returns
+    the function to time.
+
+    Parameters:
+    -----------
+    name : str
+        name the results are stored under
+    limit : int = None
+        largest roster to run on
+    history : bool = False
+        run once for each history depth, rather than only with no history
+    """
+
+    def register(setup):
+        benchmarks.append({'name': name, 'setup': setup, 'limit': limit, 'history': history})
+        return setup
+    return register
+
+
+class Suite():
+    """Temporary folder, fake blob store and synthetic data shared by the
+    benchmarks.
+
+    Attributes:
+    -----------
+    folder : str
+        temporary folder the config paths are pointed at
+    store : FakeBlobStore
+        blob store the datamgmt.blob clients are pointed at, or None when
+        running against a MemoryStorage
+    seed : int
+        seed for every synthetic roster and history
+
+    Methods:
+    --------
+    roster(size : int) -> list
+        Returns (name, guid) tuples for a roster of size people.
+    rosterFile(size : int) -> str
+        Returns the path of an Excel book holding the roster.
+    graph(size : int, depth : int) -> MeetingGraph
+        Returns a graph where everyone has met depth others.
+    backUp(size : int, depth : int) -> list
+        Returns the history in the matches.json backup format.
+    club(size : int, depth : int) -> tuple
+        Returns (coffeeClub, graph) ready to be matched.
+    pairing(size : int) -> Pairing
+        Returns a Pairing of the roster in order.
+    matchedClub(size : int, depth : int) -> tuple
+        Returns (coffeeClub, matched) ready to be reported on.
+    clearStore() -> None
+        Deletes everything in the storage backend.
+    seedHistory(size : int, depth : int) -> None
+        Stores the history as a snapshot in the storage backend.
+    """
+
+    def __init__(self, seed : int = 0, storage : str = 'fake'):
+        self.seed = seed
+        self.folder = tempfile.mkdtemp(prefix='coffeeBenchmark')
+        self.store = None
+        self._rosterFiles = {}
+        configure(self.folder)
+
+        from datamgmt.storage import set_storage, AzureStorage, MemoryStorage
+
+        if storage == 'memory':
+            set_storage(MemoryStorage())
+            return
+
+        from datamgmt.blob import BlobClients, set_clients
+
+        self.store = FakeBlobStore()
+        set_clients(BlobClients(connectionString=self.store.start()))
+        set_storage(AzureStorage())
+
+    def close(self) -> None:
+        """Stops the blob store and deletes the temporary folder."""
+
+        if self.store is not None:
+            from datamgmt.blob import get_clients
+
+            get_clients().close()
+            self.store.stop()
+        shutil.rmtree(self.folder, ignore_errors=True)
+
+    def clearStore(self) -> None:
+        """Deletes everything in the storage backend."""
+
+        from datamgmt.storage import set_storage, MemoryStorage
+
+        if self.store is not None:
+            self.store.clear()
+        else:
+            set_storage(MemoryStorage())
+
+    def roster(self, size : int) -> list:
+        """Returns (name, guid) tuples for a roster of size people."""
+
+        rng = Random(self.seed)
+        return [('Person ' + str(i), '%032x' % rng.getrandbits(128)) for i in range(size)]
+
+    def rosterFile(self, size : int) -> str:
+        """Returns the path of an Excel book holding the roster, with a
+        quarter of the people opted out, writing it the first time.
+        """
+
+        if size in self._rosterFiles:
+            return self._rosterFiles[size]
+
+        import pandas as pd
+
+        rng = Random(self.seed)
+        roster = self.roster(size)
+        df = pd.DataFrame({
+            config.guidColumn: [guid for _, guid in roster],
+            config.nameColumn: [name for name, _ in roster],
+            config.optedOutColumn: [rng.random() < 0.25 for _ in roster]
+        })
+        path = os.path.join(self.folder, f'roster{size}.xlsx')
+        df.to_excel(path, sheet_name=config.excelSheet, index=False)
+        self._rosterFiles[size] = path
+        return path
+
+    def useRoster(self, size : int) -> None:
+        """Makes the roster the source Excel book, as read by buildLists."""
+
+        shutil.copyfile(self.rosterFile(size), config.excelPath)
+
+    def graph(self, size : int, depth : int):
+        """Returns a graph where everyone has met the depth people nearest
+        them in a ring of the roster.
+        """
+
+        from classes.graph import MeetingGraph
+
+        graph = MeetingGraph(size)
+        roster = self.roster(size)
+        for name, guid in roster:
+            graph.addPerson(name, guid)
+        for a in range(size):
+            for step in range(1, min(depth, size - 1) // 2 + 1):
+                graph.addMeeting(a, (a + step) % size)
+                graph.addMeeting(a, (a - step) % size)
+        graph.clearChanges()
+        return graph
+
+    def backUp(self, size : int, depth : int) -> list:
+        """Returns the same history as graph in the matches.json format,
+        without building the graph.
+        """
+
+        roster = self.roster(size)
+        backUp = []
+        for a, (name, guid) in enumerate(roster):
+            met = set()
+            for step in range(1, min(depth, size - 1) // 2 + 1):
+                met.add(roster[(a + step) % size][0])
+                met.add(roster[(a - step) % size][0])
+            backUp.append({'name': name, 'guid': guid, 'alreadyMet': sorted(met)})
+        return backUp
+
+    def club(self, size : int, depth : int) -> tuple:
+        """Returns (coffeeClub, graph) for everyone in the roster with the
+        history from graph.
+        """
+
+        from main import buildClub
+
+        graph = self.graph(size, depth)
+        return buildClub(self.roster(size), graph), graph
+
+    def pairing(self, size : int):
+        """Returns a Pairing of the roster in order, with a triple if odd."""
+
+        from classes.pairing import Pairing
+
+        names = [name for name, _ in self.roster(size)]
+        matched = Pairing()
+        for i in range(0, size - 1, 2):
+            matched.addGroup(names[i], names[i + 1])
+        if size % 2 == 1 and len(matched) > 0:
+            matched.addToGroup(len(matched) - 1, names[-1])
+        return matched
+
+    def matchedClub(self, size : int, depth : int) -> tuple:
+        """Returns (coffeeClub, matched) with everyone placed by pairing, for
+        the report, leaving the last person unmatched.
+        """
+
+        coffeeClub, _ = self.club(size, depth)
+        matched = self.pairing(size - 1)
+        for name in coffeeClub.keys():
+            coffeeClub[name].matched = matched.isPlaced(name)
+        return coffeeClub, matched
+
+    def seedHistory(self, size : int, depth : int) -> None:
+        """Stores the history as a fresh snapshot in the blob store, with an
+        empty local cache.
+        """
+
+        from datamgmt.history import compactHistory
+
+        self.clearStore()
+        shutil.rmtree(config.historyCachePath, ignore_errors=True)
+        compactHistory(self.graph(size, depth))
+
+
+def configure(folder : str) -> None:
+    """Points every path in config at folder and runs against blob storage.
+    Must be called before the rest of the pipeline is imported, as modules
+    copy these values when they are imported.
+    """
+
+    for path in ['csvPath', 'peoplePath', 'historyCachePath']:
+        setattr(config, path, os.path.join(folder, path[:-4]) + '/')
+        os.makedirs(getattr(config, path), exist_ok=True)
+    config.excelPath = os.path.join(folder, 'Data.xlsx')
+    config.rosterCachePath = os.path.join(folder, 'rosterCache.pkl')
+    config.testReportPath = os.path.join(folder, 'testReport_{}_weeks.json')
+    config.schedulePath = os.path.join(folder, 'schedule.json')
+    config.backUpCachePath = os.path.join(folder, 'matchesCache.json')
+    config.historyDbPath = os.path.join(folder, 'history.db')
+    config.runStatePath = os.path.join(folder, 'runState.pkl')
+    config.LOCAL = False
+
+
+@benchmark('extract.extractExcel')
+def extractExcelBenchmark(suite : Suite, size : int, depth : int):
+    from datamgmt.extract import extractExcel
+
+    path = suite.rosterFile(size)
+    return lambda: extractExcel(path, cachePath=None)
+
+@benchmark('extract.extractExcel.cached')
+def extractExcelCachedBenchmark(suite : Suite, size : int, depth : int):
+    from datamgmt.extract import extractExcel
+
+    path = suite.rosterFile(size)
+    cachePath = os.path.join(suite.folder, 'benchmarkCache.pkl')
+    extractExcel(path, cachePath=cachePath)
+    return lambda: extractExcel(path, cachePath=cachePath)
+
+@benchmark('extract.streamNames')
+def streamNamesBenchmark(suite : Suite, size : int, depth : int):
+    from datamgmt.extract import streamNames
+
+    path = suite.rosterFile(size)
+    return lambda: list(streamNames(path))
+
+@benchmark('support.getNames')
+def getNamesBenchmark(suite : Suite, size : int, depth : int):
+    from datamgmt.extract import extractExcel
+    from support import getNames
+
+    df = extractExcel(suite.rosterFile(size), cachePath=None)
+    return lambda: getNames(df)
+
+@benchmark('main.buildLists', limit=CLUB_LIMIT, history=True)
+def buildListsBenchmark(suite : Suite, size : int, depth : int):
+    from classes.graph import MeetingGraph
+    from main import buildLists
+
+    suite.useRoster(size)
+    suite.seedHistory(size, depth)
+    return lambda: buildLists(graph=MeetingGraph())
+
+@benchmark('main.randMatch', limit=CLUB_LIMIT, history=True)
+def randMatchBenchmark(suite : Suite, size : int, depth : int):
+    from classes.pairing import Pairing
+    from main import randMatch
+
+    coffeeClub, _ = suite.club(size, depth)
+    matched = Pairing()
+    def run():
+        for name in coffeeClub.keys():
+            randMatch(coffeeClub=coffeeClub, name1=name, match=matched)
+    return run
+
+@benchmark('main.blossomMatch', limit=MATCH_LIMIT, history=True)
+def blossomMatchBenchmark(suite : Suite, size : int, depth : int):
+    from main import blossomMatch
+
+    coffeeClub, _ = suite.club(size, depth)
+    return lambda: blossomMatch(coffeeClub, seed=suite.seed)
+
+@benchmark('support.addExtras', limit=CLUB_LIMIT, history=True)
+def addExtrasBenchmark(suite : Suite, size : int, depth : int):
+    from classes.pairing import Pairing
+    from main import blossomMatch
+    from support import addExtras
+
+    coffeeClub, _ = suite.club(size, depth)
+    leftOver = max(1, size // 20)
+    names = list(coffeeClub.keys())
+    matched = blossomMatch({name: coffeeClub[name] for name in names[:-leftOver]}, Pairing(), seed=suite.seed)
+    return lambda: addExtras(coffeeClub, matched)
+
+@benchmark('main.runMatch', limit=MATCH_LIMIT, history=True)
+def runMatchBenchmark(suite : Suite, size : int, depth : int):
+    from main import runMatch
+
+    suite.useRoster(size)
+    suite.seedHistory(size, depth)
+    return lambda: runMatch(matcher='blossom')
+
+@benchmark('main.runMatch.incremental', limit=GRAPH_LIMIT, history=True)
+def runMatchIncrementalBenchmark(suite : Suite, size : int, depth : int):
+    import main
+
+    suite.useRoster(size)
+    suite.seedHistory(size, depth)
+    if os.path.isfile(config.runStatePath):
+        os.remove(config.runStatePath)
+
+    def run():
+        main.INCREMENTAL = True
+        try:
+            main.runMatch(matcher='blossom')
+        finally:
+            main.INCREMENTAL = False
+
+    # The first week keeps the state; the weeks timed start from it
+    run()
+    return run
+
+@benchmark('support.matchReport', limit=CLUB_LIMIT)
+def matchReportBenchmark(suite : Suite, size : int, depth : int):
+    from support import matchReport
+
+    coffeeClub, matched = suite.matchedClub(size, depth)
+    return lambda: matchReport(coffeeClub, matched)
+
+@benchmark('store.storeMatchReport', limit=CLUB_LIMIT)
+def storeMatchReportBenchmark(suite : Suite, size : int, depth : int):
+    from datamgmt.store import storeMatchReport
+
+    coffeeClub, matched = suite.matchedClub(size, depth)
+    return lambda: storeMatchReport(coffeeClub, matched, 0, False)
+
+@benchmark('store.saveMatchedCsv')
+def saveMatchedCsvBenchmark(suite : Suite, size : int, depth : int):
+    from datamgmt.store import saveMatchedCsv
+
+    matched = suite.pairing(size)
+    return lambda: saveMatchedCsv(matched, 0)
+
+@benchmark('store.saveMatchedExcel')
+def saveMatchedExcelBenchmark(suite : Suite, size : int, depth : int):
+    from datamgmt.store import saveMatchedExcel
+
+    guids = dict(suite.roster(size))
+    rows = []
+    for group in suite.pairing(size):
+        row = {}
+        for letter, name in zip('ABC', group):
+            row['Participant' + letter] = name
+            row['GUID_Participant' + letter] = guids[name]
+        rows.append(row)
+    return lambda: saveMatchedExcel(rows)
+
+@benchmark('history.loadHistory', limit=GRAPH_LIMIT, history=True)
+def loadHistoryBenchmark(suite : Suite, size : int, depth : int):
+    from classes.graph import MeetingGraph
+    from datamgmt.history import loadHistory
+
+    suite.seedHistory(size, depth)
+    return lambda: loadHistory(MeetingGraph(size), cachePath=None)
+
+@benchmark('history.appendHistory', limit=GRAPH_LIMIT, history=True)
+def appendHistoryBenchmark(suite : Suite, size : int, depth : int):
+    from classes.graph import MeetingGraph
+    from datamgmt.history import loadHistory, appendHistory
+
+    suite.seedHistory(size, depth)
+    graph = MeetingGraph(size)
+    loadHistory(graph)
+    _meetWeek(graph, size, depth)
+    return lambda: appendHistory(graph, 'benchmark')
+
+@benchmark('database.loadLocalHistory', limit=GRAPH_LIMIT, history=True)
+def loadLocalHistoryBenchmark(suite : Suite, size : int, depth : int):
+    from classes.graph import MeetingGraph
+    from datamgmt.database import loadLocalHistory, storeLocalHistory, clearLocalHistory
+
+    clearLocalHistory()
+    graph = suite.graph(size, depth)
+    graph.version = None
+    _meetAll(graph)
+    storeLocalHistory(graph, 'benchmark')
+    return lambda: loadLocalHistory(MeetingGraph(size))
+
+@benchmark('database.storeLocalHistory', limit=GRAPH_LIMIT, history=True)
+def storeLocalHistoryBenchmark(suite : Suite, size : int, depth : int):
+    from classes.graph import MeetingGraph
+    from datamgmt.database import loadLocalHistory, storeLocalHistory, clearLocalHistory
+
+    clearLocalHistory()
+    seeded = suite.graph(size, depth)
+    _meetAll(seeded)
+    storeLocalHistory(seeded, 'seed')
+    graph = MeetingGraph(size)
+    loadLocalHistory(graph)
+    _meetWeek(graph, size, depth)
+    return lambda: storeLocalHistory(graph, 'benchmark')
+
+@benchmark('extract.getBackUp', history=True)
+def getBackUpBenchmark(suite : Suite, size : int, depth : int):
+    from datamgmt.extract import getBackUp
+    from datamgmt.store import storeBackUp
+
+    suite.clearStore()
+    storeBackUp(suite.backUp(size, depth))
+    return lambda: getBackUp(cachePath=None)
+
+@benchmark('store.storeBackUp', history=True)
+def storeBackUpBenchmark(suite : Suite, size : int, depth : int):
+    from datamgmt.store import storeBackUp
+
+    suite.clearStore()
+    backUp = suite.backUp(size, depth)
+    return lambda: storeBackUp(backUp)
+
+
+def _meetWeek(graph, size : int, depth : int) -> None:
+    """Records one more week of meetings, with the next person out in the
+    ring, as a matched week would.
+    """
+
+    step = min(depth, size - 1) // 2 + 1
+    if step >= size:
+        return
+    for a in range(0, size - step, 2 * step):
+        graph.addMeeting(a, a + step)
+        graph.addMeeting(a + step, a)
+
+def _meetAll(graph) -> None:
+    """Records everyone's history in graph as changes, so that it is all
+    written by the next store.
+    """
+
+    for a in range(len(graph)):
+        names = graph.alreadyMet(a)
+        graph.resetPerson(a)
+        for name in names:
+            graph.addMeeting(a, graph.idOf(name))
+
+def measureMemory(suite : Suite, sizes : list = SIZES, depths : list = DEPTHS) -> list:
+    """Measures the memory held by the people and meeting graph of a club,
+    for each size and depth, with tracemalloc.
+
+    Returns:
+    --------
+    list
+        a result for each size and depth, with the bytes held in total and
+        per person
+    """
+
+    # Import main before tracing starts, so the import is not counted
+    importlib.import_module('main')
+
+    results = []
+    for size in sizes:
+        for depth in depths:
+            tracemalloc.start()
+            try:
+                club = suite.club(size, depth)
+                held = tracemalloc.get_traced_memory()[0]
+            finally:
+                tracemalloc.stop()
+            del club
+
+            result = {'benchmark': 'memory.club', 'size': size, 'depth': depth, 'bytes': held, 'perPerson': held / size}
+            results.append(result)
+            print(_describe(result), file=sys.stderr, flush=True)
+    return results
+
+def runBenchmarks(suite : Suite, sizes : list = SIZES, depths : list = DEPTHS, repeat : int = 3, only : str = None) -> list:
+    """Runs every registered benchmark for each size (and each depth, for
+    those that use history) up to the benchmark's limit.
+
+    Parameters:
+    -----------
+    suite : Suite
+        shared folder, blob store and synthetic data
+    sizes : list = SIZES
+        roster sizes to run
+    depths : list = DEPTHS
+        number of people everyone has already met
+    repeat : int = 3
+        times each benchmark is timed
+    only : str = None
+        only run benchmarks whose name contains this
+
+    Returns:
+    --------
+    list
+        a result for each benchmark, size and depth, with the time in
+        seconds of each repeat and their minimum, median and mean, or the
+        reason it was skipped
+    """
+
+    results = []
+    for entry in benchmarks:
+        if only is not None and only not in entry['name']:
+            continue
+        for size in sizes:
+            for depth in (depths if entry['history'] else [0]):
+                result = {'benchmark': entry['name'], 'size': size, 'depth': depth}
+                if entry['limit'] is not None and size > entry['limit']:
+                    result['skipped'] = f'larger than the limit of {entry["limit"]}'
+                    results.append(result)
+                    continue
+
+                times = []
+                try:
+                    for _ in range(repeat):
+                        func = entry['setup'](suite, size, depth)
+                        start = time.perf_counter()
+                        func()
+                        times.append(time.perf_counter() - start)
+                except Exception as e:
+                    result['error'] = f'{type(e).__name__}: {e}'
+                else:
+                    result['times'] = times
+                    result['min'] = min(times)
+                    result['median'] = statistics.median(times)
+                    result['mean'] = statistics.mean(times)
+
+                results.append(result)
+                print(_describe(result), file=sys.stderr, flush=True)
+    return results
+
+def compareResults(results : list, baseline : list, threshold : float = 1.25) -> list:
+    """Compares the fastest times in results to those in baseline, as the
+    fastest repeat is the least affected by other work on the machine, and
+    the memory held for those measured.
+
+    Returns:
+    --------
+    list
+        (benchmark, size, depth, ratio) for each benchmark in both whose
+        fastest time or memory grew by more than threshold times
+    """
+
+    before = {(b['benchmark'], b['size'], b['depth']): b for b in baseline}
+    regressions = []
+    for result in results:
+        old = before.get((result['benchmark'], result['size'], result['depth']))
+        measure = 'bytes' if 'bytes' in result else 'min'
+        if old is None or measure not in result or not old.get(measure):
+            continue
+        ratio = result[measure] / old[measure]
+        print(f'{result["benchmark"]:32} {result["size"]:>6} {result["depth"]:>3} {ratio:8.2f}x')
+        if ratio > threshold:
+            regressions.append((result['benchmark'], result['size'], result['depth'], ratio))
+    return regressions
+
+def _describe(result : dict) -> str:
+    """Returns a one line summary of result."""
+
+    line = f'{result["benchmark"]:32} {result["size"]:>6} {result["depth"]:>3} '
+    if 'error' in result:
+        return line + 'error ' + result['error']
+    if 'bytes' in result:
+        return line + f'{result["perPerson"]:12.0f} B/person'
+    return line + f'{result["median"] * 1000:12.3f} ms'
+
+def main(argv : list = None) -> int:
+    parser = argparse.ArgumentParser(description='Benchmarks the coffee club pipeline on synthetic rosters.')
+    parser.add_argument('--sizes', default=','.join(str(size) for size in SIZES), help='comma separated roster sizes')
+    parser.add_argument('--depths', default=','.join(str(depth) for depth in DEPTHS), help='comma separated history depths')
+    parser.add_argument('--repeat', type=int, default=3, help='times each benchmark is timed')
+    parser.add_argument('--seed', type=int, default=0, help='seed for the synthetic data')
+    parser.add_argument('--storage', choices=['fake', 'memory'], default='fake', help='run against the fake blob service or in memory')
+    parser.add_argument('--only', default=None, help='only run benchmarks whose name contains this')
+    parser.add_argument('--memory', action='store_true', help='also measure the memory held by a club')
+    parser.add_argument('--out', default=None, help='path to store the results as JSON')
+    parser.add_argument('--compare', default=None, help='results JSON to compare against')
+    parser.add_argument('--threshold', type=float, default=1.25, help='slowdown counted as a regression')
+    args = parser.parse_args(argv)
+    logging.getLogger('azure').setLevel(logging.ERROR)
+
+    sizes = [int(size) for size in args.sizes.split(',')]
+    depths = [int(depth) for depth in args.depths.split(',')]
+
+    suite = Suite(args.seed, args.storage)
+    try:
+        results = runBenchmarks(suite, sizes, depths, args.repeat, args.only)
+        if args.memory:
+            results += measureMemory(suite, sizes, depths)
+    finally:
+        suite.close()
+
+    output = {
+        'meta': {
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'seed': args.seed,
+            'repeat': args.repeat,
+            'storage': args.storage,
+            'time': time.strftime('%Y-%m-%dT%H:%M:%S')
+        },
+        'results': results
+    }
+    if args.out is not None:
+        with open(args.out, 'w', encoding='utf-8') as f:
+            json.dump(output, f, indent=4)
+
+    if args.compare is not None:
+        with open(args.compare, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)['results']
+        regressions = compareResults(results, baseline, args.threshold)
+        for name, size, depth, ratio in regressions:
+            print(f'Regression: {name} size {size} depth {depth} is {ratio:.2f}x {"larger" if name.startswith("memory.") else "slower"}')
+        if regressions:
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
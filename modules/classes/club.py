@@ -0,0 +1,108 @@
+import os
+
+from config import excelPath, excelSheet, rosterCachePath, historyCachePath, historyDbPath, runStatePath, csvPath, schedulePath, backUpCachePath, metricsPath, metricsPromPath, clubsPath, STORAGE, WRITE_BEHIND
+
+
+class Club():
+    """Where one coffee club's roster, history and outputs are kept. The
+    default club uses the paths in config, so a single club runs as it always
+    has; the clubs of a batch each get a folder of their own under clubsPath
+    and keep their history under their own prefix in the shared storage.
+
+    Attributes:
+    -----------
+    name : str
+        Name of the club
+    workbook : str
+        Path of the source Excel book
+    sheet : str
+        Name of the sheet containing the participants
+    history : str
+        Prefix the club's history, backup and schedule are stored under in
+        storage; '' for the top level
+    container : str
+        Azure container holding the club's history, or None for the default
+    rosterCachePath : str
+        Cache of the roster columns
+    historyCachePath : str
+        Folder caching the history snapshot and log
+    historyDbPath : str
+        History when running locally
+    runStatePath : str
+        Meeting graph and candidate index kept between INCREMENTAL runs
+    csvPath : str
+        Folder the reports and CSV backups are written to
+    schedulePath : str
+        Round robin plan when running locally
+    backUpCachePath : str
+        Cache of the matches.json backup
+    dashboardPath : str
+        Excel dashboard written when running locally
+    metricsPath : str
+        JSON lines file the metrics of each run are appended to
+    metricsPromPath : str
+        Prometheus textfile for the latest run
+
+    Methods:
+    --------
+    inFolder(name : str, workbook : str, sheet : str, history : str, container : str, folder : str) -> Club
+        Returns a club keeping its caches and outputs in folder.
+    storage(backend : Storage) -> Storage
+        Returns the club's view of backend.
+    """
+
+    def __init__(self, name : str = 'default', workbook : str = excelPath, sheet : str = excelSheet, history : str = '', container : str = None):
+        self.name = name
+        self.workbook = workbook
+        self.sheet = sheet
+        self.history = history
+        self.container = container
+        self.rosterCachePath = rosterCachePath
+        self.historyCachePath = historyCachePath
+        self.historyDbPath = historyDbPath
+        self.runStatePath = runStatePath
+        self.csvPath = csvPath
+        self.schedulePath = schedulePath
+        self.backUpCachePath = backUpCachePath
+        self.dashboardPath = excelPath.replace('Data.xlsx', 'Matches.xlsx')
+        self.metricsPath = metricsPath
+        self.metricsPromPath = metricsPromPath
+
+    @classmethod
+    def inFolder(cls, name : str, workbook : str, sheet : str = excelSheet, history : str = None, container : str = None, folder : str = None) -> 'Club':
+        """Returns a club keeping its caches and outputs in folder, by default
+        a folder named after the club under clubsPath, and its history under
+        the prefix history, by default 'clubs/<name>/'.
+        """
+
+        club = cls(name, workbook, sheet, f'clubs/{name}/' if history is None else history, container)
+        if folder is None:
+            folder = os.path.join(clubsPath, name)
+        club.rosterCachePath = os.path.join(folder, 'rosterCache.pkl')
+        club.historyCachePath = os.path.join(folder, 'history') + '/'
+        club.historyDbPath = os.path.join(folder, 'history.db')
+        club.runStatePath = os.path.join(folder, 'runState.pkl')
+        club.csvPath = os.path.join(folder, 'matched_backup') + '/'
+        club.schedulePath = os.path.join(folder, 'schedule.json')
+        club.backUpCachePath = os.path.join(folder, 'matchesCache.json')
+        club.dashboardPath = os.path.join(folder, 'Matches.xlsx')
+        club.metricsPath = os.path.join(folder, 'metrics.jsonl')
+        club.metricsPromPath = os.path.join(folder, 'coffeeclub.prom')
+        for path in [club.historyCachePath, club.csvPath]:
+            os.makedirs(path, exist_ok=True)
+        return club
+
+    def storage(self, backend):
+        """Returns the club's view of backend: a PrefixedStorage keeping its
+        files under history. If the club has its own container and STORAGE
+        is 'azure', a backend for that container is built the way
+        get_storage builds the shared one, honouring WRITE_BEHIND.
+        """
+
+        from datamgmt.storage import makeStorage, PrefixedStorage
+
+        if self.container is not None and STORAGE == 'azure':
+            backend = makeStorage(STORAGE, WRITE_BEHIND, self.container)
+        if self.history == '':
+            return backend
+        return PrefixedStorage(backend, self.history)
@@ -9,4 +9,24 @@ class UnmatchedPersons(Exception):
 class ServerError(Exception):
     """Exception if cannot communicate with blob storage."""
 
-    pass
\ No newline at end of file
+    pass
+
+
+class BackUpConflict(Exception):
+    """Exception if the stored backup was changed by another run after this
+    run read it.
+    """
+
+    pass
+
+
+class PersistenceError(Exception):
+    """Exception if any of a run's outputs could not be stored. failures maps
+    the name of each output that failed to its exception and timings maps
+    every output that ran to the seconds it took.
+    """
+
+    def __init__(self, failures : dict, timings : dict = None):
+        super().__init__('Failed to store ' + ', '.join(failures.keys()))
+        self.failures = failures
+        self.timings = timings if timings is not None else {}
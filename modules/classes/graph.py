@@ -0,0 +1,368 @@
+import sys
+from array import array
+from bisect import bisect_left
+
+import numpy as np
+
+
+class MeetingGraph():
+    """Shared record of who has met whom, stored as one sorted array of ids
+    per participant.
+
+    Every name seen (whether opted in this week or only found in the history)
+    is given an integer id, and names and GUIDs are interned so that the
+    graph, the people and the stored history share one copy of each. Row
+    ``i`` of ``_met`` is a compact ``array`` of the ids person ``i`` has
+    already met, so the history takes four bytes per meeting rather than a
+    bit per pair of people. The people available for the current week are
+    held in a single mask shared by everyone, so a person's yet to meet pool
+    is the mask with their row cleared from it.
+
+    Attributes:
+    -----------
+    names : list
+        Name for each id
+    guids : list
+        GUID for each id (None if not yet known)
+    ids : dict
+        Lookup from name to id
+    version : object
+        Where the stored history the graph was loaded from is up to (an ETag
+        or log position, depending on the store), or None
+
+    Methods:
+    --------
+    addPerson(name : str, guid : str = None) -> int
+        Returns the id for name, registering it if it has not been seen.
+    idOf(name : str) -> int
+        Returns the id for name, or None if it has not been seen.
+    keyOf(a : int) -> str
+        Returns the key person a's history is stored under.
+    addKey(key : str, name : str) -> int
+        Returns the id for the person stored under key.
+    hasMet(a : int, b : int) -> bool
+        Returns True if person a has already met person b.
+    addMeeting(a : int, b : int) -> None
+        Records that person a has met person b.
+    removeMeeting(a : int, b : int) -> bool
+        Forgets that person a has met person b.
+    setAlreadyMet(a : int, names : list) -> None
+        Replaces person a's history with the supplied names.
+    alreadyMet(a : int) -> list
+        Returns the names person a has already met.
+    metIds(a : int) -> array
+        Returns the ids person a has already met.
+    metCount(a : int) -> int
+        Returns the number of people person a has already met.
+    resetPerson(a : int) -> None
+        Clears person a's history.
+    setAvailable(names : list) -> None
+        Sets the people available for the week's matches.
+    setAvailableIds(ids : list) -> None
+        Sets the people available for the week's matches by id.
+    isAvailable(a : int) -> bool
+        Returns True if person a is available this week.
+    yetToMeet(a : int) -> list
+        Returns the ids available this week that person a has not met.
+    hasYetToMeet(a : int) -> bool
+        Returns True if anyone available this week has not met person a.
+    availableIds() -> list
+        Returns the ids of everyone available this week.
+    serialize() -> list
+        Returns the history of everyone in the graph in the backup format.
+    copy() -> MeetingGraph
+        Returns an independent copy of the graph.
+    changes() -> dict
+        Returns the meetings added, removed and reset since clearChanges.
+    clearChanges() -> None
+        Forgets the recorded changes, e.g. once they have been stored.
+    """
+
+    def __init__(self, capacity : int = 64):
+        self.names = []
+        self.guids = []
+        self.ids = {}
+        self.version = None
+        self._added = set()
+        self._removed = set()
+        self._resets = set()
+        self._met = []
+        self._capacity = max(8, capacity)
+        self._available = np.zeros(self._capacity, dtype=bool)
+        self._availableCount = 0
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def _grow(self, size : int) -> None:
+        """Enlarges the availability mask so that it can hold at least size
+        people.
+        """
+
+        capacity = self._capacity
+        while capacity < size:
+            capacity *= 2
+        if capacity == self._capacity:
+            return
+
+        available = np.zeros(capacity, dtype=bool)
+        available[:self._capacity] = self._available
+        self._available = available
+        self._capacity = capacity
+
+    def addPerson(self, name : str, guid : str = None) -> int:
+        """Returns the id for name, registering it if it has not been seen.
+
+        Parameters:
+        -----------
+        name : str
+            name of the person
+        guid : str = None
+            GUID of the person, stored if not already known
+
+        Returns:
+        --------
+        int
+            id of the person
+        """
+
+        index = self.ids.get(name)
+        if index is not None:
+            if guid is not None:
+                self.guids[index] = sys.intern(guid)
+            return index
+
+        name = sys.intern(name)
+        index = len(self.names)
+        self._grow(index + 1)
+        self.names.append(name)
+        self.guids.append(None if guid is None else sys.intern(guid))
+        self.ids[name] = index
+        self._met.append(array('i'))
+        return index
+
+    def idOf(self, name : str) -> int:
+        """Returns the id for name, or None if it has not been seen."""
+
+        return self.ids.get(name)
+
+    def keyOf(self, a : int) -> str:
+        """Returns the key person a's history is stored under: their GUID, or
+        their name if the GUID is not known.
+        """
+
+        guid = self.guids[a]
+        return self.names[a] if guid is None else guid
+
+    def addKey(self, key : str, name : str) -> int:
+        """Returns the id for the person stored under key, registering them
+        if they have not been seen.
+        """
+
+        return self.addPerson(name, None if key == name else key)
+
+    def hasMet(self, a : int, b : int) -> bool:
+        """Returns True if person a has already met person b."""
+
+        row = self._met[a]
+        i = bisect_left(row, b)
+        return i < len(row) and row[i] == b
+
+    def addMeeting(self, a : int, b : int) -> None:
+        """Records that person a has met person b."""
+
+        row = self._met[a]
+        i = bisect_left(row, b)
+        if i < len(row) and row[i] == b:
+            return
+        row.insert(i, b)
+        if (a, b) in self._removed:
+            self._removed.discard((a, b))
+        else:
+            self._added.add((a, b))
+
+    def removeMeeting(self, a : int, b : int) -> bool:
+        """Forgets that person a has met person b.
+
+        Returns:
+        --------
+        bool
+            True if person a had met person b, otherwise False
+        """
+
+        row = self._met[a]
+        i = bisect_left(row, b)
+        if i == len(row) or row[i] != b:
+            return False
+        del row[i]
+        if (a, b) in self._added:
+            self._added.discard((a, b))
+        else:
+            self._removed.add((a, b))
+        return True
+
+    def setAlreadyMet(self, a : int, names : list) -> None:
+        """Replaces person a's history with the supplied names, registering
+        any names which have not been seen. Used when loading history, so it
+        is not recorded in changes.
+
+        Parameters:
+        -----------
+        a : int
+            id of the person
+        names : list
+            names of the people person a has already met
+        """
+
+        self._met[a] = array('i', sorted({self.addPerson(name) for name in names}))
+
+    def alreadyMet(self, a : int) -> list:
+        """Returns the names person a has already met."""
+
+        names = self.names
+        return [names[b] for b in self._met[a]]
+
+    def metIds(self, a : int) -> array:
+        """Returns the ids person a has already met, in order. The row is
+        the graph's own, so it must not be changed.
+        """
+
+        return self._met[a]
+
+    def metCount(self, a : int) -> int:
+        """Returns the number of people person a has already met."""
+
+        return len(self._met[a])
+
+    def resetPerson(self, a : int) -> None:
+        """Clears person a's history."""
+
+        self._met[a] = array('i')
+        self._resets.add(a)
+        self._added = {pair for pair in self._added if pair[0] != a}
+        self._removed = {pair for pair in self._removed if pair[0] != a}
+
+    def setAvailable(self, names : list) -> None:
+        """Sets the people available for the week's matches, registering any
+        names which have not been seen.
+
+        Parameters:
+        -----------
+        names : list
+            list of (name, guid) tuples of the people who opted in
+        """
+
+        self.setAvailableIds([self.addPerson(name, guid) for name, guid in names])
+
+    def setAvailableIds(self, ids : list) -> None:
+        """Sets the people available for the week's matches by id."""
+
+        available = np.zeros(self._capacity, dtype=bool)
+        available[list(ids)] = True
+        self._available = available
+        self._availableCount = int(available.sum())
+
+    def isAvailable(self, a : int) -> bool:
+        """Returns True if person a is available this week."""
+
+        return bool(self._available[a])
+
+    def yetToMeet(self, a : int) -> list:
+        """Returns the ids of people available this week that person a has
+        not met, excluding person a.
+
+        Parameters:
+        -----------
+        a : int
+            id of the person
+
+        Returns:
+        --------
+        list
+            ids of people person a has yet to meet
+        """
+
+        row = self._available[:len(self.names)].copy()
+        row[self._metIds(a)] = False
+        row[a] = False
+        return np.flatnonzero(row).tolist()
+
+    def hasYetToMeet(self, a : int) -> bool:
+        """Returns True if anyone available this week other than person a
+        has not met person a, without listing them. Only looks at the people
+        person a has met, so it takes time in proportion to their history.
+        """
+
+        available = self._available
+        metAvailable = int(available[self._metIds(a)].sum())
+        return self._availableCount - metAvailable - int(available[a]) > 0
+
+    def _metIds(self, a : int) -> np.ndarray:
+        """Returns person a's row as a numpy array, without copying it."""
+
+        row = self._met[a]
+        if len(row) == 0:
+            return np.zeros(0, dtype=np.intp)
+        return np.frombuffer(row, dtype=np.intc)
+
+    def availableIds(self) -> list:
+        """Returns the ids of everyone available this week."""
+
+        return np.flatnonzero(self._available[:len(self.names)]).tolist()
+
+    def serialize(self) -> list:
+        """Returns the history of everyone in the graph in the same format as
+        Person.serialize, used to build the backup.
+        """
+
+        serialized = []
+        for index, name in enumerate(self.names):
+            serialized.append({
+                'name': name,
+                'guid': self.guids[index],
+                'alreadyMet': self.alreadyMet(index)
+            })
+        return serialized
+
+    def copy(self) -> 'MeetingGraph':
+        """Returns an independent copy of the graph, with its version and
+        changes, so that a week can be tried out without touching this one.
+        """
+
+        graph = MeetingGraph.__new__(MeetingGraph)
+        graph.names = list(self.names)
+        graph.guids = list(self.guids)
+        graph.ids = dict(self.ids)
+        graph.version = dict(self.version) if isinstance(self.version, dict) else self.version
+        graph._added = set(self._added)
+        graph._removed = set(self._removed)
+        graph._resets = set(self._resets)
+        graph._met = [array('i', row) for row in self._met]
+        graph._capacity = self._capacity
+        graph._available = self._available.copy()
+        graph._availableCount = self._availableCount
+        return graph
+
+    def changes(self) -> dict:
+        """Returns the changes made to the history since clearChanges, as ids.
+
+        Returns:
+        --------
+        dict
+            'resets' lists the people whose history was cleared, then
+            'removed' and 'met' list (a, b) meetings forgotten and added after
+            any reset
+        """
+
+        return {
+            'resets': sorted(self._resets),
+            'removed': sorted(self._removed),
+            'met': sorted(self._added)
+        }
+
+    def clearChanges(self) -> None:
+        """Forgets the recorded changes, e.g. once they have been stored."""
+
+        self._added = set()
+        self._removed = set()
+        self._resets = set()
@@ -0,0 +1,191 @@
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+
+
+class RunMetrics():
+    """Durations and counts recorded over a weekly run. Recording is a clock
+    read and a dict update, so it is left on for every run.
+
+    Attributes:
+    -----------
+    started : float
+        Unix time the run started
+    phases : dict
+        seconds spent in each phase, summed over every attempt
+    counts : dict
+        counters, e.g. retries and blob requests
+    values : dict
+        single values, e.g. the roster size and whether the run succeeded
+    bytes : dict
+        bytes sent to ('upload') and received from ('download') storage
+
+    Methods:
+    --------
+    phase(name : str) -> context manager
+        Adds the time spent inside the with block to the phase.
+    addTime(name : str, seconds : float) -> None
+        Adds seconds to the phase.
+    count(name : str, n : int = 1) -> None
+        Adds n to the counter.
+    set(name : str, value) -> None
+        Records a single value.
+    addBytes(direction : str, n : int) -> None
+        Adds n to the bytes transferred in direction.
+    serialize() -> dict
+        Returns everything recorded, with the run's total duration.
+    prometheus(prefix : str) -> str
+        Returns everything recorded in the Prometheus text format.
+    """
+
+    def __init__(self):
+        self.started = time.time()
+        self.phases = {}
+        self.counts = {}
+        self.values = {}
+        self.bytes = {'upload': 0, 'download': 0}
+        self._start = time.perf_counter()
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def phase(self, name : str):
+        """Adds the time spent inside the with block to the phase, even if
+        the block raises.
+        """
+
+        start = time.perf_counter()
+        try:
+            yield self
+        finally:
+            self.addTime(name, time.perf_counter() - start)
+
+    def addTime(self, name : str, seconds : float) -> None:
+        """Adds seconds to the phase."""
+
+        with self._lock:
+            self.phases[name] = self.phases.get(name, 0.0) + seconds
+
+    def count(self, name : str, n : int = 1) -> None:
+        """Adds n to the counter."""
+
+        with self._lock:
+            self.counts[name] = self.counts.get(name, 0) + n
+
+    def set(self, name : str, value) -> None:
+        """Records a single value, replacing any earlier one."""
+
+        self.values[name] = value
+
+    def addBytes(self, direction : str, n : int) -> None:
+        """Adds n to the bytes transferred in direction, 'upload' or
+        'download'.
+        """
+
+        with self._lock:
+            self.bytes[direction] = self.bytes.get(direction, 0) + n
+
+    def serialize(self) -> dict:
+        """Returns everything recorded, with the run's total duration."""
+
+        return {
+            'started': self.started,
+            'seconds': time.perf_counter() - self._start,
+            'phases': dict(self.phases),
+            'counts': dict(self.counts),
+            'values': dict(self.values),
+            'bytes': dict(self.bytes)
+        }
+
+    def prometheus(self, prefix : str = 'coffeeclub') -> str:
+        """Returns everything recorded as gauges in the Prometheus text
+        format, for the node exporter's textfile collector.
+
+        Parameters:
+        -----------
+        prefix : str = 'coffeeclub'
+            prefix of every metric name
+
+        Returns:
+        --------
+        str
+            the metrics, one per line
+        """
+
+        metrics = self.serialize()
+        lines = [
+            f'# HELP {prefix}_run_started_seconds Unix time the last run started.',
+            f'# TYPE {prefix}_run_started_seconds gauge',
+            f'{prefix}_run_started_seconds {metrics["started"]:.3f}',
+            f'# HELP {prefix}_run_seconds Duration of the last run.',
+            f'# TYPE {prefix}_run_seconds gauge',
+            f'{prefix}_run_seconds {metrics["seconds"]:.6f}',
+            f'# HELP {prefix}_phase_seconds Time the last run spent in each phase.',
+            f'# TYPE {prefix}_phase_seconds gauge'
+        ]
+        for name, seconds in sorted(metrics['phases'].items()):
+            lines.append(f'{prefix}_phase_seconds{{phase="{name}"}} {seconds:.6f}')
+
+        lines.append(f'# HELP {prefix}_bytes Bytes the last run transferred to and from storage.')
+        lines.append(f'# TYPE {prefix}_bytes gauge')
+        for direction, n in sorted(metrics['bytes'].items()):
+            lines.append(f'{prefix}_bytes{{direction="{direction}"}} {n}')
+
+        for name, n in sorted(metrics['counts'].items()):
+            lines.append(f'# TYPE {prefix}_{name} gauge')
+            lines.append(f'{prefix}_{name} {n}')
+        for name, value in sorted(metrics['values'].items()):
+            if isinstance(value, (bool, int, float)):
+                lines.append(f'# TYPE {prefix}_{name} gauge')
+                lines.append(f'{prefix}_{name} {float(value):g}')
+        return '\n'.join(lines) + '\n'
+
+
+_active = None
+
+def startRun() -> RunMetrics:
+    """Starts recording a new run, returning its metrics."""
+
+    global _active
+    _active = RunMetrics()
+    return _active
+
+def stopRun() -> RunMetrics:
+    """Stops recording, returning the metrics of the run that was recorded,
+    or None.
+    """
+
+    global _active
+    metrics, _active = _active, None
+    return metrics
+
+def activeRun() -> RunMetrics:
+    """Returns the metrics being recorded, or None outside a run."""
+
+    return _active
+
+def phase(name : str):
+    """Times the with block as the phase of the active run; does nothing
+    outside a run.
+    """
+
+    if _active is None:
+        return nullcontext()
+    return _active.phase(name)
+
+def record(name : str, value) -> None:
+    """Records a single value for the active run, if any."""
+
+    if _active is not None:
+        _active.set(name, value)
+
+def count(name : str, n : int = 1) -> None:
+    """Adds n to the counter of the active run, if any."""
+
+    if _active is not None:
+        _active.count(name, n)
+
+def recordBytes(direction : str, n : int) -> None:
+    """Adds n to the bytes transferred by the active run, if any."""
+
+    if _active is not None:
+        _active.addBytes(direction, n)
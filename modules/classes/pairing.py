@@ -0,0 +1,103 @@
+class Pairing():
+    """Groups of people matched together for the week's coffee chats, with an
+    index from each name to its group so that placement lookups are O(1).
+
+    Attributes:
+    -----------
+    groups : list
+        Tuple of names for each group, in the order the groups were made
+
+    Methods:
+    --------
+    isPlaced(name : str) -> bool
+        Returns True if name has been placed in a group.
+    groupOf(name : str) -> int
+        Returns the index of the group containing name, or None.
+    members(index : int) -> tuple
+        Returns the names in the group at index.
+    addGroup(*names : str) -> int
+        Adds a new group of names, returning its index.
+    addToGroup(index : int, name : str) -> None
+        Adds name to the existing group at index.
+    numTriples() -> int
+        Returns the number of groups with three people.
+    serialize() -> list
+        Returns the groups as lists of names.
+    """
+
+    def __init__(self, groups : list = None):
+        self.groups = []
+        self._index = {}
+        if groups is not None:
+            for group in groups:
+                self.addGroup(*group)
+
+    def __len__(self) -> int:
+        return len(self.groups)
+
+    def __iter__(self):
+        return iter(self.groups)
+
+    def __contains__(self, name : str) -> bool:
+        return name in self._index
+
+    def isPlaced(self, name : str) -> bool:
+        """Returns True if name has been placed in a group."""
+
+        return name in self._index
+
+    def groupOf(self, name : str) -> int:
+        """Returns the index of the group containing name, or None if name has
+        not been placed.
+        """
+
+        return self._index.get(name)
+
+    def members(self, index : int) -> tuple:
+        """Returns the names in the group at index."""
+
+        return self.groups[index]
+
+    def addGroup(self, *names : str) -> int:
+        """Adds a new group of names.
+
+        Parameters:
+        -----------
+        *names : str
+            names of the people in the group
+
+        Returns:
+        --------
+        int
+            index of the new group
+        """
+
+        index = len(self.groups)
+        self.groups.append(tuple(names))
+        for name in names:
+            self._index[name] = index
+        return index
+
+    def addToGroup(self, index : int, name : str) -> None:
+        """Adds name to the existing group at index.
+
+        Parameters:
+        -----------
+        index : int
+            index of the group
+        name : str
+            name of the person to add
+        """
+
+        self.groups[index] = self.groups[index] + (name,)
+        self._index[name] = index
+
+    def numTriples(self) -> int:
+        """Returns the number of groups with three people."""
+
+        return len([group for group in self.groups if len(group) == 3])
+
+    def serialize(self) -> list:
+        """Returns the groups as lists of names."""
+
+        return [list(group) for group in self.groups]
@@ -1,26 +1,35 @@
 from config import peoplePath, LOCAL
 from datamgmt.clear import deleteFile
+from classes.graph import MeetingGraph
 
 
 class Person():
     """Person object representing a person to be matched for a coffee chat.
+    Uses __slots__ and keeps its history in the shared graph, so each person
+    costs a few fixed fields however large the roster is.
 
     Attributes:
     -----------
     name : str
         The name of the person
-    email : str
-        The email of the person
+    guid : str
+        The GUID of the person
+    graph : MeetingGraph
+        Shared record of who has met whom
+    id : int
+        The id of this person in graph
     available : list
         Pool of available people for the weeks meetings
     alreadyMet : list
         Pool of people this person has already met
     yetToMeet : list
-        Pool of people from available that this person has yet to meet
+        Pool of people from available that this person has yet to meet, only
+        listed when first asked for
     matched : bool
         Boolean describing whether this person has been matched
     _storePath : str
-        The path to the stored list of people this person has already met
+        The path to the stored list of people this person has already met,
+        built when asked for
 
     Methods:
     --------
@@ -33,29 +42,59 @@ class Person():
         this includes moving the most recently added name from alreadyMet back
         to yetToMeet.
     findYetToMeet() -> None
-        Assigns yetToMeet by keeping all names in available that are not in
-        alreadyMet, and if there are no names assigned to yetToMeet (i.e.) all
-        available people have already been met, uses all names in available for
+        Clears this person's history if everyone available has already been
+        met, so that yetToMeet is all of available, and forgets any listed
         yetToMeet.
     getAlreadyMet() -> None
         Backs up list of people with whom this person has already met.
     storeAlreadyMet() -> None
     """
 
-    def __init__(self, name : str, guid : str, available : list = None, alreadyMet : list = None):
-        self.name = name
-        self.guid = guid
-        self.yetToMeet = []
-        self.matched = False
-        self._storePath = peoplePath + name + '.txt'
-        if available is None:
-            self.available = []
-        else:
-            self.available = available
-        if alreadyMet is None:
-            self.alreadyMet = []
+    __slots__ = ('name', 'guid', 'graph', 'id', 'matched', '_yetToMeet')
+
+    def __init__(self, name : str, guid : str, graph : MeetingGraph = None, alreadyMet : list = None):
+        if graph is None:
+            self.graph = MeetingGraph()
         else:
-            self.alreadyMet = alreadyMet
+            self.graph = graph
+        self.id = self.graph.addPerson(name, guid)
+        # Share the graph's interned strings rather than holding copies
+        self.name = self.graph.names[self.id]
+        self.guid = None if guid is None else self.graph.guids[self.id]
+        self._yetToMeet = None
+        self.matched = False
+        if alreadyMet is not None:
+            self.graph.setAlreadyMet(self.id, alreadyMet)
+
+    @property
+    def _storePath(self) -> str:
+        """The path to the stored list of people this person has already met."""
+
+        return peoplePath + self.name + '.txt'
+
+    @property
+    def available(self) -> list:
+        """Names of everyone available this week other than this person."""
+
+        return [self.graph.names[other] for other in self.graph.availableIds() if other != self.id]
+
+    @property
+    def yetToMeet(self) -> list:
+        """Names of everyone available this week that this person has not
+        met, listed from the graph the first time it is asked for and then
+        kept up to date as this person is matched and reverted.
+        """
+
+        if self._yetToMeet is None:
+            names = self.graph.names
+            self._yetToMeet = [names[other] for other in self.graph.yetToMeet(self.id)]
+        return self._yetToMeet
+
+    @property
+    def alreadyMet(self) -> list:
+        """Names of everyone this person has already met."""
+
+        return self.graph.alreadyMet(self.id)
 
     def matchName(self, name : str) -> bool:
         """Returns a boolean based on weather or not this person can meet
@@ -74,17 +113,22 @@ class Person():
             otherwise return False
         """
 
-        if name in self.alreadyMet:
+        other = self.graph.idOf(name)
+        if other is None or other == self.id:
             return False
 
-        if name not in self.yetToMeet:
+        if self.graph.hasMet(self.id, other):
             return False
 
-        for nameToMeet in self.yetToMeet:
-            if nameToMeet == name:
-                self.alreadyMet.append(name)
-                self.yetToMeet.remove(name)
-                break
+        if not self.graph.isAvailable(other):
+            return False
+
+        self.graph.addMeeting(self.id, other)
+        if self._yetToMeet is not None:
+            try:
+                self._yetToMeet.remove(name)
+            except ValueError:
+                pass
         
         self.matched = True
         return True
@@ -95,38 +139,32 @@ class Person():
         to yetToMeet.
         """
 
-        try:
-            self.alreadyMet.remove(name)
-        except Exception as e:
-            #print(e)
-            pass
-        else:
-            self.yetToMeet.append(name)
+        other = self.graph.idOf(name)
+        if other is not None and self.graph.removeMeeting(self.id, other):
+            if self._yetToMeet is not None:
+                self._yetToMeet.append(name)
         self.matched = False
 
     def findYetToMeet(self) -> None:
-        """Assigns yetToMeet by keeping all names in available that are not in
-        alreadyMet, and if there are no names assigned to yetToMeet (i.e.) all
-        available people have already been met, uses all names in available for
-        yetToMeet.
+        """Clears this person's history if everyone available has already
+        been met, so that yetToMeet is all of available. The check looks up
+        this person's sorted row of met ids in the availability mask, so no
+        list is built until yetToMeet is asked for. Must be called again
+        whenever available changes.
         """
 
-        for name in self.available:
-            if name not in self.alreadyMet:
-                self.yetToMeet.append(name)
-        
-        if len(self.yetToMeet) == 0:
-            self.yetToMeet = self.available
-            self.alreadyMet = []
+        self._yetToMeet = None
+        if not self.graph.hasYetToMeet(self.id):
+            self.graph.resetPerson(self.id)
 
     def getAlreadyMet(self) -> None:
         """Retrieves all names from stored list of people this person has
         already met to build alreadyMet attribute.
         """
 
-        from datamgmt.blob import extractText
+        from datamgmt.extract import extractText
 
-        self.alreadyMet = extractText(self._storePath)
+        self.graph.setAlreadyMet(self.id, extractText(self._storePath))
 
     def storeAlreadyMet(self) -> None:
         """Backs up list of people with whom this person has already met."""
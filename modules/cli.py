@@ -0,0 +1,186 @@
+"""Command line entry point for the coffee club. Each command imports only
+what it uses, so light commands such as report and clear start without
+loading pandas or the Azure SDK.
+
+    python cli.py run [--attempts N]
+    python cli.py preview [--opt-out NAME ...] [--matcher blossom] [--seed N] [--json]
+    python cli.py clear --yes [--history] [--backup]
+    python cli.py simulate [--weeks N] [--trials N] [--seed N] [--compare blossom,weighted]
+    python cli.py report [--week DAYS]
+
+Pass --profile-startup before the command to run it under -X importtime and
+print the import time of each package.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+previewMatchers = ['blossom', 'weighted', 'greedy']
+
+
+def runCommand(args) -> int:
+    from config import MAX_ATTEMPTS
+    from run import funcRun
+
+    funcRun(args.attempts or MAX_ATTEMPTS)
+    return 0
+
+def previewCommand(args) -> int:
+    """Matches the week from the workbook and stored history and prints the
+    groups, without storing anything.
+    """
+
+    from classes.club import Club
+    from classes.errors import UnmatchedPersons
+    from classes.graph import MeetingGraph
+    from config import LOCAL
+    from datamgmt.extract import streamNames
+    from main import buildClub, matchWeek
+
+    club = Club()
+    graph = MeetingGraph()
+    if LOCAL:
+        from datamgmt.database import loadLocalHistory
+
+        loadLocalHistory(graph, club.historyDbPath)
+    else:
+        from datamgmt.history import loadHistory
+
+        loadHistory(graph, club.historyCachePath)
+
+    optOut = set(args.opt_out)
+    names = [(name, guid) for name, guid in streamNames(club.workbook, club.sheet) if name not in optOut]
+    coffeeClub = buildClub(names, graph)
+    try:
+        matched = matchWeek(coffeeClub, args.matcher, seed=args.seed)
+    except UnmatchedPersons:
+        print('Not everyone could be matched', file=sys.stderr)
+        return 1
+
+    if args.json:
+        print(json.dumps(matched.serialize(), indent=4))
+    else:
+        for group in matched:
+            print(' - '.join(group))
+    return 0
+
+def clearCommand(args) -> int:
+    """Forgets the stored history and backups, as datamgmt/clear.py does."""
+
+    if not args.yes:
+        print('This deletes the stored history; pass --yes to go ahead', file=sys.stderr)
+        return 1
+
+    from datamgmt.clear import deleteBackUp, deleteMatched
+
+    both = not args.history and not args.backup
+    if args.backup or both:
+        deleteBackUp()
+    if args.history or both:
+        deleteMatched()
+    return 0
+
+def simulateCommand(args) -> int:
+    from config import MATCHER
+    from simulation import simulate, compareMatchers
+
+    if args.compare:
+        comparison = compareMatchers(args.compare.split(','), args.weeks, args.trials, args.seed)
+        print(json.dumps(comparison, indent=4))
+    else:
+        reports = simulate(args.weeks, args.trials, args.seed, args.matcher or MATCHER)
+        print(f'Simulated {len(reports)} weeks')
+    return 0
+
+def reportCommand(args) -> int:
+    """Prints the latest stored match report, or the one for args.week."""
+
+    from config import csvPath
+
+    reports = sorted(name for name in os.listdir(csvPath) if '_report.' in name) if os.path.isdir(csvPath) else []
+    if args.week is not None:
+        reports = [name for name in reports if name.startswith(args.week)]
+    if not reports:
+        print(f'No match report found in {csvPath}', file=sys.stderr)
+        return 1
+
+    with open(os.path.join(csvPath, reports[-1]), 'r', encoding='utf-8') as f:
+        sys.stdout.write(f.read())
+    return 0
+
+def profileStartup(argv : list) -> int:
+    """Runs the command in a new interpreter under -X importtime and prints
+    the time spent importing each top level package, slowest first.
+    """
+
+    start = time.perf_counter()
+    child = subprocess.run([sys.executable, '-X', 'importtime', os.path.abspath(__file__)] + argv, stderr=subprocess.PIPE, text=True)
+    wall = time.perf_counter() - start
+
+    packages = {}
+    for line in child.stderr.splitlines():
+        if not line.startswith('import time:'):
+            print(line, file=sys.stderr)
+            continue
+        fields = line[len('import time:'):].split('|')
+        if not fields[0].strip().isdigit():
+            continue
+        package = fields[2].strip().split('.')[0]
+        packages[package] = packages.get(package, 0) + int(fields[0])
+
+    total = sum(packages.values())
+    print(f'\n{"package":32} {"ms":>9}', file=sys.stderr)
+    for package, micros in sorted(packages.items(), key=lambda item: -item[1])[:20]:
+        print(f'{package:32} {micros / 1000:9.1f}', file=sys.stderr)
+    print(f'{"imports":32} {total / 1000:9.1f}', file=sys.stderr)
+    print(f'{"whole command":32} {wall * 1000:9.1f}', file=sys.stderr)
+    return child.returncode
+
+def parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description='Matches the coffee club.')
+    parser.add_argument('--profile-startup', action='store_true', help='print the import time of each package')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    run = commands.add_parser('run', help='match the week and store it')
+    run.add_argument('--attempts', type=int, default=None, help='times to retry with a fresh history')
+    run.set_defaults(func=runCommand)
+
+    preview = commands.add_parser('preview', help='print the week\'s matches without storing them')
+    preview.add_argument('--opt-out', action='append', default=[], metavar='NAME', help='leave NAME out this week')
+    preview.add_argument('--matcher', choices=previewMatchers, default='blossom')
+    preview.add_argument('--seed', type=int, default=None)
+    preview.add_argument('--json', action='store_true', help='print the groups as JSON')
+    preview.set_defaults(func=previewCommand)
+
+    clear = commands.add_parser('clear', help='forget the stored history and backups')
+    clear.add_argument('--yes', action='store_true', help='confirm the history should be deleted')
+    clear.add_argument('--history', action='store_true', help='only clear the local history')
+    clear.add_argument('--backup', action='store_true', help='only clear the backups and stored history')
+    clear.set_defaults(func=clearCommand)
+
+    simulate = commands.add_parser('simulate', help='simulate weeks of matches in memory')
+    simulate.add_argument('--weeks', type=int, default=104)
+    simulate.add_argument('--trials', type=int, default=1)
+    simulate.add_argument('--seed', type=int, default=None)
+    simulate.add_argument('--matcher', default=None)
+    simulate.add_argument('--compare', default=None, metavar='MATCHERS', help='comma separated matchers to compare')
+    simulate.set_defaults(func=simulateCommand)
+
+    report = commands.add_parser('report', help='print the latest match report')
+    report.add_argument('--week', default=None, metavar='DAYS', help='print the report for the week starting DAYS')
+    report.set_defaults(func=reportCommand)
+    return parser
+
+def main(argv : list = None) -> int:
+    argv = sys.argv[1:] if argv is None else argv
+    args = parser().parse_args(argv)
+    if args.profile_startup:
+        return profileStartup([arg for arg in argv if arg != '--profile-startup'])
+    return args.func(args)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -3,13 +3,80 @@ import os
 ROOTDIR = os.path.dirname(os.path.abspath(__file__)).replace('\\', '/')
 excelPath = '/'.join(ROOTDIR.split('/')[:-1]) + '/Data.xlsx'
 excelSheet = 'Export View'
+nameColumn = 'Full Name'
+guidColumn = '(Do Not Modify) Participant'
+optedOutColumn = 'OptedOut'
+rosterCachePath = '/'.join(ROOTDIR.split('/')[:-1]) + '/setup/rosterCache.pkl'
+# Stream the roster row by row rather than loading it with pandas; for very
+# large rosters, or point excelPath at a csv export
+STREAM_ROSTER = False
 csvPath = '/'.join(ROOTDIR.split('/')[:-1]) + '/matched_backup/'
 peoplePath = '/'.join(ROOTDIR.split('/')[:-1]) + '/people/'
 testReportPath = '/'.join(ROOTDIR.split('/')[:-1]) + '/setup/testReport_{}_weeks.json'
+schedulePath = '/'.join(ROOTDIR.split('/')[:-1]) + '/schedule.json'
+backUpCachePath = '/'.join(ROOTDIR.split('/')[:-1]) + '/setup/matchesCache.json'
+historyCachePath = '/'.join(ROOTDIR.split('/')[:-1]) + '/setup/history/'
+# Folder used by the 'local' storage backend
+storagePath = '/'.join(ROOTDIR.split('/')[:-1]) + '/setup/storage/'
+# History when running locally; peoplePath is only read to import old files
+historyDbPath = '/'.join(ROOTDIR.split('/')[:-1]) + '/setup/history.db'
+# Meeting graph and candidate index kept from the last run when INCREMENTAL
+runStatePath = '/'.join(ROOTDIR.split('/')[:-1]) + '/setup/runState.pkl'
+# Timings of each run; point metricsPromPath at the node exporter's textfile
+# collector folder to scrape them
+metricsPath = '/'.join(ROOTDIR.split('/')[:-1]) + '/setup/metrics.jsonl'
+metricsPromPath = '/'.join(ROOTDIR.split('/')[:-1]) + '/setup/coffeeclub.prom'
+# Each club run by batch.py keeps its caches and outputs in a folder here,
+# and the batch's summary is stored in batchSummaryPath
+clubsPath = '/'.join(ROOTDIR.split('/')[:-1]) + '/setup/clubs/'
+batchSummaryPath = '/'.join(ROOTDIR.split('/')[:-1]) + '/setup/batchSummary.json'
 
 # LOCAL = True
 LOCAL = False
 
+# Where the history, backup and schedule are stored when not LOCAL; 'local'
+# keeps them in storagePath and 'memory' only for the life of the process.
+# WRITE_BEHIND holds writes back and sends them together at the end of a run
+# STORAGE = 'local'
+# STORAGE = 'memory'
+STORAGE = 'azure'
+WRITE_BEHIND = False
+
+# MATCHER = 'greedy'
+# MATCHER = 'schedule'
+# MATCHER = 'parallel'
+# MATCHER = 'weighted'
+MATCHER = 'blossom'
+MAX_ATTEMPTS = 5
+# Keep the meeting graph and who can meet whom from one run to the next, so a
+# week only updates what changed since the last: the people who opted in or
+# out and last week's meetings. Used by the 'blossom' and 'schedule' matchers
+INCREMENTAL = False
+# REPORT_FORMAT = 'json'
+# REPORT_FORMAT = 'ndjson'
+REPORT_FORMAT = 'text'
+# Weeks appended to the history log before it is compacted into a snapshot
+SNAPSHOT_INTERVAL = 12
+
+# Seeded attempts run side by side when MATCHER = 'parallel'
+ATTEMPTS = 8
+ATTEMPT_TIMEOUT = 60
+WORKERS = None
+
+# MATCHER = 'sharded' matches within groups sharing this column (e.g. office
+# or region) in parallel, then pairs the leftovers across groups. Every
+# SHARD_MIX_INTERVAL-th week (0 for never) the whole roster is matched
+# together instead
+# SHARD_COLUMN = 'Office'
+SHARD_COLUMN = None
+SHARD_MATCHER = 'blossom'
+SHARD_MIX_INTERVAL = 4
+
+# Address service.py listens on, and how many previews it keeps for commit
+SERVICE_HOST = '127.0.0.1'
+SERVICE_PORT = 8765
+PREVIEWS_KEPT = 32
+
 def funcTest():
     print(ROOTDIR)
     print(excelPath)
@@ -1,39 +1,160 @@
 from io import BytesIO
 import os
+import threading
+import requests
+from requests.adapters import HTTPAdapter
+from azure.core import MatchConditions
+from azure.core.exceptions import HttpResponseError, ResourceExistsError, ResourceNotFoundError, ResourceModifiedError
+from azure.core.pipeline.transport import RequestsTransport
 from azure.storage.blob import BlobServiceClient, BlobClient
 
-from classes.errors import ServerError
+from classes.errors import ServerError, BackUpConflict
+from classes.metrics import count, recordBytes
 
 account = 'coffeechatsblob'
 account_url = f'https://{account}.blob.core.windows.net'
 credential_key = '68p9tLNaiMxNSY25KwKbZAiIZXChX0bjEDvL9uAJNOyl7aF/7gZLmGEDNbjSaLa709AYTGq7Ofg1+AStCv2UWw=='
 store_container = 'matches'
+# Set to point at another account, e.g. a local Azurite emulator
+connection_string = os.environ.get('AZURE_STORAGE_CONNECTION_STRING')
+pool_size = 16
+
+
+class BlobClients():
+    """Creates the blob service client once and caches the container and blob
+    clients made from it, so that every storage call in a run shares one
+    pooled HTTP session instead of opening a new TLS connection.
+
+    Attributes:
+    -----------
+    transport : RequestsTransport
+        HTTP transport shared by every client
+    containers : set
+        names of the containers known to exist
+
+    Methods:
+    --------
+    service() -> BlobServiceClient
+        Returns the service client, creating it on first use.
+    container(name : str) -> ContainerClient
+        Returns the cached client for a container.
+    blob(location : str, container : str) -> BlobClient
+        Returns the cached client for a blob, by name or full url.
+    ensureContainer(name : str) -> None
+        Creates a container unless it is already known to exist.
+    close() -> None
+        Closes the shared HTTP session.
+    """
+
+    def __init__(self, service : BlobServiceClient = None, connectionString : str = connection_string, url : str = account_url, credential = credential_key):
+        self._service = service
+        self._connectionString = connectionString
+        self._url = url
+        self._credential = credential
+        self._containers = {}
+        self._blobs = {}
+        self._lock = threading.Lock()
+        self.containers = set()
+
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        session.mount('https://', adapter)
+        session.mount('http://', adapter)
+        session.hooks['response'].append(_countTransfer)
+        self._session = session
+        self.transport = RequestsTransport(session=session, session_owner=False)
+
+    def service(self) -> BlobServiceClient:
+        """Returns the service client, creating it on first use."""
+
+        with self._lock:
+            if self._service is None:
+                if self._connectionString:
+                    self._service = BlobServiceClient.from_connection_string(self._connectionString, transport=self.transport)
+                else:
+                    self._service = BlobServiceClient(account_url=self._url, credential=self._credential, transport=self.transport)
+            return self._service
+
+    def container(self, name : str = store_container):
+        """Returns the cached client for a container."""
+
+        client = self._containers.get(name)
+        if client is None:
+            client = self.service().get_container_client(name)
+            self._containers[name] = client
+        return client
+
+    def blob(self, location : str, container : str = store_container) -> BlobClient:
+        """Returns the cached client for a blob, given either its name within
+        container or its full url.
+        """
+
+        key = location if '//' in location else (container, location)
+        client = self._blobs.get(key)
+        if client is None:
+            # // would not be in folder checking process.
+            if '//' in location:
+                client = BlobClient.from_blob_url(blob_url=location, credential=self._credential, transport=self.transport)
+            else:
+                client = self.container(container).get_blob_client(location)
+            self._blobs[key] = client
+        return client
+
+    def ensureContainer(self, name : str = store_container) -> None:
+        """Creates a container unless it is already known to exist."""
+
+        if name in self.containers:
+            return
+        try:
+            self.container(name).create_container()
+        except ResourceExistsError:
+            pass
+        self.containers.add(name)
+
+    def close(self) -> None:
+        """Closes the shared HTTP session."""
+
+        self._session.close()
+
+_clients = None
+
+def _countTransfer(response, *args, **kwargs) -> None:
+    """Adds each storage request and its bytes to the run's metrics."""
+
+    count('blob_requests')
+    body = response.request.body
+    if body is not None:
+        recordBytes('upload', len(body) if isinstance(body, (bytes, str)) else int(response.request.headers.get('Content-Length', 0)))
+    if response.request.method != 'HEAD':
+        recordBytes('download', int(response.headers.get('Content-Length', 0)))
+
+def get_clients() -> BlobClients:
+    """Returns the process wide BlobClients, creating it on first use."""
+
+    global _clients
+    if _clients is None:
+        _clients = BlobClients()
+    return _clients
+
+def set_clients(clients : BlobClients) -> None:
+    """Replaces the process wide BlobClients, e.g. with one wrapping a fake
+    service client or pointing at a local Azurite emulator.
+    """
+
+    global _clients
+    _clients = clients
 
 def get_blob_service_client():
     try:
-        blob_service_client = BlobServiceClient(account_url=account_url, credential=credential_key)
+        return get_clients().service()
     except:
         raise ServerError()
-    else:
-        return blob_service_client
 
 def get_blob_client(blob_url, container = store_container):
-    # // would not be in folder checking process.
-    if '//' in blob_url:
-        try:
-            blob_client = BlobClient.from_blob_url(blob_url=blob_url,credential=credential_key)
-        except:
-            raise ServerError()
-        else:
-            return blob_client
-    else:
-        url = account_url + '/' + container + '/' + blob_url
-        try:
-            blob_client = BlobClient.from_blob_url(blob_url=url, credential=credential_key)
-        except:
-            raise ServerError()
-        else:
-            return blob_client
+    try:
+        return get_clients().blob(blob_url, container)
+    except:
+        raise ServerError()
 
 def get_file_from_blob(location: str, container = store_container, **kwargs) -> BytesIO:
     """
@@ -44,23 +165,82 @@ def get_file_from_blob(location: str, container = store_container, **kwargs) ->
     except:
         raise ServerError()
 
-def post_file_to_blob(file_name: str, contents, tags: dict = None, container = store_container, **kwargs) -> str:
+def get_file_if_changed(location: str, etag: str = None, container = store_container, **kwargs) -> tuple:
+    """Downloads location unless its ETag still matches etag, in which case
+    the service answers 304 without sending the contents.
+
+    Returns:
+    --------
+    tuple
+        (BytesIO, etag) with the new contents, or (None, etag) if unchanged
     """
+    blob_client = get_blob_client(location, container)
+    try:
+        if etag is None:
+            downloader = blob_client.download_blob()
+        else:
+            downloader = blob_client.download_blob(etag=etag, match_condition=MatchConditions.IfModified)
+        return BytesIO(downloader.content_as_bytes()), downloader.properties.etag
+    except HttpResponseError as e:
+        # 304 is reported as an error, and its type depends on the error code
+        if e.status_code == 304:
+            return None, etag
+        raise ServerError()
+    except:
+        raise ServerError()
+
+def put_file_to_blob(file_name: str, contents, etag: str = None, container = store_container, **kwargs) -> str:
+    """Overwrites file_name with contents in a single request, only if it is
+    still at etag (or, when etag is None, only if it does not exist yet).
+
+    Returns:
+    --------
+    str
+        the ETag of the new contents
+
+    Raises:
+    -------
+    BackUpConflict
+        if file_name was changed (or created) since etag was read
     """
-    blob_service_client = get_blob_service_client()
+    clients = get_clients()
+    blob_client = get_blob_client(file_name, container)
+    if etag is None:
+        options = {'overwrite': False}
+    else:
+        options = {'overwrite': True, 'etag': etag, 'match_condition': MatchConditions.IfNotModified}
+
     try:
-        container_client = blob_service_client.get_container_client(container)
-        if container_client.exists() is False:
-            container_client.create_container()
+        try:
+            result = blob_client.upload_blob(contents, **options)
+        except ResourceNotFoundError:
+            if container in clients.containers:
+                raise
+            clients.ensureContainer(container)
+            result = blob_client.upload_blob(contents, **options)
+    except (ResourceModifiedError, ResourceExistsError):
+        raise BackUpConflict()
     except:
         raise ServerError()
+    else:
+        clients.containers.add(container)
+        return result['etag']
 
+def post_file_to_blob(file_name: str, contents, tags: dict = None, container = store_container, overwrite: bool = False, **kwargs) -> str:
+    """Uploads contents as file_name. The container is only created if the
+    upload reports that it is missing, and is then remembered as existing.
+    """
+    clients = get_clients()
+    blob_client = get_blob_client(file_name, container)
     try:
-        blob_client = blob_service_client.get_blob_client(
-            container=container,
-            blob=file_name
-        )
-        blob_client.upload_blob(contents)
+        try:
+            blob_client.upload_blob(contents, overwrite=overwrite)
+        except ResourceNotFoundError:
+            if container in clients.containers:
+                raise
+            clients.ensureContainer(container)
+            blob_client.upload_blob(contents, overwrite=overwrite)
+        clients.containers.add(container)
         if tags is not None:
             blob_client.set_blob_tags(tags=tags)
     except:
@@ -68,15 +248,103 @@ def post_file_to_blob(file_name: str, contents, tags: dict = None, container = s
     else:
         return blob_client.url
 
+def append_to_blob(file_name: str, contents: bytes, offset: int, container = store_container, **kwargs) -> int:
+    """Appends contents to the append blob file_name, only if it is still
+    offset bytes long, creating it first when offset is 0.
+
+    Returns:
+    --------
+    int
+        the length of the blob after appending
+
+    Raises:
+    -------
+    BackUpConflict
+        if the blob's length is no longer offset
+    """
+    clients = get_clients()
+    blob_client = get_blob_client(file_name, container)
+    try:
+        if offset == 0:
+            try:
+                blob_client.create_append_blob(match_condition=MatchConditions.IfMissing)
+            except ResourceNotFoundError:
+                clients.ensureContainer(container)
+                blob_client.create_append_blob(match_condition=MatchConditions.IfMissing)
+            except (ResourceModifiedError, ResourceExistsError):
+                pass
+        if len(contents) > 0:
+            blob_client.append_block(contents, appendpos_condition=offset)
+    except (ResourceModifiedError, ResourceExistsError):
+        raise BackUpConflict()
+    except HttpResponseError as e:
+        if e.status_code == 412:
+            raise BackUpConflict()
+        raise ServerError()
+    except:
+        raise ServerError()
+    else:
+        clients.containers.add(container)
+        return offset + len(contents)
+
+def seal_blob(file_name: str, offset: int, container = store_container, **kwargs) -> None:
+    """Seals the append blob file_name so nothing more can be appended, only
+    if it is still offset bytes long.
+
+    Raises:
+    -------
+    BackUpConflict
+        if the blob's length is no longer offset
+    """
+    blob_client = get_blob_client(file_name, container)
+    try:
+        blob_client.seal_append_blob(appendpos_condition=offset)
+    except ResourceNotFoundError:
+        pass
+    except (ResourceModifiedError, ResourceExistsError):
+        raise BackUpConflict()
+    except HttpResponseError as e:
+        if e.status_code == 412:
+            raise BackUpConflict()
+        raise ServerError()
+    except:
+        raise ServerError()
+
+def get_range_from_blob(location: str, offset: int = 0, container = store_container, **kwargs) -> bytes:
+    """Downloads location from offset to its end, returning b'' if there is
+    nothing past offset or None if location does not exist.
+    """
+    blob_client = get_blob_client(location, container)
+    try:
+        return blob_client.download_blob(offset=offset).readall()
+    except ResourceNotFoundError:
+        return None
+    except HttpResponseError as e:
+        if e.status_code == 416:
+            return b''
+        raise ServerError()
+    except:
+        raise ServerError()
+
+def list_blob_names(prefix: str = None, container = store_container, **kwargs) -> list:
+    """Returns the names of the blobs in container starting with prefix."""
+    try:
+        return [blob.name for blob in get_clients().container(container).list_blobs(name_starts_with=prefix)]
+    except ResourceNotFoundError:
+        return []
+    except:
+        raise ServerError()
+
 def delete_file_from_blob(location: str, container = store_container, **kwargs) -> None:
     """
     """
-    if check_blob_exists(location, container) is True:
-        blob_client = get_blob_client(location, container)
-        try:
-            blob_client.delete_blob()
-        except:
-            raise ServerError()
+    blob_client = get_blob_client(location, container)
+    try:
+        blob_client.delete_blob()
+    except ResourceNotFoundError:
+        pass
+    except:
+        raise ServerError()
 
 def check_blob_exists(location: str, container = store_container, **kwargs) -> bool:
     """
@@ -1,7 +1,8 @@
 import os
 
-from config import peoplePath, csvPath, LOCAL
-from datamgmt.blob import delete_file_from_blob
+from config import csvPath, backUpCachePath, historyCachePath, historyDbPath, LOCAL
+from datamgmt.storage import get_storage
+from datamgmt.database import clearLocalHistory
 
 def deleteFile(path : str) -> None:
     """Used to delete a file at the given path.
@@ -18,28 +19,31 @@ def deleteFile(path : str) -> None:
     except Exception as e:
         print(f'Failed to delete {path}. Reason: {e}')
 
-def deleteMatched() -> None:
-    """Delete all backup matched files from peoplePath."""
+def deleteMatched(dbPath : str = historyDbPath) -> None:
+    """Forget everyone's history stored locally. The old text files in
+    peoplePath are left alone, as they are only read once to import them.
+    """
 
-    folder = peoplePath
-    if folder[-1] == '/':
-        folder = folder[0:-1]
-    for fileName in os.listdir(folder):
-        path = os.path.join(folder, fileName)
-        deleteFile(path)
+    clearLocalHistory(dbPath)
 
-def deleteBackUp() -> None:
-    """Delete all stored csvs with each week's matches from csvPath."""
+def deleteBackUp(folder : str = csvPath, cachePath : str = backUpCachePath, historyCache : str = historyCachePath) -> None:
+    """Delete all stored csvs with each week's matches from folder, or when
+    not running locally, clear the stored history and the local caches of
+    it in cachePath and historyCache.
+    """
 
     if LOCAL:
-        folder = csvPath
         if folder[-1] == '/':
             folder = folder[0:-1]
         for fileName in os.listdir(folder):
             path = os.path.join(folder, fileName)
             deleteFile(path)
     else:
-        delete_file_from_blob('matches.json')
+        from datamgmt.history import clearHistory
+
+        clearHistory(historyCache)
+        get_storage().delete('matches.json')
+        deleteFile(cachePath)
 
 if __name__ == '__main__':
     deleteBackUp()
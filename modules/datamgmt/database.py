@@ -0,0 +1,190 @@
+from __future__ import annotations
+
+import sqlite3
+import os
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from classes.graph import MeetingGraph
+from config import historyDbPath, peoplePath
+
+schema = '''
+CREATE TABLE IF NOT EXISTS people (
+    key TEXT PRIMARY KEY,
+    name TEXT NOT NULL
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS meetings (
+    person_guid TEXT NOT NULL,
+    met_guid TEXT NOT NULL,
+    week TEXT,
+    PRIMARY KEY (person_guid, met_guid)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS meetings_met ON meetings (met_guid);
+CREATE INDEX IF NOT EXISTS meetings_week ON meetings (week);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+) WITHOUT ROWID;
+'''
+
+
+def loadLocalHistory(graph : MeetingGraph, dbPath : str = historyDbPath, importPath : str = peoplePath) -> None:
+    """Loads everyone's history into graph from the local SQLite database in
+    one read. The first time the database is opened, the text files left in
+    importPath by older versions are imported into it.
+
+    Parameters:
+    -----------
+    graph : MeetingGraph
+        graph to load the history into; its version records the key each
+        person was loaded under
+    dbPath : str = historyDbPath
+        path of the database
+    importPath : str = peoplePath
+        folder of per person text files to import from
+    """
+
+    conn = _connect(dbPath)
+    try:
+        with conn:
+            if conn.execute("SELECT value FROM meta WHERE key = 'imported'").fetchone() is None:
+                importPeople(conn, importPath)
+
+        names = {}
+        for key, name in conn.execute('SELECT key, name FROM people'):
+            names[key] = name
+            graph.addKey(key, name)
+
+        met = {}
+        for person, other in conn.execute('SELECT person_guid, met_guid FROM meetings ORDER BY person_guid'):
+            met.setdefault(person, []).append(names.get(other, other))
+    finally:
+        conn.close()
+
+    for key, others in met.items():
+        graph.setAlreadyMet(graph.addKey(key, names.get(key, key)), others)
+
+    graph.version = {'keys': {index: graph.keyOf(index) for index in range(len(graph))}}
+    graph.clearChanges()
+
+def storeLocalHistory(graph : MeetingGraph, week : str, dbPath : str = historyDbPath) -> int:
+    """Writes this week's changes to the local SQLite database in a single
+    transaction. People first stored under their name are moved to their
+    GUID once it is known.
+
+    Parameters:
+    -----------
+    graph : MeetingGraph
+        graph loaded by loadLocalHistory, holding this week's changes
+    week : str
+        label for the week, e.g. from support.getDay
+    dbPath : str = historyDbPath
+        path of the database
+
+    Returns:
+    --------
+    int
+        number of meetings inserted
+    """
+
+    changes = graph.changes()
+    loaded = {} if graph.version is None else graph.version.get('keys', {})
+    moved = [index for index, key in loaded.items() if graph.keyOf(index) != key]
+    rekeyed = [(graph.keyOf(index), loaded[index]) for index in moved]
+
+    # People moved to a new key are stored again under it
+    involved = set(changes['resets']) | set(moved)
+    for a, b in changes['removed'] + changes['met']:
+        involved.add(a)
+        involved.add(b)
+
+    conn = _connect(dbPath)
+    try:
+        with conn:
+            conn.executemany('UPDATE OR REPLACE meetings SET person_guid = ? WHERE person_guid = ?', rekeyed)
+            conn.executemany('UPDATE OR REPLACE meetings SET met_guid = ? WHERE met_guid = ?', rekeyed)
+            conn.executemany('DELETE FROM people WHERE key = ?', [(old,) for _, old in rekeyed])
+            conn.executemany(
+                'INSERT OR REPLACE INTO people (key, name) VALUES (?, ?)',
+                [(graph.keyOf(index), graph.names[index]) for index in sorted(involved)]
+            )
+            conn.executemany(
+                'DELETE FROM meetings WHERE person_guid = ?',
+                [(graph.keyOf(a),) for a in changes['resets']]
+            )
+            conn.executemany(
+                'DELETE FROM meetings WHERE person_guid = ? AND met_guid = ?',
+                [(graph.keyOf(a), graph.keyOf(b)) for a, b in changes['removed']]
+            )
+            conn.executemany(
+                'INSERT OR REPLACE INTO meetings (person_guid, met_guid, week) VALUES (?, ?, ?)',
+                [(graph.keyOf(a), graph.keyOf(b), week) for a, b in changes['met']]
+            )
+    finally:
+        conn.close()
+
+    graph.version = {'keys': {index: graph.keyOf(index) for index in range(len(graph))}}
+    graph.clearChanges()
+    return len(changes['met'])
+
+def clearLocalHistory(dbPath : str = historyDbPath) -> None:
+    """Forgets everyone's history in the local SQLite database. The text
+    files are not imported again afterwards.
+    """
+
+    conn = _connect(dbPath)
+    try:
+        with conn:
+            conn.execute('DELETE FROM meetings')
+            conn.execute('DELETE FROM people')
+            conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('imported', '1')")
+    finally:
+        conn.close()
+
+def importPeople(conn : sqlite3.Connection, importPath : str = peoplePath) -> int:
+    """Imports the per person text files in importPath into the database,
+    keyed by name as the files do not hold GUIDs. Called inside the caller's
+    transaction.
+
+    Parameters:
+    -----------
+    conn : sqlite3.Connection
+        open connection to the database
+    importPath : str = peoplePath
+        folder of text files, one per person, named after the person
+
+    Returns:
+    --------
+    int
+        number of people imported
+    """
+
+    from datamgmt.extract import extractText
+
+    people = {}
+    meetings = []
+    if os.path.isdir(importPath):
+        for fileName in os.listdir(importPath):
+            if not fileName.endswith('.txt'):
+                continue
+            name = fileName[:-4]
+            people[name] = name
+            for other in extractText(os.path.join(importPath, fileName)):
+                if other:
+                    people[other] = other
+                    meetings.append((name, other, None))
+
+    conn.executemany('INSERT OR IGNORE INTO people (key, name) VALUES (?, ?)', people.items())
+    conn.executemany('INSERT OR IGNORE INTO meetings (person_guid, met_guid, week) VALUES (?, ?, ?)', meetings)
+    conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('imported', '1')")
+    return len(people)
+
+def _connect(dbPath : str) -> sqlite3.Connection:
+    """Opens the database at dbPath, creating it and its tables if needed."""
+
+    folder = os.path.dirname(dbPath)
+    if folder:
+        os.makedirs(folder, exist_ok=True)
+    conn = sqlite3.connect(dbPath)
+    conn.executescript(schema)
+    return conn
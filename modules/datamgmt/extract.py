@@ -1,16 +1,32 @@
-import pandas as pd
-from pandas import DataFrame
-import warnings, json
+from __future__ import annotations
+
+import warnings, json, os, pickle, hashlib, csv
+from random import randint
+from typing import TYPE_CHECKING
 
 from classes.errors import ServerError
-from config import excelPath, excelSheet
+from config import excelPath, excelSheet, schedulePath, backUpCachePath, LOCAL, nameColumn, guidColumn, optedOutColumn, rosterCachePath, SHARD_COLUMN
 from support import fileExists
-from datamgmt.blob import get_file_from_blob
+from datamgmt.storage import get_storage
+
+if TYPE_CHECKING:
+    from pandas import DataFrame
+
 
+def extractExcel(path : str = excelPath, sheet : str = excelSheet, cachePath : str = rosterCachePath) -> DataFrame:
+    """Extracts the name, GUID and OptedOut columns (and SHARD_COLUMN, if set)
+    from the excel book using pandas and returns the corresponding DataFrame.
+    The columns are cached in cachePath keyed on the book's modification time
+    and hash, so an unchanged book is only parsed once.
 
-def extractExcel() -> DataFrame:
-    """Extracts the excel contents using pandas and returns the corresponding
-    DataFrame.
+    Parameters:
+    -----------
+    path : str = excelPath
+        path of the excel book
+    sheet : str = excelSheet
+        name of the sheet containing the participants
+    cachePath : str = rosterCachePath
+        path of the cache; None to always parse the book
 
     Returns:
     --------
@@ -19,11 +35,139 @@ def extractExcel() -> DataFrame:
         information
     """
 
+    columns = [guidColumn, nameColumn, optedOutColumn]
+    if SHARD_COLUMN is not None:
+        columns.append(SHARD_COLUMN)
+    mtime = os.path.getmtime(path)
+    cached = readRosterCache(cachePath)
+    if cached is not None and cached['path'] == path and cached['sheet'] == sheet and cached.get('columns') == columns:
+        if cached['mtime'] == mtime:
+            return cached['df']
+
+        digest = hashFile(path)
+        if cached['hash'] == digest:
+            cached['mtime'] = mtime
+            writeRosterCache(cachePath, cached)
+            return cached['df']
+    else:
+        digest = hashFile(path)
+
+    import pandas as pd
+
     with warnings.catch_warnings(record=True):
         warnings.simplefilter("always")
-        df = pd.read_excel(excelPath, excelSheet)
+        df = pd.read_excel(path, sheet, usecols=columns)
+
+    writeRosterCache(cachePath, {'path': path, 'sheet': sheet, 'columns': columns, 'mtime': mtime, 'hash': digest, 'df': df})
     return df
 
+def streamNames(path : str = excelPath, sheet : str = excelSheet, test : bool = False):
+    """Yields the name and GUID of each person who has opted in, one row at a
+    time, without loading the whole book into memory. Reads the sheet with
+    openpyxl's read-only mode, or the file directly if path is a csv export.
+
+    Parameters:
+    -----------
+    path : str = excelPath
+        path of the excel book or csv export
+    sheet : str = excelSheet
+        name of the sheet containing the participants (ignored for csv)
+    test : bool = False
+        apply a random value to OptIn weighted at 75% for In and 25% for Out
+
+    Yields:
+    -------
+    tuple
+        (name, guid) for each person who has opted in
+    """
+
+    if path.lower().endswith('.csv'):
+        with open(path, 'r', encoding='utf-8-sig', newline='') as f:
+            reader = csv.reader(f)
+            yield from _optedIn(reader, test)
+        return
+
+    from openpyxl import load_workbook
+
+    workbook = load_workbook(path, read_only=True, data_only=True)
+    try:
+        with warnings.catch_warnings(record=True):
+            warnings.simplefilter("always")
+            rows = workbook[sheet].iter_rows(values_only=True)
+            yield from _optedIn(rows, test)
+    finally:
+        workbook.close()
+
+def _optedIn(rows, test : bool):
+    """Yields (name, guid) from rows whose first row is the header, skipping
+    anyone whose OptedOut cell is not an explicit False, blank cells
+    included, so the stream matches the same roster as support.getNames.
+    """
+
+    header = list(next(rows, ()))
+    nameIndex = header.index(nameColumn)
+    guidIndex = header.index(guidColumn)
+    optedOutIndex = header.index(optedOutColumn)
+
+    for row in rows:
+        if len(row) <= max(nameIndex, guidIndex, optedOutIndex) or row[nameIndex] in (None, ''):
+            continue
+
+        if test is True:
+            optedOut = randint(0, 1) * randint(0, 1) != 0
+        else:
+            optedOut = not _isFalse(row[optedOutIndex])
+
+        if not optedOut:
+            yield (row[nameIndex], row[guidIndex])
+
+def _isFalse(value) -> bool:
+    """Returns True if an OptedOut cell is an explicit False, as
+    support.getNames reads it with pandas; a blank cell counts as opted out.
+    """
+
+    if isinstance(value, str):
+        return value.strip().lower() in ('false', '0')
+    return value is not None and value == False
+
+def hashFile(path : str) -> str:
+    """Returns the SHA-1 hash of the file at path."""
+
+    digest = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+def readRosterCache(cachePath : str) -> dict:
+    """Reads the cached roster columns, returning None if there is no usable
+    cache.
+    """
+
+    if cachePath is None or not fileExists(cachePath):
+        return None
+
+    try:
+        with open(cachePath, 'rb') as f:
+            return pickle.load(f)
+    except Exception:
+        return None
+
+def writeRosterCache(cachePath : str, cached : dict) -> None:
+    """Writes the cached roster columns, replacing the previous cache in one
+    step so that a crash cannot leave a partial file behind.
+    """
+
+    if cachePath is None:
+        return
+
+    try:
+        with open(cachePath + '.tmp', 'wb') as f:
+            pickle.dump(cached, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(cachePath + '.tmp', cachePath)
+    except OSError as e:
+        print(f'Failed to cache roster at {cachePath}. Reason: {e}')
+
 def extractText(path : str) -> list:
     """Extract the contents of the text file returning the names in each file
     as a list.
@@ -50,15 +194,80 @@ def extractText(path : str) -> list:
     
     return names
 
-def getBackUp() -> list:
+def getBackUp(cachePath : str = backUpCachePath) -> tuple:
+    """Retrieves the stored backup of everyone's history. A copy is kept in
+    cachePath with its ETag, and the download is conditional on that ETag so
+    an unchanged backup is not downloaded again.
+
+    Parameters:
+    -----------
+    cachePath : str = backUpCachePath
+        path of the local copy; None to always download
+
+    Returns:
+    --------
+    tuple
+        (backup, etag) where backup is the list of serialized people, or
+        (None, None) if there is no backup
     """
+
+    cached = None
+    if cachePath is not None and fileExists(cachePath):
+        try:
+            with open(cachePath, 'r', encoding='utf-8') as f:
+                cached = json.load(f)
+        except (OSError, ValueError):
+            cached = None
+
+    try:
+        file, etag = get_storage().getIfChanged('matches.json', etag=None if cached is None else cached['etag'])
+    except ServerError:
+        return None, None
+
+    if file is None:
+        return cached['data'], etag
+
+    data = json.load(file)
+    storeBackUpCache(data, etag, cachePath)
+    return data, etag
+
+def storeBackUpCache(data : list, etag : str, cachePath : str = backUpCachePath) -> None:
+    """Keeps a local copy of the backup at etag for the next getBackUp."""
+
+    if cachePath is None:
+        return
+
+    try:
+        with open(cachePath + '.tmp', 'w', encoding='utf-8') as f:
+            json.dump({'etag': etag, 'data': data}, f)
+        os.replace(cachePath + '.tmp', cachePath)
+    except OSError as e:
+        print(f'Failed to cache backup at {cachePath}. Reason: {e}')
+
+def getSchedule(path : str = schedulePath) -> dict:
+    """Retrieves the stored round robin plan.
+
+    Parameters:
+    -----------
+    path : str = schedulePath
+        path of the plan when running locally
+
+    Returns:
+    --------
+    dict
+        the plan built by matching.schedule.buildSchedule, or None if no plan
+        has been stored
     """
 
+    if LOCAL:
+        if not fileExists(path):
+            return None
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+
     try:
-        file = get_file_from_blob(location='matches.json')
+        file = get_storage().get('schedule.json')
     except ServerError:
-        pass
+        return None
     else:
-        data = json.load(file)
-        print(data)
-        return data
\ No newline at end of file
+        return json.load(file)
@@ -0,0 +1,342 @@
+import json
+import os
+
+from classes.errors import ServerError
+from classes.graph import MeetingGraph
+from config import historyCachePath, SNAPSHOT_INTERVAL
+from datamgmt.storage import get_storage
+
+snapshotName = 'history/snapshot.json'
+logName = 'history/log-{}.ndjson'
+
+
+def loadHistory(graph : MeetingGraph, cachePath : str = historyCachePath) -> None:
+    """Rebuilds everyone's history in graph from the latest snapshot plus the
+    weekly events appended to the log since. Both are cached in cachePath so
+    an unchanged snapshot is not downloaded again and only the new tail of
+    the log is read. If there is no snapshot yet, the full matches.json
+    backup is imported instead.
+
+    Parameters:
+    -----------
+    graph : MeetingGraph
+        graph to load the history into; its version records the log position
+    cachePath : str = historyCachePath
+        directory holding the local copies
+    """
+
+    snapshot, etag = _getSnapshot(cachePath)
+    if snapshot is not None:
+        generation = snapshot['generation']
+        _applySnapshot(graph, snapshot)
+    else:
+        from datamgmt.extract import getBackUp
+
+        generation = 0
+        backup, _ = getBackUp(cachePath=None)
+        if backup is not None:
+            for person in backup:
+                index = graph.addPerson(person['name'], person['guid'])
+                graph.setAlreadyMet(index, person['alreadyMet'])
+
+    log = _getLog(generation, cachePath)
+    events = 0
+    for line in log.splitlines():
+        if line.strip():
+            _applyEvent(graph, json.loads(line))
+            events += 1
+
+    graph.version = {'generation': generation, 'snapshot': etag, 'offset': len(log), 'events': events}
+    graph.clearChanges()
+
+def refreshHistory(graph : MeetingGraph, cachePath : str = historyCachePath) -> dict:
+    """Brings a graph loaded by loadHistory, and kept since, up to date with
+    the stored history by replaying only the events appended to the log
+    after it. Checking the snapshot is a conditional request, so an up to
+    date graph costs two small requests however long the history is.
+
+    Parameters:
+    -----------
+    graph : MeetingGraph
+        graph holding the history up to its version
+    cachePath : str = historyCachePath
+        directory holding the local copies
+
+    Returns:
+    --------
+    dict
+        the changes replayed, as MeetingGraph.changes returns them, or None
+        if the snapshot has been replaced since (by a compaction or
+        clearHistory) and the graph must be loaded again
+    """
+
+    version = graph.version
+    if not isinstance(version, dict) or version.get('snapshot') is None:
+        return None
+
+    try:
+        file, _ = get_storage().getIfChanged(snapshotName, etag=version['snapshot'])
+    except ServerError:
+        return None
+    if file is not None:
+        return None
+
+    name = logName.format(version['generation'])
+    tail = get_storage().getRange(name, version['offset'])
+    if tail is None:
+        return None
+
+    graph.clearChanges()
+    events = 0
+    for line in tail.splitlines():
+        if line.strip():
+            _applyEvent(graph, json.loads(line))
+            events += 1
+
+    path = _cacheFile(cachePath, name)
+    if len(tail) > 0 and path is not None and os.path.isfile(path) and os.path.getsize(path) == version['offset']:
+        with open(path, 'ab') as f:
+            f.write(tail)
+
+    version['offset'] += len(tail)
+    version['events'] += events
+    changes = graph.changes()
+    graph.clearChanges()
+    return changes
+
+def appendHistory(graph : MeetingGraph, week : str, cachePath : str = historyCachePath) -> int:
+    """Appends this week's changes to the history log, so the upload is the
+    size of the week's matches however long the club has been running. Every
+    SNAPSHOT_INTERVAL weeks (and the first time) a snapshot is written
+    instead.
+
+    Parameters:
+    -----------
+    graph : MeetingGraph
+        graph loaded by loadHistory, holding this week's changes
+    week : str
+        label for the week, e.g. from support.getDay
+    cachePath : str = historyCachePath
+        directory holding the local copies
+
+    Returns:
+    --------
+    int
+        number of bytes uploaded
+
+    Raises:
+    -------
+    BackUpConflict
+        if another run changed the history since it was loaded
+    """
+
+    version = graph.version
+    if version is None or version['snapshot'] is None or version['events'] + 1 >= SNAPSHOT_INTERVAL:
+        return compactHistory(graph, week, cachePath)
+
+    data = (json.dumps(_event(graph, week)) + '\n').encode('utf-8')
+    name = logName.format(version['generation'])
+    offset = get_storage().append(name, data, version['offset'])
+
+    path = _cacheFile(cachePath, name)
+    if path is not None and os.path.isfile(path) and os.path.getsize(path) == version['offset']:
+        with open(path, 'ab') as f:
+            f.write(data)
+
+    version['offset'] = offset
+    version['events'] += 1
+    graph.clearChanges()
+    return len(data)
+
+def compactHistory(graph : MeetingGraph, week : str = None, cachePath : str = historyCachePath) -> int:
+    """Writes everyone's history as a new snapshot and starts a new, empty
+    log. The old log is sealed first so no other run can append to it, and
+    the snapshot is only written if nobody else has replaced it.
+
+    Parameters:
+    -----------
+    graph : MeetingGraph
+        graph holding everyone's history
+    week : str = None
+        label for the week the snapshot was taken
+    cachePath : str = historyCachePath
+        directory holding the local copies
+
+    Returns:
+    --------
+    int
+        number of bytes uploaded
+    """
+
+    version = graph.version
+    if version is None:
+        version = {'generation': 0, 'snapshot': None, 'offset': 0, 'events': 0}
+
+    oldLog = logName.format(version['generation'])
+    get_storage().seal(oldLog, version['offset'])
+
+    generation = version['generation'] + 1
+    get_storage().append(logName.format(generation), b'', 0)
+
+    snapshot = _snapshot(graph, generation, week)
+    data = json.dumps(snapshot).encode('utf-8')
+    etag = get_storage().put(snapshotName, data, etag=version['snapshot'])
+    _storeCache(cachePath, snapshotName, json.dumps({'etag': etag, 'data': snapshot}).encode('utf-8'))
+    _storeCache(cachePath, logName.format(generation), b'')
+
+    try:
+        get_storage().delete(oldLog)
+    except ServerError:
+        pass
+    _deleteCache(cachePath, oldLog)
+
+    graph.version = {'generation': generation, 'snapshot': etag, 'offset': 0, 'events': 0}
+    graph.clearChanges()
+    return len(data)
+
+def clearHistory(cachePath : str = historyCachePath) -> None:
+    """Forgets everyone's history by writing an empty snapshot with a new
+    generation and deleting the old logs.
+    """
+
+    graph = MeetingGraph()
+    snapshot, etag = _getSnapshot(cachePath)
+    generation = 0 if snapshot is None else snapshot['generation']
+    graph.version = {'generation': generation, 'snapshot': etag, 'offset': len(_getLog(generation, cachePath)), 'events': 0}
+    compactHistory(graph, cachePath=cachePath)
+
+    current = logName.format(graph.version['generation'])
+    for name in get_storage().list(prefix='history/log-'):
+        if name != current:
+            get_storage().delete(name)
+            _deleteCache(cachePath, name)
+
+def _event(graph : MeetingGraph, week : str) -> dict:
+    """Builds the log entry for the changes recorded in graph."""
+
+    changes = graph.changes()
+    involved = set(changes['resets'])
+    for a, b in changes['removed'] + changes['met']:
+        involved.add(a)
+        involved.add(b)
+
+    return {
+        'week': week,
+        'people': {graph.keyOf(index): graph.names[index] for index in sorted(involved)},
+        'resets': [graph.keyOf(index) for index in changes['resets']],
+        'removed': [[graph.keyOf(a), graph.keyOf(b)] for a, b in changes['removed']],
+        'met': [[graph.keyOf(a), graph.keyOf(b)] for a, b in changes['met']]
+    }
+
+def _applyEvent(graph : MeetingGraph, event : dict) -> None:
+    """Replays a log entry onto graph."""
+
+    ids = {key: graph.addKey(key, name) for key, name in event['people'].items()}
+    for key in event['resets']:
+        graph.resetPerson(ids[key])
+    for a, b in event['removed']:
+        graph.removeMeeting(ids[a], ids[b])
+    for a, b in event['met']:
+        graph.addMeeting(ids[a], ids[b])
+
+def _snapshot(graph : MeetingGraph, generation : int, week : str) -> dict:
+    """Builds a snapshot of everyone's history in graph."""
+
+    people = []
+    for index, name in enumerate(graph.names):
+        people.append({
+            'guid': graph.guids[index],
+            'name': name,
+            'alreadyMet': [graph.keyOf(graph.ids[other]) for other in graph.alreadyMet(index)]
+        })
+    return {'generation': generation, 'week': week, 'people': people}
+
+def _applySnapshot(graph : MeetingGraph, snapshot : dict) -> None:
+    """Loads everyone's history in snapshot into graph."""
+
+    names = {}
+    for person in snapshot['people']:
+        key = person['name'] if person['guid'] is None else person['guid']
+        names[key] = person['name']
+        graph.addPerson(person['name'], person['guid'])
+
+    for person in snapshot['people']:
+        index = graph.idOf(person['name'])
+        graph.setAlreadyMet(index, [names.get(key, key) for key in person['alreadyMet']])
+
+def _getSnapshot(cachePath : str) -> tuple:
+    """Returns (snapshot, etag), downloading it only if the cached copy is out
+    of date, or (None, None) if there is no snapshot.
+    """
+
+    cached = _readCache(cachePath, snapshotName)
+    if cached is not None:
+        try:
+            cached = json.loads(cached)
+        except ValueError:
+            cached = None
+
+    try:
+        file, etag = get_storage().getIfChanged(snapshotName, etag=None if cached is None else cached['etag'])
+    except ServerError:
+        return None, None
+
+    if file is None:
+        return cached['data'], etag
+
+    snapshot = json.load(file)
+    _storeCache(cachePath, snapshotName, json.dumps({'etag': etag, 'data': snapshot}).encode('utf-8'))
+    return snapshot, etag
+
+def _getLog(generation : int, cachePath : str) -> bytes:
+    """Returns the whole log for generation, reading only the part past the
+    cached copy.
+    """
+
+    name = logName.format(generation)
+    cached = _readCache(cachePath, name) or b''
+    tail = get_storage().getRange(name, len(cached))
+    if tail is None:
+        _deleteCache(cachePath, name)
+        return b''
+
+    if len(tail) > 0:
+        _storeCache(cachePath, name, cached + tail)
+    return cached + tail
+
+def _cacheFile(cachePath : str, name : str) -> str:
+    """Returns the path of the local copy of the blob name."""
+
+    if cachePath is None:
+        return None
+    return os.path.join(cachePath, name.replace('/', '_'))
+
+def _readCache(cachePath : str, name : str) -> bytes:
+    """Returns the local copy of the blob name, or None if there is none."""
+
+    path = _cacheFile(cachePath, name)
+    if path is None or not os.path.isfile(path):
+        return None
+    with open(path, 'rb') as f:
+        return f.read()
+
+def _storeCache(cachePath : str, name : str, data : bytes) -> None:
+    """Replaces the local copy of the blob name with data."""
+
+    path = _cacheFile(cachePath, name)
+    if path is None:
+        return
+    try:
+        os.makedirs(cachePath, exist_ok=True)
+        with open(path + '.tmp', 'wb') as f:
+            f.write(data)
+        os.replace(path + '.tmp', path)
+    except OSError as e:
+        print(f'Failed to cache {name} at {path}. Reason: {e}')
+
+def _deleteCache(cachePath : str, name : str) -> None:
+    """Deletes the local copy of the blob name."""
+
+    path = _cacheFile(cachePath, name)
+    if path is not None and os.path.isfile(path):
+        os.remove(path)
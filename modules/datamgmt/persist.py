@@ -0,0 +1,77 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from classes.errors import PersistenceError
+
+
+def persistRun(outputs : dict, commits : dict = None) -> tuple:
+    """Stores a run's outputs concurrently, so the stage takes about as long
+    as the slowest output rather than the sum of them all. The outputs (the
+    report, CSV and dashboard, which a retry of the week overwrites) run
+    first; the commits (the schedule and history the next run reads) only
+    run once every output has succeeded, and then one at a time in order,
+    each only once the one before has succeeded. The last commit, the
+    history, is what marks the week as done, so a failed run never leaves
+    it stored with an earlier commit missing.
+
+    Parameters:
+    -----------
+    outputs : dict
+        name of each output mapped to a function storing it
+    commits : dict = None
+        name of each commit mapped to a function storing it, in the order
+        they are to be made
+
+    Returns:
+    --------
+    tuple
+        (results, timings) mapping each name to the value its function
+        returned and to the seconds it took
+
+    Raises:
+    -------
+    PersistenceError
+        if any output or commit failed, after the others have finished
+    """
+
+    import asyncio
+
+    stages = [outputs] + [{name: commit} for name, commit in (commits or {}).items()]
+    workers = max(len(outputs), 1)
+    return asyncio.run(_persist(stages, workers))
+
+async def _persist(stages : list, workers : int) -> tuple:
+    """Runs each stage's functions side by side in worker threads, stopping
+    at the first stage with a failure.
+    """
+
+    import asyncio
+
+    results = {}
+    timings = {}
+    loop = asyncio.get_running_loop()
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        for stage in stages:
+            names = list(stage.keys())
+            done = await asyncio.gather(
+                *[loop.run_in_executor(executor, _timed, stage[name]) for name in names],
+                return_exceptions=True
+            )
+
+            failures = {}
+            for name, outcome in zip(names, done):
+                if isinstance(outcome, BaseException):
+                    failures[name] = outcome
+                    continue
+                results[name], timings[name] = outcome
+            if failures:
+                raise PersistenceError(failures, timings)
+
+    return results, timings
+
+def _timed(func) -> tuple:
+    """Returns (result, seconds) for calling func."""
+
+    start = time.perf_counter()
+    result = func()
+    return result, time.perf_counter() - start
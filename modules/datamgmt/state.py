@@ -0,0 +1,72 @@
+import os
+import pickle
+
+from classes.graph import MeetingGraph
+from config import runStatePath, historyCachePath
+from datamgmt.history import refreshHistory
+from matching.incremental import CandidateIndex
+
+
+def loadRunState(statePath : str = runStatePath, cachePath : str = historyCachePath) -> dict:
+    """Reads the meeting graph, candidate index and roster kept from the last
+    run and brings them up to date with anything stored in the history
+    since, so the week only pays for what changed.
+
+    Parameters:
+    -----------
+    statePath : str = runStatePath
+        path of the kept state
+    cachePath : str = historyCachePath
+        directory holding the local copies of the history
+
+    Returns:
+    --------
+    dict
+        'graph', 'candidates' and 'roster' (the names matched last run), or
+        None if there is no usable state or the stored history has been
+        replaced since, in which case the history must be loaded in full
+    """
+
+    if statePath is None or not os.path.isfile(statePath):
+        return None
+
+    try:
+        with open(statePath, 'rb') as f:
+            state = pickle.load(f)
+    except Exception:
+        return None
+
+    changes = refreshHistory(state['graph'], cachePath)
+    if changes is None:
+        return None
+    state['candidates'].update(state['graph'], changes)
+    return state
+
+def storeRunState(graph : MeetingGraph, candidates : CandidateIndex, roster, statePath : str = runStatePath) -> None:
+    """Keeps the meeting graph, candidate index and roster for the next run,
+    replacing the previous state in one step so that a crash cannot leave a
+    partial file behind. Must be called once the history has been stored,
+    so that the graph's version is where the stored history is up to.
+
+    Parameters:
+    -----------
+    graph : MeetingGraph
+        graph holding everyone's history
+    candidates : CandidateIndex
+        index brought up to date with graph
+    roster : iterable
+        names matched this run
+    statePath : str = runStatePath
+        path of the kept state
+    """
+
+    if statePath is None:
+        return
+
+    state = {'graph': graph, 'candidates': candidates, 'roster': set(roster)}
+    try:
+        with open(statePath + '.tmp', 'wb') as f:
+            pickle.dump(state, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(statePath + '.tmp', statePath)
+    except OSError as e:
+        print(f'Failed to keep the run state at {statePath}. Reason: {e}')
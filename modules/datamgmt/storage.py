@@ -0,0 +1,676 @@
+import itertools
+import os
+import threading
+from abc import ABC, abstractmethod
+from io import BytesIO
+
+from classes.errors import ServerError, BackUpConflict
+from config import STORAGE, WRITE_BEHIND, storagePath
+
+
+class Storage(ABC):
+    """Interface to the store holding the history, backup and schedule. Every
+    backend names its files with '/' separated paths and gives each version
+    of a file an ETag, so conditional writes behave the same whichever
+    backend a run uses. Every method but flush is abstract, so a backend
+    missing one cannot be created.
+
+    Methods:
+    --------
+    get(name : str) -> BytesIO
+        Returns the contents of name.
+    getIfChanged(name : str, etag : str) -> tuple
+        Returns (contents, etag), or (None, etag) if name is still at etag.
+    put(name : str, contents, etag : str = None) -> str
+        Overwrites name only if it is still at etag, returning the new ETag.
+    post(name : str, contents, overwrite : bool = False) -> str
+        Writes name, returning where it was written.
+    append(name : str, contents : bytes, offset : int) -> int
+        Appends to name only if it is still offset bytes long.
+    seal(name : str, offset : int) -> None
+        Stops anything more being appended to name.
+    getRange(name : str, offset : int = 0) -> bytes
+        Returns name from offset to its end.
+    list(prefix : str = None) -> list
+        Returns the names starting with prefix.
+    delete(name : str) -> None
+        Deletes name, if it exists.
+    exists(name : str) -> bool
+        Returns True if name exists.
+    flush() -> None
+        Finishes any writes still held back.
+    """
+
+    @abstractmethod
+    def get(self, name : str) -> BytesIO:
+        """Returns the contents of name.
+
+        Raises:
+        -------
+        ServerError
+            if name does not exist or cannot be read
+        """
+
+        raise NotImplementedError
+
+    @abstractmethod
+    def getIfChanged(self, name : str, etag : str = None) -> tuple:
+        """Returns (contents, etag) for name, or (None, etag) without reading
+        it if it is still at etag.
+
+        Raises:
+        -------
+        ServerError
+            if name does not exist or cannot be read
+        """
+
+        raise NotImplementedError
+
+    @abstractmethod
+    def put(self, name : str, contents, etag : str = None) -> str:
+        """Overwrites name with contents only if it is still at etag (or, when
+        etag is None, only if it does not exist yet).
+
+        Returns:
+        --------
+        str
+            the ETag of the new contents
+
+        Raises:
+        -------
+        BackUpConflict
+            if name was changed (or created) since etag was read
+        """
+
+        raise NotImplementedError
+
+    @abstractmethod
+    def post(self, name : str, contents, overwrite : bool = False) -> str:
+        """Writes contents as name, returning where it was written."""
+
+        raise NotImplementedError
+
+    @abstractmethod
+    def append(self, name : str, contents : bytes, offset : int) -> int:
+        """Appends contents to name only if it is still offset bytes long,
+        creating it first when offset is 0.
+
+        Returns:
+        --------
+        int
+            the length of name after appending
+
+        Raises:
+        -------
+        BackUpConflict
+            if the length of name is no longer offset
+        """
+
+        raise NotImplementedError
+
+    @abstractmethod
+    def seal(self, name : str, offset : int) -> None:
+        """Stops anything more being appended to name, only if it is still
+        offset bytes long.
+
+        Raises:
+        -------
+        BackUpConflict
+            if the length of name is no longer offset
+        """
+
+        raise NotImplementedError
+
+    @abstractmethod
+    def getRange(self, name : str, offset : int = 0) -> bytes:
+        """Returns name from offset to its end, b'' if there is nothing past
+        offset or None if name does not exist.
+        """
+
+        raise NotImplementedError
+
+    @abstractmethod
+    def list(self, prefix : str = None) -> list:
+        """Returns the names starting with prefix."""
+
+        raise NotImplementedError
+
+    @abstractmethod
+    def delete(self, name : str) -> None:
+        """Deletes name, if it exists."""
+
+        raise NotImplementedError
+
+    @abstractmethod
+    def exists(self, name : str) -> bool:
+        """Returns True if name exists."""
+
+        raise NotImplementedError
+
+    def flush(self) -> None:
+        """Finishes any writes still held back. Nothing is held back unless
+        the backend is wrapped in a WriteBehindStorage.
+        """
+
+        pass
+
+
+class AzureStorage(Storage):
+    """Storage in the Azure blob container used by datamgmt.blob."""
+
+    def __init__(self, container : str = None):
+        from datamgmt import blob
+
+        self._blob = blob
+        self._container = blob.store_container if container is None else container
+
+    def get(self, name : str) -> BytesIO:
+        return self._blob.get_file_from_blob(name, container=self._container)
+
+    def getIfChanged(self, name : str, etag : str = None) -> tuple:
+        return self._blob.get_file_if_changed(name, etag=etag, container=self._container)
+
+    def put(self, name : str, contents, etag : str = None) -> str:
+        return self._blob.put_file_to_blob(name, contents, etag=etag, container=self._container)
+
+    def post(self, name : str, contents, overwrite : bool = False) -> str:
+        return self._blob.post_file_to_blob(name, contents, container=self._container, overwrite=overwrite)
+
+    def append(self, name : str, contents : bytes, offset : int) -> int:
+        return self._blob.append_to_blob(name, contents, offset, container=self._container)
+
+    def seal(self, name : str, offset : int) -> None:
+        self._blob.seal_blob(name, offset, container=self._container)
+
+    def getRange(self, name : str, offset : int = 0) -> bytes:
+        return self._blob.get_range_from_blob(name, offset, container=self._container)
+
+    def list(self, prefix : str = None) -> list:
+        return self._blob.list_blob_names(prefix=prefix, container=self._container)
+
+    def delete(self, name : str) -> None:
+        self._blob.delete_file_from_blob(name, container=self._container)
+
+    def exists(self, name : str) -> bool:
+        return self._blob.check_blob_exists(name, container=self._container)
+
+
+class MemoryStorage(Storage):
+    """Storage held in a dict, for simulations, benchmarks and as the local
+    view of a WriteBehindStorage. Nothing outlives the process.
+
+    Attributes:
+    -----------
+    files : dict
+        name mapped to a dict of the file's data, etag and whether it is an
+        append file and sealed
+    """
+
+    def __init__(self):
+        self.files = {}
+        self._etags = itertools.count(1)
+        self._lock = threading.RLock()
+
+    def _newEtag(self) -> str:
+        return '"m%d"' % next(self._etags)
+
+    def _bytes(self, contents) -> bytes:
+        return contents.encode('utf-8') if isinstance(contents, str) else bytes(contents)
+
+    def get(self, name : str) -> BytesIO:
+        with self._lock:
+            file = self.files.get(name)
+            if file is None:
+                raise ServerError()
+            return BytesIO(file['data'])
+
+    def getIfChanged(self, name : str, etag : str = None) -> tuple:
+        with self._lock:
+            file = self.files.get(name)
+            if file is None:
+                raise ServerError()
+            if etag is not None and etag == file['etag']:
+                return None, etag
+            return BytesIO(file['data']), file['etag']
+
+    def put(self, name : str, contents, etag : str = None) -> str:
+        with self._lock:
+            file = self.files.get(name)
+            current = None if file is None else file['etag']
+            if current != etag:
+                raise BackUpConflict()
+            self.files[name] = {'data': self._bytes(contents), 'etag': self._newEtag(), 'append': False, 'sealed': False}
+            return self.files[name]['etag']
+
+    def post(self, name : str, contents, overwrite : bool = False) -> str:
+        with self._lock:
+            if name in self.files and not overwrite:
+                raise ServerError()
+            self.files[name] = {'data': self._bytes(contents), 'etag': self._newEtag(), 'append': False, 'sealed': False}
+            return 'memory://' + name
+
+    def append(self, name : str, contents : bytes, offset : int) -> int:
+        with self._lock:
+            file = self.files.get(name)
+            if file is None:
+                if offset != 0:
+                    raise BackUpConflict()
+                file = {'data': b'', 'etag': self._newEtag(), 'append': True, 'sealed': False}
+                self.files[name] = file
+            if not file['append']:
+                raise ServerError()
+            if len(contents) == 0:
+                return offset
+            if len(file['data']) != offset or file['sealed']:
+                raise BackUpConflict()
+            file['data'] += self._bytes(contents)
+            file['etag'] = self._newEtag()
+            return len(file['data'])
+
+    def seal(self, name : str, offset : int) -> None:
+        with self._lock:
+            file = self.files.get(name)
+            if file is None:
+                return
+            if len(file['data']) != offset:
+                raise BackUpConflict()
+            file['sealed'] = True
+
+    def getRange(self, name : str, offset : int = 0) -> bytes:
+        with self._lock:
+            file = self.files.get(name)
+            if file is None:
+                return None
+            return file['data'][offset:]
+
+    def list(self, prefix : str = None) -> list:
+        with self._lock:
+            return sorted(name for name in self.files if prefix is None or name.startswith(prefix))
+
+    def delete(self, name : str) -> None:
+        with self._lock:
+            self.files.pop(name, None)
+
+    def exists(self, name : str) -> bool:
+        with self._lock:
+            return name in self.files
+
+
+class LocalStorage(Storage):
+    """Storage in a folder on the local disk, one file per name, for running
+    the blob backed history without Azure. ETags are taken from each file's
+    modification time and size, and a sealed file has a '.sealed' marker
+    beside it. Conditional writes are checked under a lock, so they are safe
+    between threads but not between processes sharing the folder.
+
+    Attributes:
+    -----------
+    folder : str
+        folder holding the files
+    """
+
+    def __init__(self, folder : str = storagePath):
+        self.folder = folder
+        self._lock = threading.RLock()
+
+    def _path(self, name : str) -> str:
+        return os.path.join(self.folder, *name.split('/'))
+
+    def _etag(self, path : str) -> str:
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            return None
+        return '"%x-%x"' % (stat.st_mtime_ns, stat.st_size)
+
+    def _write(self, path : str, data : bytes) -> None:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path + '.tmp', 'wb') as f:
+            f.write(data)
+        os.replace(path + '.tmp', path)
+
+    def _bytes(self, contents) -> bytes:
+        return contents.encode('utf-8') if isinstance(contents, str) else bytes(contents)
+
+    def get(self, name : str) -> BytesIO:
+        try:
+            with open(self._path(name), 'rb') as f:
+                return BytesIO(f.read())
+        except OSError:
+            raise ServerError()
+
+    def getIfChanged(self, name : str, etag : str = None) -> tuple:
+        path = self._path(name)
+        with self._lock:
+            current = self._etag(path)
+            if current is None:
+                raise ServerError()
+            if etag is not None and etag == current:
+                return None, etag
+            return self.get(name), current
+
+    def put(self, name : str, contents, etag : str = None) -> str:
+        path = self._path(name)
+        with self._lock:
+            if self._etag(path) != etag:
+                raise BackUpConflict()
+            try:
+                self._write(path, self._bytes(contents))
+            except OSError:
+                raise ServerError()
+            return self._etag(path)
+
+    def post(self, name : str, contents, overwrite : bool = False) -> str:
+        path = self._path(name)
+        with self._lock:
+            if not overwrite and os.path.isfile(path):
+                raise ServerError()
+            try:
+                self._write(path, self._bytes(contents))
+            except OSError:
+                raise ServerError()
+            return path
+
+    def append(self, name : str, contents : bytes, offset : int) -> int:
+        path = self._path(name)
+        with self._lock:
+            try:
+                if offset == 0 and not os.path.isfile(path):
+                    self._write(path, b'')
+                size = os.path.getsize(path)
+                if len(contents) == 0:
+                    return offset
+                if size != offset or os.path.isfile(path + '.sealed'):
+                    raise BackUpConflict()
+                with open(path, 'ab') as f:
+                    f.write(self._bytes(contents))
+                return offset + len(contents)
+            except OSError:
+                raise ServerError()
+
+    def seal(self, name : str, offset : int) -> None:
+        path = self._path(name)
+        with self._lock:
+            if not os.path.isfile(path):
+                return
+            if os.path.getsize(path) != offset:
+                raise BackUpConflict()
+            open(path + '.sealed', 'wb').close()
+
+    def getRange(self, name : str, offset : int = 0) -> bytes:
+        try:
+            with open(self._path(name), 'rb') as f:
+                f.seek(offset)
+                return f.read()
+        except FileNotFoundError:
+            return None
+        except OSError:
+            raise ServerError()
+
+    def list(self, prefix : str = None) -> list:
+        names = []
+        for root, _, fileNames in os.walk(self.folder):
+            for fileName in fileNames:
+                if fileName.endswith('.sealed') or fileName.endswith('.tmp'):
+                    continue
+                path = os.path.join(root, fileName)
+                name = os.path.relpath(path, self.folder).replace(os.sep, '/')
+                if prefix is None or name.startswith(prefix):
+                    names.append(name)
+        return sorted(names)
+
+    def delete(self, name : str) -> None:
+        path = self._path(name)
+        with self._lock:
+            for file in [path, path + '.sealed']:
+                try:
+                    os.remove(file)
+                except FileNotFoundError:
+                    pass
+                except OSError:
+                    raise ServerError()
+
+    def exists(self, name : str) -> bool:
+        return os.path.isfile(self._path(name))
+
+
+class WriteBehindStorage(Storage):
+    """Wraps another backend, applying writes to a local MemoryStorage view
+    straight away and holding them back until flush, when they are sent in
+    order, with runs of appends to the same file sent as one append. Reads
+    of a file that has been touched are served from the view; anything else
+    is read from the backend.
+
+    Conditions are checked against the view as each write is made, and again
+    by the backend at flush, so a conflict with another run is raised by
+    flush. ETags returned before flush belong to the view, and are translated
+    to the backend's ETags as the writes are sent.
+
+    Attributes:
+    -----------
+    backend : Storage
+        the store writes are flushed to
+    pending : list
+        writes not yet flushed, as (operation, name, arguments) tuples
+    """
+
+    def __init__(self, backend : Storage):
+        self.backend = backend
+        self.pending = []
+        self._view = MemoryStorage()
+        self._known = set()
+        self._etags = {}
+        self._lock = threading.RLock()
+
+    def _load(self, name : str, append : bool = False) -> None:
+        """Copies name from the backend into the view the first time it is
+        touched.
+        """
+
+        if name in self._known:
+            return
+        self._known.add(name)
+        etag = None
+        if append:
+            data = self.backend.getRange(name, 0)
+        else:
+            try:
+                file, etag = self.backend.getIfChanged(name, None)
+                data = file.read()
+            except ServerError:
+                data = None
+        if data is None:
+            return
+        viewEtag = self._view._newEtag()
+        self._view.files[name] = {'data': data, 'etag': viewEtag, 'append': append, 'sealed': False}
+        self._etags[viewEtag] = etag
+
+    def get(self, name : str) -> BytesIO:
+        with self._lock:
+            if name not in self._known:
+                return self.backend.get(name)
+            return self._view.get(name)
+
+    def getIfChanged(self, name : str, etag : str = None) -> tuple:
+        with self._lock:
+            self._load(name)
+            return self._view.getIfChanged(name, etag)
+
+    def put(self, name : str, contents, etag : str = None) -> str:
+        with self._lock:
+            self._load(name)
+            newEtag = self._view.put(name, contents, etag)
+            self.pending.append(('put', name, (contents, etag, newEtag)))
+            return newEtag
+
+    def post(self, name : str, contents, overwrite : bool = False) -> str:
+        with self._lock:
+            self._load(name)
+            self._view.post(name, contents, overwrite)
+            self.pending.append(('post', name, (contents, overwrite)))
+            return name
+
+    def append(self, name : str, contents : bytes, offset : int) -> int:
+        with self._lock:
+            self._load(name, append=True)
+            length = self._view.append(name, contents, offset)
+            last = self.pending[-1] if self.pending else None
+            if last is not None and last[0] == 'append' and last[1] == name and last[2][0] + len(last[2][1]) == offset:
+                self.pending[-1] = ('append', name, (last[2][0], last[2][1] + contents))
+            else:
+                self.pending.append(('append', name, (offset, contents)))
+            return length
+
+    def seal(self, name : str, offset : int) -> None:
+        with self._lock:
+            self._load(name, append=True)
+            self._view.seal(name, offset)
+            self.pending.append(('seal', name, (offset,)))
+
+    def getRange(self, name : str, offset : int = 0) -> bytes:
+        with self._lock:
+            if name not in self._known:
+                return self.backend.getRange(name, offset)
+            return self._view.getRange(name, offset)
+
+    def list(self, prefix : str = None) -> list:
+        with self._lock:
+            names = set(name for name in self.backend.list(prefix) if name not in self._known)
+            names.update(self._view.list(prefix))
+            return sorted(names)
+
+    def delete(self, name : str) -> None:
+        with self._lock:
+            self._known.add(name)
+            self._view.delete(name)
+            self.pending.append(('delete', name, ()))
+
+    def exists(self, name : str) -> bool:
+        with self._lock:
+            if name not in self._known:
+                return self.backend.exists(name)
+            return self._view.exists(name)
+
+    def flush(self) -> None:
+        """Sends the held back writes to the backend in order, then forgets
+        the local view so the next run reads the backend afresh. On a failure
+        the writes not yet sent are kept, so flush can be tried again.
+
+        Raises:
+        -------
+        BackUpConflict
+            if another run changed a file since this run read it
+        """
+
+        with self._lock:
+            while self.pending:
+                operation, name, arguments = self.pending[0]
+                if operation == 'put':
+                    contents, etag, viewEtag = arguments
+                    self._etags[viewEtag] = self.backend.put(name, contents, self._etags.get(etag, etag))
+                elif operation == 'post':
+                    contents, overwrite = arguments
+                    self.backend.post(name, contents, overwrite)
+                elif operation == 'append':
+                    offset, contents = arguments
+                    self.backend.append(name, contents, offset)
+                elif operation == 'seal':
+                    self.backend.seal(name, arguments[0])
+                elif operation == 'delete':
+                    self.backend.delete(name)
+                self.pending.pop(0)
+
+            self._view = MemoryStorage()
+            self._known = set()
+
+
+class PrefixedStorage(Storage):
+    """Wraps another backend, keeping every file under prefix, so that
+    several clubs can keep their history apart while sharing one backend
+    and its connections.
+
+    Attributes:
+    -----------
+    backend : Storage
+        the store the files are kept in
+    prefix : str
+        prefix of every name in the backend, e.g. 'clubs/engineering/'
+    """
+
+    def __init__(self, backend : Storage, prefix : str):
+        self.backend = backend
+        self.prefix = prefix if prefix == '' or prefix.endswith('/') else prefix + '/'
+
+    def get(self, name : str) -> BytesIO:
+        return self.backend.get(self.prefix + name)
+
+    def getIfChanged(self, name : str, etag : str = None) -> tuple:
+        return self.backend.getIfChanged(self.prefix + name, etag)
+
+    def put(self, name : str, contents, etag : str = None) -> str:
+        return self.backend.put(self.prefix + name, contents, etag)
+
+    def post(self, name : str, contents, overwrite : bool = False) -> str:
+        return self.backend.post(self.prefix + name, contents, overwrite)
+
+    def append(self, name : str, contents : bytes, offset : int) -> int:
+        return self.backend.append(self.prefix + name, contents, offset)
+
+    def seal(self, name : str, offset : int) -> None:
+        self.backend.seal(self.prefix + name, offset)
+
+    def getRange(self, name : str, offset : int = 0) -> bytes:
+        return self.backend.getRange(self.prefix + name, offset)
+
+    def list(self, prefix : str = None) -> list:
+        names = self.backend.list(self.prefix + (prefix or ''))
+        return [name[len(self.prefix):] for name in names]
+
+    def delete(self, name : str) -> None:
+        self.backend.delete(self.prefix + name)
+
+    def exists(self, name : str) -> bool:
+        return self.backend.exists(self.prefix + name)
+
+    def flush(self) -> None:
+        self.backend.flush()
+
+
+def makeStorage(kind : str = STORAGE, writeBehind : bool = WRITE_BEHIND, container : str = None) -> Storage:
+    """Returns a new backend of kind, 'azure', 'local' or 'memory', wrapped
+    in a WriteBehindStorage if writeBehind is True. container is the Azure
+    container to use instead of the default, for kind 'azure'.
+    """
+
+    if kind == 'memory':
+        storage = MemoryStorage()
+    elif kind == 'local':
+        storage = LocalStorage()
+    elif kind == 'azure':
+        storage = AzureStorage(container)
+    else:
+        raise ValueError(f'Unknown storage {kind}')
+
+    if writeBehind:
+        storage = WriteBehindStorage(storage)
+    return storage
+
+_storage = None
+
+def get_storage() -> Storage:
+    """Returns the process wide backend, creating it from config.STORAGE and
+    config.WRITE_BEHIND on first use.
+    """
+
+    global _storage
+    if _storage is None:
+        _storage = makeStorage()
+    return _storage
+
+def set_storage(storage : Storage) -> None:
+    """Replaces the process wide backend, e.g. with a MemoryStorage for a
+    simulation or benchmark. Must be called before the first read or write.
+    """
+
+    global _storage
+    _storage = storage
@@ -1,11 +1,16 @@
-import pandas as pd
 import json
+import os
 
-from config import excelPath, csvPath, testReportPath
+from config import excelPath, csvPath, testReportPath, schedulePath, metricsPath, metricsPromPath, LOCAL, REPORT_FORMAT
 from support import getDay, matchReport
-from datamgmt.blob import post_file_to_blob
+from classes.pairing import Pairing
+from classes.metrics import RunMetrics
+from datamgmt.storage import get_storage
+from datamgmt.extract import storeBackUpCache
 
-def saveMatchedExcel(matched : list) -> None:
+reportExtensions = {'text': 'txt', 'json': 'json', 'ndjson': 'ndjson'}
+
+def saveMatchedExcel(matched : list, fileName : str = excelPath.replace('Data.xlsx', 'Matches.xlsx')) -> None:
     """Updates information stored in Excel dashboard for easy copy/paste into
     an email.
 
@@ -13,30 +18,40 @@ def saveMatchedExcel(matched : list) -> None:
     -----------
     matched : list
         list of dictionaries containing matches for the week's coffee club
+    fileName : str = Matches.xlsx next to excelPath
+        path of the dashboard
     """
 
+    import pandas as pd
+
     df = pd.read_json(json.dumps(matched))
-    fileName = excelPath.replace('Data.xlsx', 'Matches.xlsx')
 
     df.to_excel(fileName, 'Matches')
 
-def saveMatchedCsv(matched : dict, counter : int) -> None:
+def saveMatchedCsv(matched : Pairing, counter : int, folder : str = csvPath) -> None:
     """Saves a backup of the matches found as a csv.
 
     Parameters:
     -----------
-    matched : dict
-        dictionary containing matches for the week's coffee club
+    matched : Pairing
+        matches for the week's coffee club
     counter : int
         week number being generated - used in testing
+    folder : str = csvPath
+        folder the csv is saved in
     """
 
     matches = []
-    for name1, name2 in matched.items():
-        matches.append({'Person1': name1, 'Person2': name2})
+    for group in matched:
+        match = {'Person1': None, 'Person2': None, 'Person3': None}
+        for number, name in enumerate(group, 1):
+            match['Person' + str(number)] = name
+        matches.append(match)
     
-    df = pd.read_json(json.dumps(matches))
-    fileName = csvPath + getDay(counter) + '_matches.csv'
+    import pandas as pd
+
+    df = pd.DataFrame(matches, columns=['Person1', 'Person2', 'Person3'])
+    fileName = folder + getDay(counter) + '_matches.csv'
 
     df.to_csv(fileName)
 
@@ -57,7 +72,7 @@ def storeAlreadyMatched(path : str, names : list) -> None:
             line += '\n'
             f.write(line)
 
-def storeMatchReport(coffeeClub : dict, matched : dict, counter : int, test : bool) -> dict:
+def storeMatchReport(coffeeClub : dict, matched : Pairing, counter : int, test : bool, format : str = REPORT_FORMAT, folder : str = csvPath) -> dict:
     """Build and store the Match Report for each match. Match report includes
     number of participants, number of matches, number of 3 way matches, number
     of unmatched people via 2 different methods (attribute from Person object)
@@ -68,12 +83,17 @@ def storeMatchReport(coffeeClub : dict, matched : dict, counter : int, test : bo
     -----------
     coffeeClub : dict
         dictionary containing the person objects for each name extracted
-    matched : dict
-        dictionary containing matches for the week's coffee club
+    matched : Pairing
+        matches for the week's coffee club
     counter : int
         week number being generated - used in testing
     test : bool
         used to return the report to make a combined report across collective tests
+    format : str = REPORT_FORMAT
+        'text' for the readable report, or 'json' or 'ndjson' for a machine
+        readable one
+    folder : str = csvPath
+        folder the report is written to
 
     Returns:
     --------
@@ -83,35 +103,82 @@ def storeMatchReport(coffeeClub : dict, matched : dict, counter : int, test : bo
 
     report = matchReport(coffeeClub=coffeeClub, matched=matched)
     days = getDay(counter)
-    fileName = csvPath + days + '_report.txt'
+    fileName = folder + days + '_report.' + reportExtensions[format]
     
     with open(fileName, 'w', encoding='utf-8') as f:
-        line = 'Match Report: ' + days.replace('to', ' to ') + '\n'
-        line += '=' * 38 + '\n\n'
-        for value in report.values():
-            if type(value['value']) != dict:
-                line += value['text'] + ' ' + str(value['value']) + '\n'
-            else:
-                line += '\n' + value['text'] + '\n'
-                for name in value['value'].keys():
-                    line += name + ',\n'
-                    
-                    line += '    Yet To Meet:\n'
-                    for other in value['value'][name]['yetToMeet']:
-                        line += '    ' + other + ',\n'
-                    
-                    line += '\n    Already Met:\n'
-                    for other in value['value'][name]['alreadyMet']:
-                        line += '    ' + other + ',\n'
-                    
-                    line += '\n'
-                    
-        f.write(line)
+        if format == 'json':
+            writeReportJson(f, report, days)
+        elif format == 'ndjson':
+            writeReportNdjson(f, report, days)
+        else:
+            writeReportText(f, report, days)
 
     if test is True:
         report['days'] = days
         return report
 
+def writeReportText(f, report : dict, days : str) -> None:
+    """Writes the readable Match Report to the open file f a line at a time.
+
+    Parameters:
+    -----------
+    f : file
+        text file open for writing
+    report : dict
+        report built by support.matchReport
+    days : str
+        dates of the week, from support.getDay
+    """
+
+    f.write('Match Report: ' + days.replace('to', ' to ') + '\n')
+    f.write('=' * 38 + '\n\n')
+    for value in report.values():
+        if type(value['value']) != dict:
+            f.write(value['text'] + ' ' + str(value['value']) + '\n')
+            continue
+
+        f.write('\n' + value['text'] + '\n')
+        for name, person in value['value'].items():
+            f.write(name + ',\n')
+
+            f.write('    Yet To Meet:\n')
+            for other in person['yetToMeet']:
+                f.write('    ' + other + ',\n')
+
+            f.write('\n    Already Met:\n')
+            for other in person['alreadyMet']:
+                f.write('    ' + other + ',\n')
+
+            f.write('\n')
+
+def writeReportJson(f, report : dict, days : str) -> None:
+    """Writes the Match Report to the open file f as a single JSON object of
+    each value, with the dates under 'days'.
+    """
+
+    json.dump(_reportValues(report, days), f)
+
+def writeReportNdjson(f, report : dict, days : str) -> None:
+    """Writes the Match Report to the open file f as newline delimited JSON:
+    a summary line of the counts, then one line for each unmatched person, so
+    a large report can be read back a person at a time.
+    """
+
+    summary = _reportValues(report, days)
+    unmatched = summary.pop('unmatched', {})
+    summary['type'] = 'summary'
+    f.write(json.dumps(summary) + '\n')
+    for name, person in unmatched.items():
+        f.write(json.dumps({'type': 'unmatched', 'name': name, 'yetToMeet': person['yetToMeet'], 'alreadyMet': person['alreadyMet']}) + '\n')
+
+def _reportValues(report : dict, days : str) -> dict:
+    """Returns the report's values without their descriptions."""
+
+    values = {'days': days}
+    for key, value in report.items():
+        values[key] = value['value']
+    return values
+
 def storeTestingReports(reports : dict, weeks : int, totalTime : float) -> None:
     """
     """
@@ -128,8 +195,72 @@ def storeTestingReports(reports : dict, weeks : int, totalTime : float) -> None:
     with open(testReportPath.format(weeks), 'w', encoding='utf-8') as f:
         json.dump(tests, f, indent=4)
 
-def storeBackUp(backUp : list) -> str:
+def storeBackUp(backUp : list, etag : str = None) -> str:
+    """Overwrites the stored backup in a single conditional request, so that
+    there is never a moment without a backup and a run cannot overwrite
+    changes made by another run since it read the backup.
+
+    Parameters:
+    -----------
+    backUp : list
+        serialized history of everyone in the club
+    etag : str = None
+        ETag of the backup this run read, or None if there was no backup
+
+    Returns:
+    --------
+    str
+        ETag of the new backup
+
+    Raises:
+    -------
+    BackUpConflict
+        if the backup changed since it was read
+    """
+
+    etag = get_storage().put('matches.json', json.dumps(backUp), etag=etag)
+    storeBackUpCache(backUp, etag)
+    return etag
+
+def storeSchedule(plan : dict, path : str = schedulePath) -> None:
+    """Stores the round robin plan, replacing any previous plan.
+
+    Parameters:
+    -----------
+    plan : dict
+        the plan built by matching.schedule.buildSchedule
+    path : str = schedulePath
+        path of the plan when running locally
     """
+
+    if LOCAL:
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(plan, f)
+    else:
+        get_storage().post('schedule.json', json.dumps(plan), overwrite=True)
+
+def storeMetrics(metrics : RunMetrics, path : str = metricsPath, promPath : str = metricsPromPath) -> None:
+    """Appends the run's metrics as a line of JSON to path, and replaces the
+    Prometheus textfile at promPath with them. Failing to store metrics
+    never fails the run.
+
+    Parameters:
+    -----------
+    metrics : RunMetrics
+        metrics recorded over the run
+    path : str = metricsPath
+        JSON lines file with one line for each run; None to skip
+    promPath : str = metricsPromPath
+        Prometheus textfile for the latest run; None to skip
     """
 
-    return post_file_to_blob('matches.json', json.dumps(backUp))
\ No newline at end of file
+    try:
+        if path is not None:
+            with open(path, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(metrics.serialize()) + '\n')
+        if promPath is not None:
+            with open(promPath + '.tmp', 'w', encoding='utf-8') as f:
+                f.write(metrics.prometheus())
+            os.replace(promPath + '.tmp', promPath)
+    except OSError as e:
+        print(f'Failed to store metrics. Reason: {e}')
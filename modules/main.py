@@ -1,14 +1,29 @@
-from random import randint
+from random import randint, Random
+from datetime import date
 
 from classes.person import Person
-from classes.errors import UnmatchedPersons, ServerError
-from datamgmt.extract import extractExcel, getBackUp
-from config import LOCAL, peoplePath
-from datamgmt.clear import deleteBackUp
-from support import getNames, matchNames, namesNotMatched, addExtras, prepareMatched
-from datamgmt.store import saveMatchedCsv, storeMatchReport, storeBackUp
-
-def buildLists(test : bool = False) -> dict:
+from classes.graph import MeetingGraph
+from classes.pairing import Pairing
+from classes.club import Club
+from matching.blossom import maxMatching, greedyMatching
+from matching.weighted import constrainedMatching
+from matching.incremental import CandidateIndex, CandidateAdjacency
+from classes.errors import UnmatchedPersons
+from classes.metrics import phase, record
+from datamgmt.extract import extractExcel, streamNames, getSchedule
+from datamgmt.history import loadHistory, appendHistory
+from datamgmt.database import loadLocalHistory, storeLocalHistory
+from config import LOCAL, peoplePath, MATCHER, STREAM_ROSTER, SHARD_COLUMN, SHARD_MATCHER, INCREMENTAL
+from support import getNames, getShards, getDay, matchNames, namesNotMatched, addExtras, prepareMatched
+from datamgmt.store import saveMatchedCsv, storeMatchReport, storeSchedule
+from datamgmt.persist import persistRun
+from datamgmt.state import loadRunState, storeRunState
+from datamgmt.storage import get_storage
+from matching.schedule import buildSchedule, scheduleExhausted, scheduleMatch
+from matching.parallel import parallelMatch
+from matching.sharded import shardedMatch, isMixingWeek
+
+def buildLists(test : bool = False, graph : MeetingGraph = None, club : Club = None, historyLoaded : bool = False) -> dict:
     """Builds the person object for each name extracted from the source Excel
     file which has opted in.
 
@@ -16,6 +31,14 @@ def buildLists(test : bool = False) -> dict:
     -----------
     test : bool = False
         apply a random value to OptIn weighted at 75% for In and 25% for Out
+    graph : MeetingGraph = None
+        meeting graph shared by every person; the stored history is loaded
+        into it
+    club : Club = None
+        where the roster and history are kept; the paths in config if None
+    historyLoaded : bool = False
+        graph already holds the stored history, e.g. kept from the last run
+        by datamgmt.state, so it is not loaded again
 
     Returns:
     --------
@@ -23,32 +46,59 @@ def buildLists(test : bool = False) -> dict:
         dictionary containing Person objects for each person to be matched
     """
 
-    df = extractExcel()
-
-    coffeeClub = {}    
-    names = getNames(df, test)
-    backup = getBackUp()
-    if backup is not None:
-        for person in backup:
-            coffeeClub[person['name']] = Person(name=person['name'], guid=person['guid'], alreadyMet=person['alreadyMet'])
+    if graph is None:
+        graph = MeetingGraph()
+    if club is None:
+        club = Club()
 
-    all = [personName for personName, _ in names]
-    for name, guid in names:
-        all.remove(name)
-        
-        if name not in coffeeClub.keys():
-            person = Person(name, guid, all)
+    if not historyLoaded:
+        with phase('history'):
             if LOCAL:
-                person.getAlreadyMet()
-            person.findYetToMeet()
-            coffeeClub[name] = person
+                loadLocalHistory(graph, club.historyDbPath)
+            else:
+                loadHistory(graph, club.historyCachePath)
+
+    with phase('extract'):
+        if STREAM_ROSTER:
+            names = streamNames(club.workbook, club.sheet, test=test)
         else:
-            coffeeClub[name].available = all
+            names = getNames(extractExcel(club.workbook, club.sheet, club.rosterCachePath), test)
+
+    with phase('build'):
+        coffeeClub = buildClub(names, graph)
+    record('participants', len(coffeeClub))
+    record('people', len(graph))
+    return coffeeClub
+
+def buildClub(names, graph : MeetingGraph) -> dict:
+    """Builds the person object for each name, sharing the history held in
+    graph. names is consumed as it is iterated, so it may be a generator
+    streaming rows from the source.
+
+    Parameters:
+    -----------
+    names : iterable
+        (name, guid) tuples of the people who opted in
+    graph : MeetingGraph
+        meeting graph shared by every person
+
+    Returns:
+    --------
+    dict
+        dictionary containing Person objects for each person to be matched
+    """
+
+    coffeeClub = {}
+    for name, guid in names:
+        coffeeClub[name] = Person(name, guid, graph)
+
+    graph.setAvailableIds([person.id for person in coffeeClub.values()])
+    for person in coffeeClub.values():
+        person.findYetToMeet()
 
-        all.append(name)
     return coffeeClub
 
-def randMatch(coffeeClub : dict, name1 : str, match : dict = None) -> bool:
+def randMatch(coffeeClub : dict, name1 : str, match : Pairing = None, rng : Random = None) -> bool:
     """Finds a random match for person matching name1 to a name from name1's
     yetToMeet list. If a match is found, returns True, otherwise returns False.
 
@@ -58,8 +108,11 @@ def randMatch(coffeeClub : dict, name1 : str, match : dict = None) -> bool:
         dictionary containing the person objects for each name extracted
     name1: str
         name to be matched.
-    match : dict
-        dictionary containing matches for the week
+    match : Pairing
+        matches for the week
+    rng : Random = None
+        source of the random draws, so a seeded run can be repeated; the
+        random module if None
 
     Returns:
     --------
@@ -68,7 +121,8 @@ def randMatch(coffeeClub : dict, name1 : str, match : dict = None) -> bool:
     """
 
     if match is None:
-        match = {}
+        match = Pairing()
+    draw = randint if rng is None else rng.randint
 
     if not namesNotMatched(match, name1):
         return True
@@ -79,7 +133,7 @@ def randMatch(coffeeClub : dict, name1 : str, match : dict = None) -> bool:
         if len(matchTried) == len(person1.yetToMeet):
             return False
 
-        num = randint(0, len(person1.yetToMeet) - 1)
+        num = draw(0, len(person1.yetToMeet) - 1)
         if num in matchTried:
             continue
 
@@ -103,7 +157,178 @@ def randMatch(coffeeClub : dict, name1 : str, match : dict = None) -> bool:
     return False
     '''
 
-def runMatch(counter : int = 0, test : bool = False) -> None:
+def blossomMatch(coffeeClub : dict, match : Pairing = None, seed : int = None, candidates : CandidateIndex = None) -> Pairing:
+    """Finds a maximum number of pairs among everyone in coffeeClub who have
+    yet to meet each other using Edmonds' blossom algorithm, and records them
+    in match. Unlike randMatch this never strands people that could have been
+    paired, so a complete pairing is found in a single pass if one exists.
+
+    Parameters:
+    -----------
+    coffeeClub : dict
+        dictionary containing the person objects for each name extracted
+    match : Pairing = None
+        matches for the week
+    seed : int = None
+        seed used to shuffle the order people are considered in, so that
+        weeks with the same history do not always give the same pairs
+    candidates : CandidateIndex = None
+        who cannot meet whom, kept up to date with the graph; if given, each
+        person's candidates are only listed if the matcher needs them, which
+        finds the same pairs without the time growing with the square of
+        the roster
+
+    Returns:
+    --------
+    Pairing
+        matches for the week
+    """
+
+    if match is None:
+        match = Pairing()
+
+    if candidates is None:
+        names, adjacency = _unmatchedAdjacency(coffeeClub, match, seed)
+        start = greedyMatching(adjacency)
+    else:
+        names = _unmatchedNames(coffeeClub, match, seed)
+        adjacency = CandidateAdjacency(candidates, [coffeeClub[name].id for name in names])
+        start = adjacency.greedy()
+    pairs = maxMatching(adjacency, start)
+    for i, j in enumerate(pairs):
+        if i < j:
+            matchNames(match, coffeeClub[names[i]], coffeeClub[names[j]])
+
+    return match
+
+def weightedMatch(coffeeClub : dict, match : Pairing = None, seed : int = None) -> Pairing:
+    """Finds a maximum number of pairs like blossomMatch, but starts from a
+    matching which pairs the most constrained people first: those with the
+    fewest partners left to meet, and among their partners those who have
+    already met the most people. Fewer people are left at the end of their
+    rotation with nobody to meet, so fewer weeks end in UnmatchedPersons and
+    the club reaches everyone having met everyone sooner.
+
+    Parameters:
+    -----------
+    coffeeClub : dict
+        dictionary containing the person objects for each name extracted
+    match : Pairing = None
+        matches for the week
+    seed : int = None
+        seed used to shuffle the order people are considered in, breaking
+        ties between equally constrained people
+
+    Returns:
+    --------
+    Pairing
+        matches for the week
+    """
+
+    if match is None:
+        match = Pairing()
+
+    names, adjacency = _unmatchedAdjacency(coffeeClub, match, seed)
+    priority = [coffeeClub[name].graph.metCount(coffeeClub[name].id) for name in names]
+    pairs = maxMatching(adjacency, constrainedMatching(adjacency, priority))
+    for i, j in enumerate(pairs):
+        if i < j:
+            matchNames(match, coffeeClub[names[i]], coffeeClub[names[j]])
+
+    return match
+
+def _unmatchedAdjacency(coffeeClub : dict, match : Pairing, seed : int = None) -> tuple:
+    """Returns (names, adjacency) for everyone in coffeeClub not yet in
+    match, shuffled by seed, where adjacency[i] lists the positions in names
+    of the people names[i] can meet and who can meet them.
+    """
+
+    names = _unmatchedNames(coffeeClub, match, seed)
+    index = {coffeeClub[name].id: i for i, name in enumerate(names)}
+
+    adjacency = []
+    for name in names:
+        person = coffeeClub[name]
+        graph = person.graph
+        neighbours = []
+        for other in graph.yetToMeet(person.id):
+            j = index.get(other)
+            if j is None:
+                continue
+            if not graph.hasMet(other, person.id):
+                neighbours.append(j)
+        adjacency.append(neighbours)
+
+    return names, adjacency
+
+def _unmatchedNames(coffeeClub : dict, match : Pairing, seed : int = None) -> list:
+    """Returns the names in coffeeClub not yet in match, shuffled by seed."""
+
+    names = [name for name in coffeeClub.keys() if namesNotMatched(match, name)]
+    Random(seed).shuffle(names)
+    return names
+
+def matchWeek(coffeeClub : dict, matcher : str = MATCHER, seed : int = None, plan : dict = None, shards : dict = None, candidates : CandidateIndex = None) -> Pairing:
+    """Matches everyone in coffeeClub for the week using the selected matcher,
+    adding any leftover people to existing matches.
+
+    Parameters:
+    -----------
+    coffeeClub : dict
+        dictionary containing the person objects for each name extracted
+    matcher : str = MATCHER
+        'blossom' for a maximum matching, 'weighted' for a maximum matching
+        favouring the most constrained people, 'greedy' for randMatch,
+        'schedule' to look up the next week of plan or 'sharded' to match
+        within shards
+    seed : int = None
+        seed for the blossom and weighted matchers' ordering and the greedy
+        matcher's draws
+    plan : dict = None
+        round robin plan used by the 'schedule' matcher
+    shards : dict = None
+        name mapped to shard, used by the 'sharded' matcher
+    candidates : CandidateIndex = None
+        who cannot meet whom, used by the 'blossom' and 'schedule' matchers
+        to list candidates only as they are needed
+
+    Returns:
+    --------
+    Pairing
+        matches for the week
+
+    Raises:
+    -------
+    UnmatchedPersons
+        if anyone could not be matched
+    """
+
+    matched = Pairing()
+    with phase('match'):
+        if matcher == 'schedule':
+            scheduleMatch(coffeeClub=coffeeClub, plan=plan, match=matched)
+            blossomMatch(coffeeClub=coffeeClub, match=matched, seed=seed, candidates=candidates)
+        elif matcher == 'blossom':
+            blossomMatch(coffeeClub=coffeeClub, match=matched, seed=seed, candidates=candidates)
+        elif matcher == 'weighted':
+            weightedMatch(coffeeClub=coffeeClub, match=matched, seed=seed)
+        elif matcher == 'sharded':
+            shardedMatch(coffeeClub=coffeeClub, shards=shards, match=matched, seed=seed)
+        else:
+            rng = None if seed is None else Random(seed)
+            for name1 in coffeeClub.keys():
+                randMatch(coffeeClub=coffeeClub, name1=name1, match=matched, rng=rng)
+    
+    if len([name for name, person in coffeeClub.items() if person.matched is False]) > 0:
+        with phase('extras'):
+            addExtras(coffeeClub, matched)
+    
+    if len([name for name, person in coffeeClub.items() if (person.matched is False) or (namesNotMatched(matched, name) and (len(person.yetToMeet) == 0))]) > 0:
+        raise UnmatchedPersons
+
+    return matched
+
+def runMatch(counter : int = 0, test : bool = False, matcher : str = MATCHER, club : Club = None) -> None:
     """Finds a match for each name extracted and save the matches to the Excel
     UI and a backup as a CSV.
 
@@ -113,37 +338,101 @@ def runMatch(counter : int = 0, test : bool = False) -> None:
         week number being generated - used in testing
     test : bool = False
         apply a random value to OptIn weighted at 75% for In and 25% for Out
+    matcher : str = MATCHER
+        'blossom' for a maximum matching, 'weighted' for a maximum matching
+        favouring the most constrained people, 'greedy' for randMatch,
+        'schedule' to follow a precomputed round robin, 'parallel' for
+        seeded greedy attempts across a process pool or 'sharded' to match
+        within each SHARD_COLUMN group in parallel, mixing groups every
+        SHARD_MIX_INTERVAL weeks
+    club : Club = None
+        where the roster, history and outputs are kept; the paths in config
+        if None. With INCREMENTAL set, the meeting graph and who can meet
+        whom are kept in club.runStatePath after each run and only updated
+        with what changed on the next (the history is kept in the database
+        when LOCAL, so they are rebuilt from it instead)
+
+    Returns:
+    --------
+    dict
+        the match report, with the seconds taken storing each output, if
+        test is True, otherwise None
+
+    Raises:
+    -------
+    PersistenceError
+        if any output could not be stored; the history is then left as it
+        was
+    BackUpConflict
+        if another run changed the history since it was loaded
     """
 
-    coffeeClub = buildLists(test)
-    matched = {}
-    for name1 in coffeeClub.keys():
-        randMatch(coffeeClub=coffeeClub, name1=name1, match=matched)
-    
-    if len([name for name, person in coffeeClub.items() if person.matched is False]) > 0:
-        addExtras(coffeeClub, matched)
-    
-    if len([name for name, person in coffeeClub.items() if (person.matched is False) or ((len(person.yetToMeet) == 0) and (namesNotMatched(matched, name)))]) > 0:
-        raise UnmatchedPersons
+    if club is None:
+        club = Club()
 
-    sorted = prepareMatched(coffeeClub, matched)
+    state = None
+    if INCREMENTAL and not LOCAL:
+        with phase('history'):
+            state = loadRunState(club.runStatePath, club.historyCachePath)
+    graph = MeetingGraph() if state is None else state['graph']
+    coffeeClub = buildLists(test, graph, club, historyLoaded=state is not None)
 
-    if LOCAL:
-        for person in coffeeClub.values():
-            person.storeAlreadyMet()
+    candidates = None
+    if INCREMENTAL:
+        with phase('build'):
+            if state is None:
+                candidates = CandidateIndex(graph)
+            else:
+                candidates = state['candidates']
+                candidates.update(graph, graph.changes())
+                record('joined', len(coffeeClub.keys() - state['roster']))
+                record('left', len(state['roster'] - coffeeClub.keys()))
 
-        saveMatchedCsv(matched, counter)
+    plan = None
+    if matcher == 'schedule':
+        with phase('match'):
+            plan = getSchedule(club.schedulePath)
+            if scheduleExhausted(plan):
+                plan = buildSchedule(coffeeClub)
 
-        return storeMatchReport(coffeeClub=coffeeClub, matched=matched, counter=counter, test=test)
+    shards = None
+    if matcher == 'sharded':
+        if SHARD_COLUMN is None or isMixingWeek(date.today().isocalendar()[1] + counter):
+            matcher = SHARD_MATCHER
+        else:
+            shards = getShards(extractExcel(club.workbook, club.sheet, club.rosterCachePath), SHARD_COLUMN)
+
+    if matcher == 'parallel':
+        with phase('match'):
+            matched = parallelMatch(coffeeClub)
     else:
-        backup = []
-        for person in coffeeClub.values():
-            backup.append(person.serialize())
-        try:
-            deleteBackUp()
-        except ServerError:
-            pass
-        
-        url = storeBackUp(backUp=backup)
-        report = storeMatchReport(coffeeClub=coffeeClub, matched=matched, counter=counter, test=test)
+        matched = matchWeek(coffeeClub, matcher, plan=plan, shards=shards, candidates=candidates)
+    outputs = {
+        'report': lambda: storeMatchReport(coffeeClub=coffeeClub, matched=matched, counter=counter, test=test, folder=club.csvPath)
+    }
+    # The history is committed last, once everything else has been stored
+    commits = {}
+    if plan is not None:
+        commits['schedule'] = lambda: storeSchedule(plan, club.schedulePath)
+    if LOCAL:
+        outputs['csv'] = lambda: saveMatchedCsv(matched, counter, club.csvPath)
+        outputs['excel'] = lambda: prepareMatched(coffeeClub, matched, club.dashboardPath)
+        commits['history'] = lambda: storeLocalHistory(graph, getDay(counter), club.historyDbPath)
+    else:
+        commits['history'] = lambda: appendHistory(graph, getDay(counter), club.historyCachePath)
+
+    changes = graph.changes()
+    with phase('persist'):
+        results, timings = persistRun(outputs, commits)
+        get_storage().flush()
+        if INCREMENTAL and not LOCAL:
+            candidates.update(graph, changes)
+            storeRunState(graph, candidates, coffeeClub.keys(), club.runStatePath)
+    # Building the report is part of the persist phase, so it is recorded
+    # as a value rather than a phase, and the phases still add up to the run
+    record('reportSeconds', timings['report'])
 
+    report = results['report']
+    if report is not None:
+        report['persistence'] = {'text': 'Seconds storing each output:', 'value': timings}
+    return report
@@ -0,0 +1,137 @@
+from collections import deque
+
+
+def maxMatching(adjacency : list, match : list = None) -> list:
+    """Finds a maximum cardinality matching of a general graph using Edmonds'
+    blossom algorithm. Runs in O(V^3) regardless of how the graph is shaped,
+    so a complete pairing is found in one pass whenever one exists.
+
+    Parameters:
+    -----------
+    adjacency : list
+        adjacency[v] lists the vertices which vertex v can be matched with
+    match : list = None
+        optional starting matching where match[v] is the vertex matched to v
+        or -1; a greedy start means fewer augmenting paths have to be found
+
+    Returns:
+    --------
+    list
+        match[v] is the vertex matched to v, or -1 if v is unmatched
+    """
+
+    size = len(adjacency)
+    if match is None:
+        match = [-1] * size
+    else:
+        match = list(match)
+
+    # An augmenting path joins two unmatched vertices, so once fewer than
+    # two are left there is nothing more to search for
+    free = match.count(-1)
+    for root in range(size):
+        if free < 2:
+            break
+        if match[root] == -1 and _augment(adjacency, match, root):
+            free -= 2
+
+    return match
+
+def greedyMatching(adjacency : list) -> list:
+    """Builds a maximal (not maximum) matching by pairing each vertex with its
+    first free neighbour, used as a starting point for maxMatching.
+
+    Parameters:
+    -----------
+    adjacency : list
+        adjacency[v] lists the vertices which vertex v can be matched with
+
+    Returns:
+    --------
+    list
+        match[v] is the vertex matched to v, or -1 if v is unmatched
+    """
+
+    match = [-1] * len(adjacency)
+    for v, neighbours in enumerate(adjacency):
+        if match[v] != -1:
+            continue
+        for u in neighbours:
+            if match[u] == -1 and u != v:
+                match[v] = u
+                match[u] = v
+                break
+    return match
+
+def _augment(adjacency : list, match : list, root : int) -> bool:
+    """Searches for an augmenting path from root, contracting odd cycles
+    (blossoms) as they are found, and flips the path into match if one exists.
+    """
+
+    size = len(adjacency)
+    used = [False] * size
+    parent = [-1] * size
+    base = list(range(size))
+
+    used[root] = True
+    queue = deque([root])
+    while queue:
+        v = queue.popleft()
+        for u in adjacency[v]:
+            if base[v] == base[u] or match[v] == u:
+                continue
+
+            if u == root or (match[u] != -1 and parent[match[u]] != -1):
+                current = _lowestCommonAncestor(match, base, parent, v, u)
+                blossom = [False] * size
+                _markPath(match, base, parent, blossom, v, current, u)
+                _markPath(match, base, parent, blossom, u, current, v)
+                for i in range(size):
+                    if blossom[base[i]]:
+                        base[i] = current
+                        if not used[i]:
+                            used[i] = True
+                            queue.append(i)
+
+            elif parent[u] == -1:
+                parent[u] = v
+                if match[u] == -1:
+                    while u != -1:
+                        previous = parent[u]
+                        following = match[previous]
+                        match[u] = previous
+                        match[previous] = u
+                        u = following
+                    return True
+
+                used[match[u]] = True
+                queue.append(match[u])
+
+    return False
+
+def _lowestCommonAncestor(match : list, base : list, parent : list, a : int, b : int) -> int:
+    """Finds the base of the blossom closed by the edge between a and b."""
+
+    seen = set()
+    while True:
+        a = base[a]
+        seen.add(a)
+        if match[a] == -1:
+            break
+        a = parent[match[a]]
+
+    while True:
+        b = base[b]
+        if b in seen:
+            return b
+        b = parent[match[b]]
+
+def _markPath(match : list, base : list, parent : list, blossom : list, v : int, b : int, child : int) -> None:
+    """Marks the vertices on the path from v down to the blossom base b."""
+
+    while base[v] != b:
+        blossom[base[v]] = True
+        blossom[base[match[v]]] = True
+        parent[v] = child
+        child = match[v]
+        v = parent[match[v]]
@@ -0,0 +1,145 @@
+from classes.graph import MeetingGraph
+
+
+class CandidateIndex():
+    """Who each person cannot be paired with: everyone they have met or who
+    has met them. Each person's candidates for the week are everyone else
+    available less this set, so the index takes space in proportion to the
+    history rather than to the square of the roster, people opting in or out
+    only change who is available, and a week of meetings is an update of the
+    pairs that met rather than a rebuild.
+
+    Methods:
+    --------
+    rebuild(graph : MeetingGraph) -> None
+        Builds the index from everyone's history in graph.
+    update(graph : MeetingGraph, changes : dict) -> None
+        Brings the people touched by changes up to date with graph.
+    blocked(a : int) -> set
+        Returns the ids person a cannot be paired with.
+    """
+
+    def __init__(self, graph : MeetingGraph = None):
+        self._blocked = []
+        if graph is not None:
+            self.rebuild(graph)
+
+    def __len__(self) -> int:
+        return len(self._blocked)
+
+    def _grow(self, size : int) -> None:
+        while len(self._blocked) < size:
+            self._blocked.append(set())
+
+    def rebuild(self, graph : MeetingGraph) -> None:
+        """Builds the index from everyone's history in graph, in time
+        proportional to the number of meetings.
+        """
+
+        self._blocked = [set() for _ in range(len(graph))]
+        for a in range(len(graph)):
+            blocked = self._blocked[a]
+            for b in graph.metIds(a):
+                blocked.add(b)
+                self._blocked[b].add(a)
+
+    def update(self, graph : MeetingGraph, changes : dict) -> None:
+        """Brings the people touched by changes up to date with graph. Each
+        pair is checked against graph rather than trusted, so applying the
+        same changes twice does no harm.
+
+        Parameters:
+        -----------
+        graph : MeetingGraph
+            graph the changes were made to
+        changes : dict
+            changes as returned by MeetingGraph.changes
+        """
+
+        self._grow(len(graph))
+        pairs = {(a, b) for a, b in changes['removed']}
+        pairs.update((a, b) for a, b in changes['met'])
+        for a in changes['resets']:
+            pairs.update((a, b) for b in self._blocked[a])
+
+        for a, b in pairs:
+            if graph.hasMet(a, b) or graph.hasMet(b, a):
+                self._blocked[a].add(b)
+                self._blocked[b].add(a)
+            else:
+                self._blocked[a].discard(b)
+                self._blocked[b].discard(a)
+
+    def blocked(self, a : int) -> set:
+        """Returns the ids person a cannot be paired with, which must not be
+        changed.
+        """
+
+        if a >= len(self._blocked):
+            return set()
+        return self._blocked[a]
+
+
+class CandidateAdjacency():
+    """Adjacency for matching.blossom.maxMatching over the people in ids,
+    listing a person's candidates only when the matcher asks for them. Early
+    in a rotation almost everyone can meet everyone, so listing every row
+    up front costs time in proportion to the square of the roster, while a
+    greedy start pairs nearly everyone and leaves the blossom search only a
+    few rows to look at.
+
+    Rows list positions in ids in the order of the people's ids, as
+    _unmatchedAdjacency in main does, so the same pairs are found.
+
+    Methods:
+    --------
+    greedy() -> list
+        Returns the same matching as greedyMatching without listing rows.
+    """
+
+    def __init__(self, candidates : CandidateIndex, ids : list):
+        self._candidates = candidates
+        self._ids = ids
+        self._order = sorted(range(len(ids)), key=ids.__getitem__)
+        self._rows = {}
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    def __getitem__(self, v : int) -> list:
+        row = self._rows.get(v)
+        if row is None:
+            ids = self._ids
+            blocked = self._candidates.blocked(ids[v])
+            row = [u for u in self._order if u != v and ids[u] not in blocked]
+            self._rows[v] = row
+        return row
+
+    def greedy(self) -> list:
+        """Pairs each position with its first free candidate, as
+        greedyMatching does, but walks the free positions rather than the
+        row, so each person costs about as many steps as people they have
+        met.
+
+        Returns:
+        --------
+        list
+            match[v] is the position matched to v, or -1 if v is unmatched
+        """
+
+        ids = self._ids
+        match = [-1] * len(ids)
+        free = dict.fromkeys(self._order)
+        for v in range(len(ids)):
+            if match[v] != -1:
+                continue
+            blocked = self._candidates.blocked(ids[v])
+            for u in free:
+                if u != v and ids[u] not in blocked:
+                    match[v] = u
+                    match[u] = v
+                    break
+            if match[v] != -1:
+                del free[v]
+                del free[match[v]]
+        return match
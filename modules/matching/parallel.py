@@ -0,0 +1,176 @@
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+
+from classes.graph import MeetingGraph
+from classes.pairing import Pairing
+from classes.errors import UnmatchedPersons
+from classes.metrics import record
+from config import ATTEMPTS, ATTEMPT_TIMEOUT, WORKERS
+from matching.pool import get_executor
+
+
+def attemptMatch(graph : MeetingGraph, names : list, matcher : str, seed : int) -> tuple:
+    """Runs one seeded attempt at the week's matches in a worker process.
+
+    Parameters:
+    -----------
+    graph : MeetingGraph
+        copy of the meeting graph, with the week's history
+    names : list
+        list of (name, guid) tuples of the people who opted in
+    matcher : str
+        matcher passed to main.matchWeek
+    seed : int
+        seed for this attempt
+
+    Returns:
+    --------
+    tuple
+        (groups, meetings, complete, score) where groups is the list of
+        groups found, meetings lists the [name, other] meetings the attempt
+        recorded, complete is True if everyone was placed with people they
+        had yet to meet and score is (people placed, groups of two), higher
+        being better
+    """
+
+    from main import buildClub, randMatch, blossomMatch, weightedMatch, matchWeek
+    from support import addExtras
+
+    # The copy carries the parent's pending changes; only this attempt's
+    # meetings are sent back
+    graph.clearChanges()
+    clean = graph.copy()
+    coffeeClub = buildClub(names, graph)
+    try:
+        matched = matchWeek(coffeeClub, matcher, seed=seed)
+    except UnmatchedPersons:
+        # The failed pass has already recorded its meetings, so the fallback
+        # starts again from the history as it was
+        graph = clean
+        coffeeClub = buildClub(names, graph)
+        matched = Pairing()
+        if matcher == 'blossom':
+            blossomMatch(coffeeClub=coffeeClub, match=matched, seed=seed)
+        elif matcher == 'weighted':
+            weightedMatch(coffeeClub=coffeeClub, match=matched, seed=seed)
+        else:
+            rng = random.Random(seed)
+            for name in coffeeClub.keys():
+                randMatch(coffeeClub=coffeeClub, name1=name, match=matched, rng=rng)
+        addExtras(coffeeClub, matched)
+        complete = False
+    else:
+        complete = True
+
+    meetings = [[graph.names[a], graph.names[b]] for a, b in graph.changes()['met']]
+    score = (sum(len(group) for group in matched), len(matched) - matched.numTriples())
+    return (matched.serialize(), meetings, complete, score)
+
+def applyPairing(coffeeClub : dict, groups : list, meetings : list) -> Pairing:
+    """Records groups found by another process against the Person objects in
+    coffeeClub. Only the meetings the attempt recorded are replayed, so the
+    shared history is the same as if main.matchWeek had found the groups
+    here: someone added to a group by support.addExtras has only met the
+    person they were matched with.
+
+    Parameters:
+    -----------
+    coffeeClub : dict
+        dictionary containing the person objects for each name extracted
+    groups : list
+        list of lists of names for each group
+    meetings : list
+        [name, other] for each meeting the attempt recorded
+
+    Returns:
+    --------
+    Pairing
+        matches for the week
+    """
+
+    matched = Pairing(groups)
+    for name, other in meetings:
+        coffeeClub[name].matchName(other)
+    for group in matched:
+        for name in group:
+            coffeeClub[name].matched = True
+
+    return matched
+
+def parallelMatch(coffeeClub : dict, matcher : str = 'greedy', attempts : int = ATTEMPTS, timeout : float = ATTEMPT_TIMEOUT, workers : int = WORKERS, seed : int = None) -> Pairing:
+    """Launches independently seeded attempts at the week's matches across a
+    process pool and keeps the first one which places everyone, cancelling
+    the rest. If none does before every attempt has finished or the timeout
+    passes, the best scoring attempt finished so far is kept, provided it
+    put everyone in a group: the one with the fewest 3 way matches.
+
+    Parameters:
+    -----------
+    coffeeClub : dict
+        dictionary containing the person objects for each name extracted
+    matcher : str = 'greedy'
+        matcher each attempt passes to main.matchWeek
+    attempts : int = ATTEMPTS
+        number of attempts to launch
+    timeout : float = ATTEMPT_TIMEOUT
+        seconds to wait for a complete attempt before giving up
+    workers : int = WORKERS
+        number of worker processes, defaulting to the number of CPUs; not
+        used when a pool is shared with matching.pool.set_executor
+    seed : int = None
+        seed used to draw each attempt's seed
+
+    Returns:
+    --------
+    Pairing
+        matches for the week
+
+    Raises:
+    -------
+    UnmatchedPersons
+        if no attempt which put everyone in a group finished within the
+        timeout
+    """
+
+    if len(coffeeClub) == 0:
+        return Pairing()
+
+    graph = next(iter(coffeeClub.values())).graph
+    names = [(name, person.guid) for name, person in coffeeClub.items()]
+    seeds = random.Random(seed).sample(range(2 ** 31), attempts)
+
+    deadline = time.monotonic() + timeout
+    executor = get_executor()
+    shared = executor is not None
+    if not shared:
+        executor = ProcessPoolExecutor(max_workers=workers)
+    pending = set()
+    best = None
+    try:
+        pending = {executor.submit(attemptMatch, graph, names, matcher, attemptSeed) for attemptSeed in seeds}
+        while len(pending) > 0:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            done, pending = wait(pending, timeout=remaining, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is not None:
+                    continue
+                groups, meetings, complete, score = future.result()
+                if complete:
+                    record('parallelComplete', True)
+                    return applyPairing(coffeeClub, groups, meetings)
+                if best is None or score > best[2]:
+                    best = (groups, meetings, score)
+    finally:
+        if shared:
+            for future in pending:
+                future.cancel()
+        else:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    if best is None or best[2][0] < len(coffeeClub):
+        raise UnmatchedPersons
+    record('parallelComplete', False)
+    return applyPairing(coffeeClub, best[0], best[1])
@@ -0,0 +1,19 @@
+from concurrent.futures import Executor
+
+_executor = None
+
+def get_executor() -> Executor:
+    """Returns the process pool shared by every run in this process, or None
+    if each run should start its own.
+    """
+
+    return _executor
+
+def set_executor(executor : Executor) -> None:
+    """Shares executor between the runs in this process, e.g. the clubs of a
+    batch, so that its worker processes are only started once. None goes
+    back to each run starting its own pool.
+    """
+
+    global _executor
+    _executor = executor
@@ -0,0 +1,136 @@
+from random import Random
+
+from classes.pairing import Pairing
+from support import matchNames
+
+
+def circleSchedule(names : list) -> list:
+    """Builds a full round robin using the circle method: one person is fixed
+    and everyone else rotates one place each week, so after n - 1 weeks (n
+    rounded up to even) every pair has met exactly once. With an odd number
+    of people whoever would sit out joins one of that week's pairs as a 3 way
+    match, rotating which pair is used.
+
+    Parameters:
+    -----------
+    names : list
+        names of everyone in the cycle
+
+    Returns:
+    --------
+    list
+        list of weeks, each a list of tuples of names for each group
+    """
+
+    players = list(names)
+    if len(players) % 2 == 1:
+        players.append(None)
+
+    size = len(players)
+    fixed = players[0]
+    rotating = players[1:]
+    weeks = []
+    for week in range(size - 1):
+        order = [fixed] + rotating
+        groups = []
+        leftover = None
+        for i in range(size // 2):
+            pair = (order[i], order[size - 1 - i])
+            if None in pair:
+                leftover = pair[0] if pair[1] is None else pair[1]
+            else:
+                groups.append(pair)
+
+        if leftover is not None and len(groups) > 0:
+            index = week % len(groups)
+            groups[index] = groups[index] + (leftover,)
+
+        weeks.append(groups)
+        rotating = rotating[-1:] + rotating[:-1]
+
+    return weeks
+
+def buildSchedule(coffeeClub : dict, seed : int = None) -> dict:
+    """Precomputes every remaining week of the cycle for everyone in
+    coffeeClub. Weeks in which every group has already met are dropped, and
+    the weeks with the most new meetings are scheduled first.
+
+    Parameters:
+    -----------
+    coffeeClub : dict
+        dictionary containing the person objects for each name extracted
+    seed : int = None
+        seed used to shuffle the roster before building the cycle
+
+    Returns:
+    --------
+    dict
+        the plan, holding the weeks as lists of groups and the index of the
+        next week to use
+    """
+
+    names = list(coffeeClub.keys())
+    Random(seed).shuffle(names)
+
+    def newMeetings(week : list) -> int:
+        count = 0
+        for group in week:
+            first = coffeeClub[group[0]]
+            for name in group[1:]:
+                other = coffeeClub[name]
+                if not first.graph.hasMet(first.id, other.id):
+                    count += 1
+        return count
+
+    weeks = circleSchedule(names)
+    remaining = [week for week in weeks if newMeetings(week) > 0]
+    if len(remaining) > 0:
+        weeks = remaining
+    weeks.sort(key=newMeetings, reverse=True)
+
+    return {
+        'week': 0,
+        'weeks': [[list(group) for group in week] for week in weeks]
+    }
+
+def scheduleExhausted(plan : dict) -> bool:
+    """Returns True if plan is missing or every week in it has been used."""
+
+    return plan is None or plan['week'] >= len(plan['weeks'])
+
+def scheduleMatch(coffeeClub : dict, plan : dict, match : Pairing = None) -> Pairing:
+    """Looks up the next week of plan and records its groups in match. Anyone
+    who is not in the plan, whose scheduled partners opted out, or who has
+    already met their scheduled partner is left unplaced for the fallback
+    matcher.
+
+    Parameters:
+    -----------
+    coffeeClub : dict
+        dictionary containing the person objects for each name extracted
+    plan : dict
+        plan built by buildSchedule; its week index is advanced
+    match : Pairing = None
+        matches for the week
+
+    Returns:
+    --------
+    Pairing
+        matches for the week
+    """
+
+    if match is None:
+        match = Pairing()
+
+    week = plan['weeks'][plan['week']]
+    plan['week'] += 1
+
+    for group in week:
+        present = [name for name in group if name in coffeeClub and not match.isPlaced(name)]
+        if len(present) < 2:
+            continue
+        first = coffeeClub[present[0]]
+        for name in present[1:]:
+            matchNames(match, first, coffeeClub[name])
+
+    return match
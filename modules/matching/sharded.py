@@ -0,0 +1,160 @@
+import random
+from concurrent.futures import ProcessPoolExecutor
+
+from classes.graph import MeetingGraph
+from classes.pairing import Pairing
+from classes.metrics import record
+from config import SHARD_MATCHER, SHARD_MIX_INTERVAL, WORKERS
+from matching.pool import get_executor
+from support import matchNames
+
+
+def isMixingWeek(week : int, interval : int = SHARD_MIX_INTERVAL) -> bool:
+    """Returns True if week is one in which the whole roster is matched
+    together rather than within shards.
+
+    Parameters:
+    -----------
+    week : int
+        week number, e.g. of the ISO calendar
+    interval : int = SHARD_MIX_INTERVAL
+        weeks between mixing weeks, or 0 to never mix
+    """
+
+    return interval > 0 and week % interval == 0
+
+def partition(coffeeClub : dict, shards : dict) -> dict:
+    """Groups everyone in coffeeClub by their shard, with anyone whose shard
+    is unknown under None.
+
+    Returns:
+    --------
+    dict
+        shard mapped to the list of names in it
+    """
+
+    groups = {}
+    for name in coffeeClub.keys():
+        groups.setdefault(shards.get(name), []).append(name)
+    return groups
+
+def shardGraph(coffeeClub : dict, names : list) -> MeetingGraph:
+    """Returns a meeting graph holding only the people in names and the
+    meetings between them, so that a worker is sent its shard's history
+    rather than everyone's.
+    """
+
+    graph = MeetingGraph(len(names))
+    for name in names:
+        graph.addPerson(name, coffeeClub[name].guid)
+    for name in names:
+        graph.setAlreadyMet(graph.idOf(name), [other for other in coffeeClub[name].alreadyMet if graph.idOf(other) is not None])
+    return graph
+
+def matchShard(graph : MeetingGraph, names : list, matcher : str, seed : int) -> list:
+    """Matches one shard in a worker process. Nobody's history is cleared
+    here, so people who have met everyone in their shard are left over to
+    be matched across shards.
+
+    Parameters:
+    -----------
+    graph : MeetingGraph
+        the shard's history, from shardGraph
+    names : list
+        list of (name, guid) tuples of the people in the shard
+    matcher : str
+        'blossom', 'weighted' or 'greedy'
+    seed : int
+        seed for the matcher
+
+    Returns:
+    --------
+    list
+        list of lists of names for each group found
+    """
+
+    from classes.person import Person
+    from main import blossomMatch, weightedMatch, randMatch
+
+    coffeeClub = {name: Person(name, guid, graph) for name, guid in names}
+    graph.setAvailableIds([person.id for person in coffeeClub.values()])
+
+    matched = Pairing()
+    if matcher == 'weighted':
+        weightedMatch(coffeeClub=coffeeClub, match=matched, seed=seed)
+    elif matcher == 'greedy':
+        rng = random.Random(seed)
+        for name in coffeeClub.keys():
+            randMatch(coffeeClub=coffeeClub, name1=name, match=matched, rng=rng)
+    else:
+        blossomMatch(coffeeClub=coffeeClub, match=matched, seed=seed)
+    return matched.serialize()
+
+def shardedMatch(coffeeClub : dict, shards : dict, match : Pairing = None, matcher : str = SHARD_MATCHER, workers : int = WORKERS, seed : int = None) -> Pairing:
+    """Matches people within their shard, each shard in its own worker
+    process, then pairs whoever is left over across shards in a final pass
+    over the whole club. Each shard is matched independently, so the work
+    is spread over the cores and, for the blossom matcher, shrinks with the
+    cube of the shard size.
+
+    Parameters:
+    -----------
+    coffeeClub : dict
+        dictionary containing the person objects for each name extracted
+    shards : dict
+        name mapped to the shard it is matched within
+    match : Pairing = None
+        matches for the week
+    matcher : str = SHARD_MATCHER
+        'blossom', 'weighted' or 'greedy', used within shards and for the
+        final pass
+    workers : int = WORKERS
+        number of worker processes, defaulting to the number of CPUs; not
+        used when a pool is shared with matching.pool.set_executor
+    seed : int = None
+        seed used to draw each shard's seed
+
+    Returns:
+    --------
+    Pairing
+        matches for the week
+    """
+
+    from main import blossomMatch, weightedMatch, randMatch
+
+    if match is None:
+        match = Pairing()
+
+    groups = partition(coffeeClub, shards)
+    record('shards', len(groups))
+    rng = random.Random(seed)
+    jobs = []
+    for names in groups.values():
+        if len(names) > 1:
+            jobs.append((shardGraph(coffeeClub, names), [(name, coffeeClub[name].guid) for name in names], matcher, rng.randrange(2 ** 31)))
+
+    executor = get_executor()
+    if len(jobs) <= 1 or workers == 1:
+        results = [matchShard(*job) for job in jobs]
+    elif executor is not None:
+        results = list(executor.map(matchShard, *zip(*jobs)))
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            results = list(executor.map(matchShard, *zip(*jobs)))
+
+    for found in results:
+        for group in found:
+            first = coffeeClub[group[0]]
+            for name in group[1:]:
+                matchNames(match, first, coffeeClub[name])
+
+    finalSeed = rng.randrange(2 ** 31)
+    if matcher == 'weighted':
+        weightedMatch(coffeeClub=coffeeClub, match=match, seed=finalSeed)
+    elif matcher == 'greedy':
+        finalRng = random.Random(finalSeed)
+        for name in coffeeClub.keys():
+            randMatch(coffeeClub=coffeeClub, name1=name, match=match, rng=finalRng)
+    else:
+        blossomMatch(coffeeClub=coffeeClub, match=match, seed=finalSeed)
+    return match
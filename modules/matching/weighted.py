@@ -0,0 +1,55 @@
+import heapq
+
+
+def constrainedMatching(adjacency : list, priority : list = None) -> list:
+    """Builds a maximal matching which pairs the most constrained people
+    first: whoever has the fewest free partners left is matched next, with
+    whichever of their partners has the fewest left, so that people near the
+    end of their rotation are not stranded by others taking their last
+    partners. Used as a starting point for maxMatching, whose augmenting
+    paths never unmatch anyone, so everyone paired here stays paired.
+
+    Parameters:
+    -----------
+    adjacency : list
+        adjacency[v] lists the vertices which vertex v can be matched with
+    priority : list = None
+        priority[v] breaks ties between equally constrained partners, the
+        highest going first, e.g. how many people v has already met
+
+    Returns:
+    --------
+    list
+        match[v] is the vertex matched to v, or -1 if v is unmatched
+    """
+
+    size = len(adjacency)
+    if priority is None:
+        priority = [0] * size
+    degree = [len(neighbours) for neighbours in adjacency]
+    match = [-1] * size
+    heap = [(degree[v], v) for v in range(size)]
+    heapq.heapify(heap)
+
+    while heap:
+        d, v = heapq.heappop(heap)
+        if match[v] != -1 or d != degree[v]:
+            continue
+
+        partner = -1
+        for u in adjacency[v]:
+            if match[u] != -1 or u == v:
+                continue
+            if partner == -1 or (degree[u], -priority[u]) < (degree[partner], -priority[partner]):
+                partner = u
+        if partner == -1:
+            continue
+
+        match[v] = partner
+        match[partner] = v
+        for w in adjacency[v] + adjacency[partner]:
+            if match[w] == -1:
+                degree[w] -= 1
+                heapq.heappush(heap, (degree[w], w))
+
+    return match
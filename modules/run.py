@@ -2,9 +2,21 @@ import time
 
 from main import runMatch
 from datamgmt.clear import deleteMatched, deleteBackUp
-from datamgmt.store import storeTestingReports
+from datamgmt.store import storeTestingReports, storeMetrics
+from classes.metrics import startRun, stopRun, RunMetrics
+from classes.club import Club
 from classes.errors import UnmatchedPersons
-from config import LOCAL
+from config import LOCAL, MAX_ATTEMPTS
+
+def resetHistory(club : Club = None) -> None:
+    """Forgets everyone's history so that the next attempt starts fresh."""
+
+    if club is None:
+        club = Club()
+    if LOCAL:
+        deleteMatched(club.historyDbPath)
+    else:
+        deleteBackUp(club.csvPath, club.backUpCachePath, club.historyCachePath)
 
 def funcTest(iter : int = 104, count : int = 0, startTime: float = None, reports : list = None):
     if reports is None:
@@ -13,36 +25,56 @@ def funcTest(iter : int = 104, count : int = 0, startTime: float = None, reports
         deleteBackUp()
         deleteMatched()
         startTime = time.time()
-    broken = False
+    attempts = 0
     while count < iter:
         try:
             reports.append(runMatch(count, test=True))
         except UnmatchedPersons:
-            deleteMatched()
-            funcTest(iter=iter, count=count, startTime=startTime, reports=reports)
-            broken = True
-            break
+            attempts += 1
+            if attempts >= MAX_ATTEMPTS:
+                break
+            resetHistory()
         except Exception as e:
-            completionTime = time.time() - startTime
-            storeTestingReports(reports, count + 1, completionTime)
-            broken = True
-            break
+            # Keep the weeks run so far, but do not pass a failed run off as
+            # a finished one
+            print(f'Week {count} failed. Reason: {type(e).__name__}: {e}')
+            storeTestingReports(reports, count + 1, time.time() - startTime)
+            raise
         else:
+            attempts = 0
             count += 1
-    if not broken:
-        totalTime = time.time() - startTime
-        storeTestingReports(reports, iter, totalTime)
+    totalTime = time.time() - startTime
+    storeTestingReports(reports, count if count == iter else count + 1, totalTime)
 
-def funcRun():
+def funcRun(attempts : int = MAX_ATTEMPTS, club : Club = None) -> RunMetrics:
+    """Runs the week's matches, clearing the history and trying again if
+    anyone could not be matched, up to attempts times. The time spent in each
+    phase is stored with datamgmt.store.storeMetrics whether or not the run
+    succeeds, and returned if it does.
+    """
+
+    if club is None:
+        club = Club()
+    metrics = startRun()
+    metrics.set('success', False)
+    metrics.count('retries', 0)
     try:
-        runMatch()
-    except UnmatchedPersons:
-        if LOCAL:
-            deleteMatched()
-        else:
-            deleteBackUp()
-        funcRun()
+        for attempt in range(attempts):
+            start = time.perf_counter()
+            try:
+                runMatch(club=club)
+            except UnmatchedPersons:
+                metrics.count('retries')
+                with metrics.phase('reset'):
+                    resetHistory(club)
+                metrics.addTime('retries', time.perf_counter() - start)
+            else:
+                metrics.set('success', True)
+                return metrics
+        raise UnmatchedPersons
+    finally:
+        storeMetrics(stopRun(), club.metricsPath, club.metricsPromPath)
 
 
 if __name__ == '__main__':
-    funcRun()
\ No newline at end of file
+    funcRun()
@@ -0,0 +1,389 @@
+"""Long running matching service which keeps the meeting graph in memory
+between requests, so previews take milliseconds rather than a cold start,
+and organisers can try out who opts out before committing a week.
+
+    python service.py [--host 127.0.0.1] [--port 8765]
+
+The API takes and returns JSON:
+
+    GET  /status             roster size, weeks committed and persistence state
+    GET  /history[?name=N]   everyone's history, or one person's
+    POST /roster             {"people": [{"name", "guid", "optedOut"}]} replaces the roster
+    POST /reload             reads the roster and history from storage again
+    POST /preview            {"optOut": [...], "optIn": [...], "seed", "matcher"} tries a week
+    POST /commit             {"id": preview id, "counter": 0} keeps a previewed week
+"""
+import argparse
+import json
+import sys
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs
+
+from classes.club import Club
+from classes.errors import UnmatchedPersons
+from classes.graph import MeetingGraph
+from config import LOCAL, MATCHER, SERVICE_HOST, SERVICE_PORT, PREVIEWS_KEPT, nameColumn, guidColumn, optedOutColumn
+from datamgmt.database import loadLocalHistory, storeLocalHistory
+from datamgmt.extract import extractExcel
+from datamgmt.history import loadHistory, appendHistory
+from datamgmt.persist import persistRun
+from datamgmt.storage import get_storage
+from datamgmt.store import storeMatchReport
+from main import buildClub, matchWeek
+from support import getDay, matchReport
+
+previewMatchers = ('blossom', 'weighted', 'greedy')
+
+
+class MatchService():
+    """Holds a club's roster and meeting graph in memory and serves previews
+    and commits against them. Previews match a copy of the graph, so any
+    number can be tried without changing anything; committing a preview
+    makes its graph the resident one and queues it to be stored on a single
+    background thread, one week after another.
+
+    Attributes:
+    -----------
+    club : Club
+        where the roster, history and outputs are kept
+    graph : MeetingGraph
+        everyone's history, including weeks committed but not yet stored
+    roster : list
+        dict of name, guid and optedOut for everyone in the club
+    weeks : int
+        number of weeks committed since the history was loaded
+    error : str
+        why storing a committed week failed, or None; no more weeks are
+        committed until the service is reloaded
+
+    Methods:
+    --------
+    reload() -> None
+        Reads the roster and history from storage.
+    setRoster(people : list) -> int
+        Replaces the roster.
+    preview(optOut : list, optIn : list, seed : int, matcher : str) -> dict
+        Tries a week's matches without keeping them.
+    commit(previewId : str, counter : int) -> dict
+        Keeps a previewed week and queues it to be stored.
+    history(name : str = None) -> list
+        Returns everyone's history, or one person's.
+    status() -> dict
+        Returns the state of the service.
+    """
+
+    def __init__(self, club : Club = None):
+        self.club = Club() if club is None else club
+        self.graph = None
+        self.roster = []
+        self.weeks = 0
+        self.error = None
+        self._version = None
+        self._previews = OrderedDict()
+        self._pending = []
+        self._lock = threading.Lock()
+        self._persister = ThreadPoolExecutor(max_workers=1)
+
+    def reload(self) -> None:
+        """Reads the roster from the club's workbook and the history from
+        storage, after any weeks still being stored, forgetting previews.
+        """
+
+        self.flush()
+        graph = MeetingGraph()
+        if LOCAL:
+            loadLocalHistory(graph, self.club.historyDbPath)
+        else:
+            loadHistory(graph, self.club.historyCachePath)
+        df = extractExcel(self.club.workbook, self.club.sheet, self.club.rosterCachePath)
+        # Only an explicit False is opted in, as support.getNames reads it,
+        # so previews match the same roster as runMatch
+        optedIn = df[optedOutColumn] == False
+        roster = [
+            {'name': name, 'guid': guid, 'optedOut': not bool(isIn)}
+            for name, guid, isIn in zip(df[nameColumn], df[guidColumn], optedIn)
+        ]
+
+        with self._lock:
+            self.graph = graph
+            self.roster = roster
+            self.weeks = 0
+            self.error = None
+            self._version = graph.version
+            self._previews.clear()
+
+    def setRoster(self, people : list) -> int:
+        """Replaces the roster, e.g. with this week's export, returning the
+        number of people in it. Previews of the old roster can no longer be
+        committed.
+        """
+
+        roster = [{'name': p['name'], 'guid': p.get('guid'), 'optedOut': bool(p.get('optedOut', False))} for p in people]
+        with self._lock:
+            self.roster = roster
+            self._previews.clear()
+        return len(roster)
+
+    def preview(self, optOut : list = None, optIn : list = None, seed : int = None, matcher : str = None) -> dict:
+        """Matches the week on a copy of the resident graph, with the people
+        in optOut left out and those in optIn included whatever the roster
+        says.
+
+        Returns:
+        --------
+        dict
+            the preview's id, the groups found, the match report and the
+            milliseconds taken
+
+        Raises:
+        -------
+        ValueError
+            if matcher cannot be previewed
+        UnmatchedPersons
+            if anyone could not be matched
+        """
+
+        if matcher is None:
+            matcher = MATCHER if MATCHER in previewMatchers else 'blossom'
+        if matcher not in previewMatchers:
+            raise ValueError(f'Matcher {matcher} cannot be previewed; use one of {", ".join(previewMatchers)}')
+
+        start = time.perf_counter()
+        optOut = set(optOut or [])
+        optIn = set(optIn or [])
+        with self._lock:
+            graph = self.graph.copy()
+            roster = self.roster
+            weeks = self.weeks
+
+        names = [(p['name'], p['guid']) for p in roster if p['name'] in optIn or not (p['optedOut'] or p['name'] in optOut)]
+        coffeeClub = buildClub(names, graph)
+        matched = matchWeek(coffeeClub, matcher, seed=seed)
+        report = {key: value['value'] for key, value in matchReport(coffeeClub, matched).items()}
+
+        previewId = uuid.uuid4().hex
+        with self._lock:
+            self._previews[previewId] = {'graph': graph, 'coffeeClub': coffeeClub, 'matched': matched, 'weeks': weeks, 'roster': roster}
+            while len(self._previews) > PREVIEWS_KEPT:
+                self._previews.popitem(last=False)
+
+        return {
+            'id': previewId,
+            'groups': matched.serialize(),
+            'report': report,
+            'ms': (time.perf_counter() - start) * 1000
+        }
+
+    def commit(self, previewId : str, counter : int = 0) -> dict:
+        """Keeps a previewed week: its graph becomes the resident one and the
+        week is queued to be stored in the background, in the order weeks
+        were committed.
+
+        Returns:
+        --------
+        dict
+            the week committed and the number of weeks still being stored
+
+        Raises:
+        -------
+        KeyError
+            if there is no such preview
+        RuntimeError
+            if the preview is of an older week or roster, or storing an
+            earlier week failed
+        """
+
+        with self._lock:
+            if self.error is not None:
+                raise RuntimeError(f'Storing an earlier week failed, reload first: {self.error}')
+            preview = self._previews[previewId]
+            if preview['weeks'] != self.weeks or preview['roster'] is not self.roster:
+                raise RuntimeError('The preview is out of date; preview the week again')
+
+            graph = preview['graph']
+            frozen = graph.copy()
+            graph.clearChanges()
+            self.graph = graph
+            self.weeks += 1
+            del self._previews[previewId]
+            week = getDay(counter)
+            future = self._persister.submit(self._persist, frozen, preview['coffeeClub'], preview['matched'], counter)
+            self._pending.append(future)
+            self._pending = [pending for pending in self._pending if not pending.done()]
+            return {'week': week, 'weeks': self.weeks, 'pending': len(self._pending)}
+
+    def _persist(self, graph : MeetingGraph, coffeeClub : dict, matched, counter : int) -> None:
+        """Stores a committed week on the persistence thread, starting from
+        where the previous week's store left the history.
+        """
+
+        club = self.club
+        if not LOCAL:
+            graph.version = self._version
+        outputs = {'report': lambda: storeMatchReport(coffeeClub=coffeeClub, matched=matched, counter=counter, test=False, folder=club.csvPath)}
+        if LOCAL:
+            commits = {'history': lambda: storeLocalHistory(graph, getDay(counter), club.historyDbPath)}
+        else:
+            commits = {'history': lambda: appendHistory(graph, getDay(counter), club.historyCachePath)}
+        try:
+            persistRun(outputs, commits)
+            get_storage().flush()
+        except Exception as e:
+            with self._lock:
+                self.error = f'{type(e).__name__}: {e}'
+            raise
+        self._version = graph.version
+
+    def flush(self) -> None:
+        """Waits for every committed week to be stored."""
+
+        for future in list(self._pending):
+            try:
+                future.result()
+            except Exception:
+                pass
+        self._pending = []
+
+    def history(self, name : str = None) -> list:
+        """Returns everyone's history in the backup format, or only that of
+        the person called name.
+
+        Raises:
+        -------
+        KeyError
+            if nobody is called name
+        """
+
+        with self._lock:
+            graph = self.graph
+            if name is None:
+                return graph.serialize()
+            a = graph.idOf(name)
+            if a is None:
+                raise KeyError(name)
+            return [{'name': name, 'guid': graph.guids[a], 'alreadyMet': graph.alreadyMet(a)}]
+
+    def status(self) -> dict:
+        """Returns the size of the roster and history, the weeks committed
+        and how many are still being stored.
+        """
+
+        with self._lock:
+            return {
+                'club': self.club.name,
+                'roster': len(self.roster),
+                'optedIn': sum(1 for p in self.roster if not p['optedOut']),
+                'people': 0 if self.graph is None else len(self.graph),
+                'weeks': self.weeks,
+                'pending': sum(1 for future in self._pending if not future.done()),
+                'previews': len(self._previews),
+                'error': self.error
+            }
+
+    def close(self) -> None:
+        """Stores any committed weeks and stops the persistence thread."""
+
+        self.flush()
+        self._persister.shutdown()
+
+
+class _Handler(BaseHTTPRequestHandler):
+    """Serves the JSON API for the MatchService in service."""
+
+    protocol_version = 'HTTP/1.1'
+    service = None
+
+    def log_message(self, *args) -> None:
+        pass
+
+    def _send(self, code : int, body) -> None:
+        data = json.dumps(body).encode('utf-8')
+        self.send_response(code)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _body(self) -> dict:
+        length = int(self.headers.get('Content-Length') or 0)
+        return json.loads(self.rfile.read(length)) if length else {}
+
+    def do_GET(self) -> None:
+        url = urlparse(self.path)
+        query = parse_qs(url.query)
+        try:
+            if url.path == '/status':
+                return self._send(200, self.service.status())
+            if url.path == '/history':
+                return self._send(200, self.service.history(query.get('name', [None])[0]))
+        except KeyError as e:
+            return self._send(404, {'error': f'Nobody called {e.args[0]}'})
+        except (AttributeError, TypeError, ValueError) as e:
+            return self._send(400, {'error': f'Bad request: {e}'})
+        return self._send(404, {'error': f'No such resource {url.path}'})
+
+    def do_POST(self) -> None:
+        url = urlparse(self.path)
+        try:
+            body = self._body()
+            if url.path == '/roster':
+                return self._send(200, {'roster': self.service.setRoster(body['people'])})
+            if url.path == '/reload':
+                self.service.reload()
+                return self._send(200, self.service.status())
+            if url.path == '/preview':
+                return self._send(200, self.service.preview(body.get('optOut'), body.get('optIn'), body.get('seed'), body.get('matcher')))
+            if url.path == '/commit':
+                return self._send(202, self.service.commit(body['id'], body.get('counter', 0)))
+        except UnmatchedPersons:
+            return self._send(409, {'error': 'Not everyone could be matched'})
+        except RuntimeError as e:
+            return self._send(409, {'error': str(e)})
+        except KeyError as e:
+            return self._send(404 if url.path == '/commit' else 400, {'error': f'Missing or unknown {e.args[0]}'})
+        except ValueError as e:
+            return self._send(400, {'error': str(e)})
+        except (AttributeError, TypeError) as e:
+            # e.g. a body which is not a JSON object
+            return self._send(400, {'error': f'Bad request: {e}'})
+        return self._send(404, {'error': f'No such resource {url.path}'})
+
+
+def serve(service : MatchService, host : str = SERVICE_HOST, port : int = SERVICE_PORT) -> ThreadingHTTPServer:
+    """Returns a server for service's API on host and port, ready for
+    serve_forever.
+    """
+
+    class Handler(_Handler):
+        pass
+    Handler.service = service
+
+    return ThreadingHTTPServer((host, port), Handler)
+
+def main(argv : list = None) -> int:
+    parser = argparse.ArgumentParser(description='Serves previews and commits of the week\'s matches over HTTP.')
+    parser.add_argument('--host', default=SERVICE_HOST, help='address to listen on')
+    parser.add_argument('--port', type=int, default=SERVICE_PORT, help='port to listen on')
+    args = parser.parse_args(argv)
+
+    service = MatchService()
+    service.reload()
+    server = serve(service, args.host, args.port)
+    print(f'Serving on http://{args.host}:{server.server_address[1]}')
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        service.close()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
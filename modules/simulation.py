@@ -0,0 +1,187 @@
+import time
+from random import Random
+
+from classes.graph import MeetingGraph
+from classes.errors import UnmatchedPersons
+from config import MATCHER, MAX_ATTEMPTS, nameColumn, guidColumn
+from datamgmt.extract import extractExcel
+from datamgmt.store import storeTestingReports
+from main import buildClub, matchWeek
+from matching.schedule import buildSchedule, scheduleExhausted
+from support import getDay, matchReport
+
+
+def loadRoster() -> list:
+    """Reads everyone in the source Excel file once, ignoring OptedOut since
+    the simulation chooses who opts out each week.
+
+    Returns:
+    --------
+    list
+        list of (name, guid) tuples
+    """
+
+    df = extractExcel()
+    return list(zip(df[nameColumn], df[guidColumn]))
+
+def simulateTrial(roster : list, weeks : int, rng : Random, matcher : str = MATCHER, trial : int = 0) -> list:
+    """Simulates weeks of matches for roster entirely in memory. Each week a
+    random quarter of the roster opts out, as with runMatch's test mode. If a
+    week cannot be matched the history is cleared and the week is tried
+    again, as run.funcTest does. Each report records the share of pairs in
+    the roster that have met at least once so far as coverage.
+
+    Parameters:
+    -----------
+    roster : list
+        list of (name, guid) tuples for everyone in the club
+    weeks : int
+        number of weeks to simulate
+    rng : Random
+        source of randomness for opt outs and the matchers
+    matcher : str = MATCHER
+        matcher passed to main.matchWeek
+    trial : int = 0
+        trial number recorded in each report
+
+    Returns:
+    --------
+    list
+        match report for each week, in the format returned by
+        store.storeMatchReport
+    """
+
+    reports = []
+    index = {name: i for i, (name, _) in enumerate(roster)}
+    pairs = len(roster) * (len(roster) - 1) // 2
+    covered = set()
+    graph = MeetingGraph(len(roster))
+    plan = None
+    resets = 0
+    week = 0
+    attempts = 0
+    while week < weeks:
+        names = [entry for entry in roster if rng.randint(0, 1) * rng.randint(0, 1) == 0]
+        coffeeClub = buildClub(names, graph)
+        if matcher == 'schedule' and scheduleExhausted(plan):
+            plan = buildSchedule(coffeeClub, seed=rng.random())
+
+        try:
+            matched = matchWeek(coffeeClub, matcher, seed=rng.random(), plan=plan)
+        except UnmatchedPersons:
+            resets += 1
+            attempts += 1
+            if attempts >= MAX_ATTEMPTS:
+                break
+            graph = MeetingGraph(len(roster))
+            plan = None
+            continue
+
+        for group in matched:
+            ids = sorted(index[name] for name in group)
+            covered.update((a, b) for i, a in enumerate(ids) for b in ids[i + 1:])
+
+        report = matchReport(coffeeClub=coffeeClub, matched=matched)
+        report['days'] = getDay(week)
+        report['trial'] = trial
+        report['resets'] = resets
+        report['coverage'] = len(covered) / pairs if pairs else 1.0
+        reports.append(report)
+        attempts = 0
+        week += 1
+
+    return reports
+
+def simulate(weeks : int = 104, trials : int = 1, seed : int = None, matcher : str = MATCHER, roster : list = None) -> list:
+    """Runs seeded trials of simulated weeks without reading or writing any
+    files along the way, storing one combined testing report at the end.
+
+    Parameters:
+    -----------
+    weeks : int = 104
+        number of weeks in each trial
+    trials : int = 1
+        number of independent trials
+    seed : int = None
+        seed for the whole simulation; the same seed gives the same reports
+    matcher : str = MATCHER
+        matcher passed to main.matchWeek
+    roster : list = None
+        list of (name, guid) tuples; read from the source Excel file if None
+
+    Returns:
+    --------
+    list
+        match report for each simulated week across every trial
+    """
+
+    startTime = time.time()
+    if roster is None:
+        roster = loadRoster()
+
+    rng = Random(seed)
+    reports = []
+    for trial in range(trials):
+        reports.extend(simulateTrial(roster, weeks, rng, matcher, trial))
+
+    totalTime = time.time() - startTime
+    storeTestingReports(reports, weeks * trials, totalTime)
+    return reports
+
+def compareMatchers(matchers : list = ('blossom', 'weighted'), weeks : int = 104, trials : int = 5, seed : int = None, roster : list = None) -> dict:
+    """Simulates the same trials with each matcher and compares how many
+    weeks each takes until every pair in the roster has met, and how often
+    a week could not be matched and the history was cleared. Each matcher
+    starts from the same seed, so they see the same opt outs until their
+    histories differ.
+
+    Parameters:
+    -----------
+    matchers : list = ('blossom', 'weighted')
+        matchers passed to main.matchWeek
+    weeks : int = 104
+        number of weeks in each trial
+    trials : int = 5
+        number of trials for each matcher
+    seed : int = None
+        seed for the simulation
+    roster : list = None
+        list of (name, guid) tuples; read from the source Excel file if None
+
+    Returns:
+    --------
+    dict
+        for each matcher, the mean weeks to full coverage over the trials
+        that reached it (None if none did), how many trials reached it, the
+        mean resets per trial and the mean coverage at the end
+    """
+
+    if roster is None:
+        roster = loadRoster()
+
+    comparison = {}
+    for matcher in matchers:
+        rng = Random(seed)
+        completions = []
+        resets = []
+        coverage = []
+        for trial in range(trials):
+            reports = simulateTrial(roster, weeks, rng, matcher, trial)
+            complete = next((week + 1 for week, report in enumerate(reports) if report['coverage'] >= 1.0), None)
+            if complete is not None:
+                completions.append(complete)
+            resets.append(reports[-1]['resets'] if reports else 0)
+            coverage.append(reports[-1]['coverage'] if reports else 0.0)
+
+        comparison[matcher] = {
+            'weeksToCoverage': sum(completions) / len(completions) if completions else None,
+            'completed': len(completions),
+            'trials': trials,
+            'resets': sum(resets) / trials,
+            'coverage': sum(coverage) / trials
+        }
+    return comparison
+
+
+if __name__ == '__main__':
+    simulate()
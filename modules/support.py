@@ -1,10 +1,15 @@
+from __future__ import annotations
+
 import os
-from pandas import DataFrame
 from datetime import datetime, timedelta
+from typing import TYPE_CHECKING
 
 from classes.person import Person
-from config import LOCAL
-from datamgmt.store import saveMatchedExcel
+from classes.pairing import Pairing
+from config import LOCAL, nameColumn, guidColumn, optedOutColumn, SHARD_COLUMN
+
+if TYPE_CHECKING:
+    from pandas import DataFrame
 
 def fileExists(path : str) -> bool:
     """Determines if a path exists.
@@ -35,28 +40,46 @@ def getNames(df : DataFrame, test : bool = False) -> list:
     Returns:
     --------
     list
-        list of names extracted
+        list of (name, guid) tuples extracted
     """
 
-    names = []
     if test is True:
         from random import randint
-        df['OptedOut'] = df['OptedOut'].apply(lambda x: False if randint(0, 1) * randint(0, 1) == 0 else True)
-    df = df.loc[df['OptedOut'] == False]
+        optedIn = [randint(0, 1) * randint(0, 1) == 0 for _ in df.index]
+    else:
+        optedIn = df[optedOutColumn] == False
+    df = df.loc[optedIn]
+
+    return list(zip(df[nameColumn], df[guidColumn]))
+
+def getShards(df : DataFrame, column : str = SHARD_COLUMN) -> dict:
+    """Retrieves the group each person is matched within by the 'sharded'
+    matcher.
+
+    Parameters:
+    -----------
+    df : DataFrame
+        DataFrame containing names for the coffee club
+    column : str = SHARD_COLUMN
+        column holding each person's group, e.g. their office
 
-    for index in df.index:
-        names.append((df.loc[index, 'Full Name'], df.loc[index, '(Do Not Modify) Participant']))
+    Returns:
+    --------
+    dict
+        name mapped to group, or None where the group is blank
+    """
 
-    return names
+    groups = df[column].where(df[column].notna(), None)
+    return dict(zip(df[nameColumn], groups))
 
-def namesNotMatched(match : dict, name1 : str, name2 : str = '') -> bool:
-    """Determines if names are in match dictionary; if so, return True,
+def namesNotMatched(match : Pairing, name1 : str, name2 : str = '') -> bool:
+    """Determines if names are in match; if neither is, return True,
     otherwise return False.
 
     Parameters:
     -----------
-    match : dict
-        dictionary containing matches accumulated so far
+    match : Pairing
+        matches accumulated so far
     name1 : str
         first name to be checked
     name2 : str = ''
@@ -65,28 +88,26 @@ def namesNotMatched(match : dict, name1 : str, name2 : str = '') -> bool:
     Returns:
     --------
     bool
-        if either name is found in match, returns True, otherwise returns False
+        if either name is found in match, returns False, otherwise returns True
     """
 
-    if name2 != '':
-        return namesNotMatched(match, name2)
-    
-    if name1 in match.keys():
+    if match.isPlaced(name1):
         return False
-        
-    if name1 in match.values():
+
+    if name2 != '' and match.isPlaced(name2):
         return False
 
     return True
 
-def matchNames(match : dict, person1 : Person, person2 : Person) -> bool:
+def matchNames(match : Pairing, person1 : Person, person2 : Person) -> bool:
     """If person1 and person2 have not already been matched with each other,
-    match them together and update the match dictionary accordingly.
+    match them together and update match accordingly. If person1 is already in
+    a pair, person2 joins that pair as a 3 way match.
 
     Parameters:
     -----------
-    match : dict
-        dictionary containing matches accumulated so far
+    match : Pairing
+        matches accumulated so far
     person1 : Person
         first person to match
     person2 : Person
@@ -99,32 +120,26 @@ def matchNames(match : dict, person1 : Person, person2 : Person) -> bool:
         returns False
     """
 
+    group = match.groupOf(person1.name)
+    if group is not None and len(match.members(group)) >= 3:
+        return False
+
     if not person1.matchName(person2.name):
         return False
 
     if not person2.matchName(person1.name):
-        person1.revert(person1.name)
+        person1.revert(person2.name)
+        person1.matched = group is not None
         return False
 
-    if namesNotMatched(match=match, name1=person1.name):
-        match[person1.name] = person2.name
+    if group is None:
+        match.addGroup(person1.name, person2.name)
     else:
-        if person1.name in match.keys():
-            nameKey = person1.name
-        
-        elif person1.name in match.values():
-            for name1, name2 in match.items():
-                if person1.name == name2:
-                    nameKey = name1
-                    break
-        
-        if '/' in match[nameKey]:
-            return False
-        match[nameKey] += '/' + person2.name
+        match.addToGroup(group, person2.name)
 
     return True
 
-def addExtras(coffeeClub : dict, matched : dict) -> None:
+def addExtras(coffeeClub : dict, matched : Pairing) -> None:
     """Instances where there is an odd number of people to be matched, or
     people who could not be matched with remaining individuals, matches
     outlyers to an existing match where the individuals have not already met
@@ -134,47 +149,28 @@ def addExtras(coffeeClub : dict, matched : dict) -> None:
     -----------
     coffClub : dict
         dictionary of Person objects
-    matched : dict
-        dictionary of accululated matches so far
+    matched : Pairing
+        accululated matches so far
     """
 
-    missing = []
-    for name in coffeeClub.keys():
-        if name not in matched.keys() and name not in matched.values():
-            missing.append(name)
+    missing = [name for name in coffeeClub.keys() if not matched.isPlaced(name)]
 
     for name in missing:
         person = coffeeClub[name]
         hasMatched = False
-        if len(person.yetToMeet) > 0:
-            for other in person.yetToMeet:
-                for name1, name2 in matched.items():
-
-                    if other == name1:
-                        matchNames(matched, coffeeClub[name1], person)
-                        if person.matched is True:
-                            hasMatched = True
-                            break
-
-                    elif other == name2:
-                        matchNames(matched, coffeeClub[name2], person)
-                        if person.matched is True:
-                            hasMatched = True
-                            break
-                if hasMatched is True:
+        for other in list(person.yetToMeet):
+            if matched.isPlaced(other):
+                matchNames(matched, coffeeClub[other], person)
+                if person.matched is True:
+                    hasMatched = True
                     break
-            if hasMatched is True:
-                continue
 
-        if len(person.yetToMeet) == 0 or hasMatched is False:
-            for name1, name2 in matched.items():
-                if '/' not in name2:
-                    matched[name1] = name2 + '/' + name
+        if hasMatched is False:
+            for index, group in enumerate(matched.groups):
+                if len(group) < 3:
+                    matched.addToGroup(index, name)
                     person.matched = True
                     break
-            continue
-
-        
 
 def getDay(counter : int) -> str:
     """Builds the date string for the week.
@@ -200,77 +196,107 @@ def getDay(counter : int) -> str:
     dateString = startDay.strftime('%Y-%m-%d') + 'to' + endDay.strftime('%Y-%m-%d')
     return dateString
 
-def matchReport(coffeeClub : dict, matched : dict) -> dict:
-    """Generates values for Match Report.
+def matchReport(coffeeClub : dict, matched : Pairing) -> dict:
+    """Generates values for Match Report in a single pass over the matches and
+    a single pass over coffeeClub, so it stays linear for large clubs.
 
     Parameters:
     -----------
     coffeeClub : dict
         dictionary containing the person objects for each name extracted
-    matched : dict
-        dictionary containing matches for the week's coffee club
+    matched : Pairing
+        matches for the week's coffee club
     
     Returns:
     --------
     dict
         dictionary containing the report contents for the weeks Match Report
     """
+
+    numMatches = 0
+    numTriple = 0
+    for group in matched:
+        numMatches += 1
+        if len(group) == 3:
+            numTriple += 1
+
+    numPeople = 0
+    numUnmatched = 0
+    unmatched = {}
+    for name, person in coffeeClub.items():
+        numPeople += 1
+        if person.matched is False:
+            numUnmatched += 1
+        if person.matched is False or not matched.isPlaced(name):
+            unmatched[name] = {'yetToMeet': person.yetToMeet, 'alreadyMet': person.alreadyMet}
+
     report = {}
     report['numPeople'] = {
-        'value': len(coffeeClub.keys()),
+        'value': numPeople,
         'text': 'Number of People:'
     }
     report['numMatches'] = {
-        'value': len(matched.keys()),
+        'value': numMatches,
         'text': 'Number of Matches:'
     }
     report['numTriple'] = {
-        'value': len([name2 for name2 in matched.values() if '/' in name2]),
+        'value': numTriple,
         'text': 'Number of 3 way matches:'
     }
     report['numUnmatched1'] = {
-        'value': len([person for person in coffeeClub.values() if not person.matched]),
+        'value': numUnmatched,
         'text': 'Number of Unmatched People (found by method 1):'
     }
     report['numUnmatched2'] = {
-        'value': report['numPeople']['value'] - 2 * report['numMatches']['value'] - report['numTriple']['value'],
+        'value': numPeople - 2 * numMatches - numTriple,
         'text': 'Number of Unmatched People (found by method 2):'
     }
     report['unmatchedMatch'] = {
-        'value': report['numUnmatched1']['value'] == report['numUnmatched2']['value'],
+        'value': numUnmatched == numPeople - 2 * numMatches - numTriple,
         'text': 'Number of Unmatched People found from each method Match:'
     }
     report['unmatched'] = {
-        'value': {name: {'yetToMeet': person.yetToMeet, 'alreadyMet': person.alreadyMet} for name, person in coffeeClub.items() if person.matched is False or (name not in matched.keys() and len([name2 for name2 in matched.values() if name in name2]) == 0)},
+        'value': unmatched,
         'text': 'Names of Unmatched Persons'
     }
     return report
 
-def prepareMatched(coffeeClub : dict, matched : list) -> list:
-    """
+def prepareMatched(coffeeClub : dict, matched : Pairing, dashboardPath : str = None) -> list:
+    """Builds a row for each match containing the names and GUIDs of each
+    participant, saved to the Excel dashboard when running locally.
+
+    Parameters:
+    -----------
+    coffeeClub : dict
+        dictionary containing the person objects for each name extracted
+    matched : Pairing
+        matches for the week's coffee club
+    dashboardPath : str = None
+        path of the Excel dashboard, if not the default
+
+    Returns:
+    --------
+    list
+        list of dictionaries for each match if not running locally
     """
 
     matchedFinal = []
-    for name1, name2 in matched.items():
+    for group in matched:
         match = {'ParticipantA': None, 'GUID_ParticipantA': None, 'ParticipantB': None, 'GUID_ParticipantB': None, 'ParticipantC': None, 'GUID_ParticipantC': None}
 
-        match['ParticipantA'] = name1
-        match['GUID_ParticipantA'] = coffeeClub[name1].guid
-
-        if '/' in name2:
-            names = name2.split('/')
-            match['ParticipantB'] = names[0]
-            match['ParticipantC'] = names[1]
-            match['GUID_ParticipantB'] = coffeeClub[names[0]].guid
-            match['GUID_ParticipantC'] = coffeeClub[names[1]].guid
-        else:
-            match['ParticipantB'] = name2
-            match['GUID_ParticipantB'] = coffeeClub[name2].guid
+        for letter, name in zip('ABC', group):
+            match['Participant' + letter] = name
+            match['GUID_Participant' + letter] = coffeeClub[name].guid
         
         matchedFinal.append(match)
 
     if LOCAL:
-        saveMatchedExcel(matched=matchedFinal)
+        from datamgmt.store import saveMatchedExcel
+
+        if dashboardPath is None:
+            saveMatchedExcel(matched=matchedFinal)
+        else:
+            saveMatchedExcel(matched=matchedFinal, fileName=dashboardPath)
     else:
         return matchedFinal
 
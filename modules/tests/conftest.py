@@ -0,0 +1,21 @@
+import os
+import sys
+
+import pytest
+
+# The modules import each other by top level name, as when run from modules
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture
+def storage():
+    """Runs the test against a fresh MemoryStorage as the process wide
+    backend.
+    """
+
+    from datamgmt.storage import set_storage, MemoryStorage
+
+    backend = MemoryStorage()
+    set_storage(backend)
+    yield backend
+    set_storage(None)
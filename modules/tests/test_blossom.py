@@ -0,0 +1,67 @@
+from itertools import combinations
+from random import Random
+
+import pytest
+
+from matching.blossom import maxMatching, greedyMatching
+
+
+def randomGraph(rng, size, density) -> list:
+    adjacency = [[] for _ in range(size)]
+    for a, b in combinations(range(size), 2):
+        if rng.random() < density:
+            adjacency[a].append(b)
+            adjacency[b].append(a)
+    return adjacency
+
+def bruteForce(adjacency) -> int:
+    """Returns the size of a maximum matching by trying every edge."""
+
+    def best(free):
+        if len(free) < 2:
+            return 0
+        v = min(free)
+        rest = free - {v}
+        found = best(rest)
+        for u in adjacency[v]:
+            if u in rest:
+                found = max(found, 1 + best(rest - {u}))
+        return found
+
+    return best(frozenset(range(len(adjacency))))
+
+def pairs(adjacency, match) -> int:
+    for v, u in enumerate(match):
+        if u != -1:
+            assert match[u] == v
+            assert u in adjacency[v]
+    return sum(1 for v, u in enumerate(match) if u > v)
+
+
+@pytest.mark.parametrize('density', [0.2, 0.4, 0.7])
+def test_finds_a_maximum_matching(density):
+    rng = Random(11)
+    for _ in range(60):
+        adjacency = randomGraph(rng, rng.randint(1, 10), density)
+
+        assert pairs(adjacency, maxMatching(adjacency)) == bruteForce(adjacency)
+
+def test_greedy_start_gives_the_same_size():
+    rng = Random(12)
+    for _ in range(60):
+        adjacency = randomGraph(rng, rng.randint(1, 10), 0.4)
+        start = greedyMatching(adjacency)
+
+        assert pairs(adjacency, maxMatching(adjacency, start)) == bruteForce(adjacency)
+
+def test_augments_through_a_blossom():
+    # The only augmenting path from the free 0 is 0-1=2-6=5-4=3-7, round the
+    # odd cycle 2-3-4-5-6 and out through 3, which the search first reaches
+    # as an inner vertex, so the cycle has to be contracted to find it
+    adjacency = [[1], [0, 2], [1, 3, 6], [2, 4, 7], [3, 5], [4, 6], [5, 2], [3]]
+    start = [-1, 2, 1, 4, 3, 6, 5, -1]
+
+    match = maxMatching(adjacency, start)
+
+    assert pairs(adjacency, match) == 4
+    assert match[0] == 1 and match[7] == 3
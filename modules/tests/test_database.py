@@ -0,0 +1,61 @@
+from random import Random
+
+from classes.graph import MeetingGraph
+from datamgmt.database import loadLocalHistory, storeLocalHistory, clearLocalHistory
+
+
+def contents(graph) -> dict:
+    return {graph.keyOf(a): sorted(graph.alreadyMet(a)) for a in range(len(graph)) if graph.metCount(a) > 0}
+
+def load(dbPath, importPath) -> MeetingGraph:
+    graph = MeetingGraph()
+    loadLocalHistory(graph, dbPath, importPath)
+    return graph
+
+
+def test_stored_weeks_reload(tmp_path):
+    dbPath = str(tmp_path / 'history.db')
+    importPath = str(tmp_path / 'people')
+    rng = Random(7)
+    graph = load(dbPath, importPath)
+
+    for week in range(6):
+        ids = [graph.addPerson(f'P{i}', f'guid-{i}') for i in range(10)]
+        rng.shuffle(ids)
+        for a, b in zip(ids[::2], ids[1::2]):
+            graph.addMeeting(a, b)
+            graph.addMeeting(b, a)
+        if week == 3:
+            graph.resetPerson(ids[0])
+            graph.removeMeeting(ids[1], graph.metIds(ids[1])[0])
+        storeLocalHistory(graph, f'week {week}', dbPath)
+
+        assert contents(load(dbPath, importPath)) == contents(graph)
+
+def test_text_files_are_imported_once_and_moved_to_guids(tmp_path):
+    dbPath = str(tmp_path / 'history.db')
+    importPath = tmp_path / 'people'
+    importPath.mkdir()
+    (importPath / 'Ann.txt').write_text('Bob\nCat\n', encoding='utf-8')
+    (importPath / 'Bob.txt').write_text('Ann\n', encoding='utf-8')
+
+    graph = load(dbPath, str(importPath))
+    assert contents(graph) == {'Ann': ['Bob', 'Cat'], 'Bob': ['Ann']}
+
+    graph.addPerson('Ann', 'guid-ann')
+    storeLocalHistory(graph, 'week 1', dbPath)
+    (importPath / 'Bob.txt').write_text('Ann\nCat\n', encoding='utf-8')
+
+    reloaded = load(dbPath, str(importPath))
+    assert contents(reloaded) == {'guid-ann': ['Bob', 'Cat'], 'Bob': ['Ann']}
+
+def test_clear_forgets_everyone(tmp_path):
+    dbPath = str(tmp_path / 'history.db')
+    importPath = tmp_path / 'people'
+    importPath.mkdir()
+    (importPath / 'Ann.txt').write_text('Bob\n', encoding='utf-8')
+    load(dbPath, str(importPath))
+
+    clearLocalHistory(dbPath)
+
+    assert len(load(dbPath, str(importPath))) == 0
@@ -0,0 +1,43 @@
+import csv
+
+from openpyxl import Workbook
+
+from config import nameColumn, guidColumn, optedOutColumn, excelSheet
+from datamgmt.extract import extractExcel, streamNames
+from support import getNames
+
+rows = [
+    ('A', 'a', False),
+    ('B', 'b', None),
+    ('C', 'c', True),
+    ('D', 'd', False)
+]
+
+
+def writeBook(path) -> str:
+    workbook = Workbook()
+    sheet = workbook.active
+    sheet.title = excelSheet
+    sheet.append([guidColumn, nameColumn, optedOutColumn])
+    for name, guid, optedOut in rows:
+        sheet.append([guid, name, optedOut])
+    workbook.save(path)
+    return str(path)
+
+def test_blank_opted_out_cell_is_opted_out_when_streamed(tmp_path):
+    path = writeBook(tmp_path / 'Data.xlsx')
+
+    streamed = list(streamNames(path, excelSheet))
+
+    assert streamed == [('A', 'a'), ('D', 'd')]
+    assert streamed == getNames(extractExcel(path, excelSheet, cachePath=None))
+
+def test_csv_accepts_only_explicit_false(tmp_path):
+    path = tmp_path / 'Data.csv'
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow([guidColumn, nameColumn, optedOutColumn])
+        for guid, name, optedOut in [('a', 'A', 'FALSE'), ('b', 'B', ''), ('c', 'C', 'True'), ('d', 'D', '0'), ('e', 'E', 'no')]:
+            writer.writerow([guid, name, optedOut])
+
+    assert list(streamNames(str(path))) == [('A', 'a'), ('D', 'd')]
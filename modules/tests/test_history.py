@@ -0,0 +1,102 @@
+from random import Random
+
+import pytest
+
+from classes.errors import BackUpConflict
+from classes.graph import MeetingGraph
+from datamgmt import history
+from datamgmt.history import loadHistory, refreshHistory, appendHistory, compactHistory
+
+
+def contents(graph) -> dict:
+    return {graph.keyOf(a): sorted(graph.alreadyMet(a)) for a in range(len(graph))}
+
+def playWeek(graph, rng, size=12) -> None:
+    """Adds a week of random meetings to graph, with the odd reset and
+    forgotten meeting.
+    """
+
+    ids = [graph.addPerson(f'P{i}', f'guid-{i}' if i % 3 else None) for i in range(size)]
+    rng.shuffle(ids)
+    for a, b in zip(ids[::2], ids[1::2]):
+        graph.addMeeting(a, b)
+        graph.addMeeting(b, a)
+    if rng.random() < 0.3:
+        graph.resetPerson(rng.choice(ids))
+    a = rng.choice(ids)
+    if graph.metCount(a) > 0:
+        graph.removeMeeting(a, graph.metIds(a)[0])
+
+
+@pytest.mark.parametrize('cached', [False, True])
+def test_appended_and_compacted_history_reloads(storage, tmp_path, monkeypatch, cached):
+    monkeypatch.setattr(history, 'SNAPSHOT_INTERVAL', 4)
+    cachePath = str(tmp_path) + '/' if cached else None
+    rng = Random(3)
+    graph = MeetingGraph()
+    loadHistory(graph, cachePath)
+
+    generations = set()
+    for week in range(11):
+        playWeek(graph, rng)
+        appendHistory(graph, f'week {week}', cachePath)
+        generations.add(graph.version['generation'])
+
+        reloaded = MeetingGraph()
+        loadHistory(reloaded, cachePath)
+        assert contents(reloaded) == contents(graph)
+        assert reloaded.version == graph.version
+
+    assert len(generations) > 2
+    assert storage.list(prefix='history/log-') == [f'history/log-{graph.version["generation"]}.ndjson']
+
+def test_refresh_replays_another_runs_weeks(storage):
+    rng = Random(4)
+    graph = MeetingGraph()
+    loadHistory(graph, None)
+    playWeek(graph, rng)
+    compactHistory(graph, 'week 0', None)
+
+    kept = MeetingGraph()
+    loadHistory(kept, None)
+    for week in range(1, 3):
+        playWeek(graph, rng)
+        appendHistory(graph, f'week {week}', None)
+
+    assert refreshHistory(kept, None) is not None
+    assert contents(kept) == contents(graph)
+
+    compactHistory(graph, 'week 3', None)
+    assert refreshHistory(kept, None) is None
+
+def test_stale_append_position_raises(storage):
+    rng = Random(5)
+    graph = MeetingGraph()
+    loadHistory(graph, None)
+    playWeek(graph, rng)
+    compactHistory(graph, 'week 0', None)
+
+    first, second = MeetingGraph(), MeetingGraph()
+    loadHistory(first, None)
+    loadHistory(second, None)
+    playWeek(first, rng)
+    appendHistory(first, 'week 1', None)
+
+    playWeek(second, rng)
+    with pytest.raises(BackUpConflict):
+        appendHistory(second, 'week 1', None)
+
+def test_stale_snapshot_etag_raises(storage):
+    rng = Random(6)
+    graph = MeetingGraph()
+    loadHistory(graph, None)
+    playWeek(graph, rng)
+    compactHistory(graph, 'week 0', None)
+
+    first, second = MeetingGraph(), MeetingGraph()
+    loadHistory(first, None)
+    loadHistory(second, None)
+    compactHistory(first, 'week 1', None)
+
+    with pytest.raises(BackUpConflict):
+        compactHistory(second, 'week 1', None)
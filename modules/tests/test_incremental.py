@@ -0,0 +1,72 @@
+from random import Random
+
+import pytest
+
+from classes.errors import UnmatchedPersons
+from classes.graph import MeetingGraph
+from main import buildClub, blossomMatch, matchWeek
+from matching.blossom import greedyMatching
+from matching.incremental import CandidateIndex, CandidateAdjacency
+
+roster = [(f'P{i}', f'guid-{i}') for i in range(24)]
+
+
+def randomHistory(rng, density) -> MeetingGraph:
+    graph = MeetingGraph()
+    ids = [graph.addPerson(name, guid) for name, guid in roster]
+    for a in ids:
+        for b in ids:
+            if a < b and rng.random() < density:
+                graph.addMeeting(a, b)
+                if rng.random() < 0.9:
+                    graph.addMeeting(b, a)
+    graph.clearChanges()
+    return graph
+
+def blocked(index, graph) -> list:
+    return [sorted(index.blocked(a)) for a in range(len(graph))]
+
+
+@pytest.mark.parametrize('density', [0.1, 0.5, 0.8])
+def test_candidates_give_the_same_pairs_as_a_full_rebuild(density):
+    rng = Random(8)
+    for trial in range(20):
+        graph = randomHistory(rng, density)
+        week = rng.sample(roster, 20)
+
+        full = blossomMatch(buildClub(week, graph.copy()), seed=trial)
+        # As in runMatch, the index is built once buildClub has cleared the
+        # history of anyone who has met everyone available
+        copy = graph.copy()
+        coffeeClub = buildClub(week, copy)
+        incremental = blossomMatch(coffeeClub, seed=trial, candidates=CandidateIndex(copy))
+
+        assert incremental.serialize() == full.serialize()
+
+def test_lazy_greedy_start_matches_greedy_matching():
+    rng = Random(9)
+    for _ in range(20):
+        graph = randomHistory(rng, 0.4)
+        ids = rng.sample(range(len(graph)), 16)
+        adjacency = CandidateAdjacency(CandidateIndex(graph), ids)
+
+        assert adjacency.greedy() == greedyMatching([adjacency[v] for v in range(len(ids))])
+
+def test_updated_index_equals_a_rebuild_week_after_week():
+    rng = Random(10)
+    graph = randomHistory(rng, 0.2)
+    index = CandidateIndex(graph)
+
+    for week in range(25):
+        coffeeClub = buildClub(rng.sample(roster, 18), graph)
+        index.update(graph, graph.changes())
+        try:
+            matchWeek(coffeeClub, 'blossom', seed=week, candidates=index)
+        except UnmatchedPersons:
+            for person in coffeeClub.values():
+                graph.resetPerson(person.id)
+        changes = graph.changes()
+        graph.clearChanges()
+        index.update(graph, changes)
+
+        assert blocked(index, graph) == blocked(CandidateIndex(graph), graph)
@@ -0,0 +1,32 @@
+from classes.pairing import Pairing
+
+
+def assertIndexed(pairing):
+    for index, group in enumerate(pairing):
+        for name in group:
+            assert pairing.isPlaced(name)
+            assert pairing.groupOf(name) == index
+            assert pairing.members(pairing.groupOf(name)) == group
+
+
+def test_index_follows_add_group_and_add_to_group():
+    pairing = Pairing()
+    first = pairing.addGroup('A', 'B')
+    second = pairing.addGroup('C', 'D')
+    pairing.addToGroup(first, 'E')
+
+    assert (first, second) == (0, 1)
+    assert pairing.groups == [('A', 'B', 'E'), ('C', 'D')]
+    assert 'E' in pairing and 'F' not in pairing
+    assert pairing.groupOf('F') is None
+    assert pairing.numTriples() == 1
+    assertIndexed(pairing)
+
+def test_serialize_round_trips():
+    pairing = Pairing([['A', 'B'], ['C', 'D', 'E']])
+
+    again = Pairing(pairing.serialize())
+
+    assert again.serialize() == [['A', 'B'], ['C', 'D', 'E']]
+    assert len(again) == 2
+    assertIndexed(again)
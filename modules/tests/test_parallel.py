@@ -0,0 +1,34 @@
+from random import Random
+
+import pytest
+
+from classes.graph import MeetingGraph
+from matching.parallel import attemptMatch
+
+
+@pytest.mark.parametrize('matcher', ['greedy', 'blossom', 'weighted'])
+def test_fallback_only_records_meetings_within_its_groups(matcher):
+    rng = Random(13)
+    fallbacks = 0
+    for trial in range(150):
+        size = rng.randint(4, 9)
+        names = [(f'P{i}', None) for i in range(size)]
+        graph = MeetingGraph()
+        for name, _ in names:
+            graph.addPerson(name)
+        for a in range(size):
+            for b in range(a + 1, size):
+                if rng.random() < 0.6:
+                    graph.addMeeting(a, b)
+                    graph.addMeeting(b, a)
+        graph.clearChanges()
+
+        groups, meetings, complete, _ = attemptMatch(graph.copy(), names, matcher, trial)
+        if complete:
+            continue
+        fallbacks += 1
+        groupOf = {name: index for index, group in enumerate(groups) for name in group}
+        for name, other in meetings:
+            assert groupOf.get(name) == groupOf.get(other)
+
+    assert fallbacks > 0
@@ -0,0 +1,16 @@
+from random import Random
+
+import pytest
+
+from simulation import simulateTrial
+
+roster = [(f'Person {i}', f'guid-{i}') for i in range(20)]
+
+
+@pytest.mark.parametrize('matcher', ['blossom', 'weighted', 'greedy', 'schedule'])
+def test_same_seed_gives_same_reports(matcher):
+    first = simulateTrial(roster, 30, Random(5), matcher)
+    second = simulateTrial(roster, 30, Random(5), matcher)
+
+    assert len(first) > 0
+    assert first == second
@@ -0,0 +1,119 @@
+import pytest
+
+from classes.errors import ServerError, BackUpConflict
+from datamgmt.storage import MemoryStorage, LocalStorage, WriteBehindStorage, PrefixedStorage
+
+
+@pytest.fixture(params=['memory', 'local', 'prefixed'])
+def backend(request, tmp_path):
+    if request.param == 'memory':
+        return MemoryStorage()
+    if request.param == 'local':
+        return LocalStorage(str(tmp_path))
+    return PrefixedStorage(MemoryStorage(), 'clubs/a')
+
+def run(storage) -> list:
+    """Runs the same operations against storage, returning what each one
+    gave back with the ETags left out.
+    """
+
+    def attempt(func, *args):
+        try:
+            result = func(*args)
+        except (ServerError, BackUpConflict) as e:
+            return type(e).__name__
+        return result.read() if hasattr(result, 'read') else result
+
+    def post(*args):
+        # Where a file was posted depends on the backend
+        return storage.post(*args) is not None
+
+    outcomes = [
+        attempt(storage.exists, 'a/file.json'),
+        attempt(storage.get, 'a/file.json'),
+        attempt(storage.getRange, 'a/log'),
+    ]
+    etag = storage.put('a/file.json', b'one')
+    outcomes += [
+        attempt(storage.exists, 'a/file.json'),
+        attempt(storage.get, 'a/file.json'),
+        attempt(storage.put, 'a/file.json', b'two', None),
+        attempt(storage.put, 'a/file.json', b'two', '"stale"'),
+        storage.getIfChanged('a/file.json', etag)[0],
+    ]
+    etag = storage.put('a/file.json', 'two', etag)
+    outcomes += [
+        storage.getIfChanged('a/file.json', None)[0].read(),
+        attempt(post, 'b.csv', b'x'),
+        attempt(post, 'b.csv', b'y'),
+        attempt(post, 'b.csv', b'z', True),
+        attempt(storage.get, 'b.csv'),
+        attempt(storage.append, 'a/log', b'12', 0),
+        attempt(storage.append, 'a/log', b'34', 2),
+        attempt(storage.append, 'a/log', b'56', 2),
+        attempt(storage.getRange, 'a/log', 1),
+        attempt(storage.seal, 'a/log', 3),
+        attempt(storage.seal, 'a/log', 4),
+        attempt(storage.append, 'a/log', b'56', 4),
+        attempt(storage.list, 'a/'),
+        attempt(storage.list, None),
+    ]
+    storage.delete('a/file.json')
+    storage.delete('missing')
+    outcomes += [
+        attempt(storage.exists, 'a/file.json'),
+        attempt(storage.list, None),
+    ]
+    return outcomes
+
+
+def test_backends_agree(backend):
+    outcomes = run(backend)
+
+    assert outcomes == run(MemoryStorage())
+    assert outcomes[:3] == [False, 'ServerError', None]
+    assert outcomes[5:8] == ['BackUpConflict', 'BackUpConflict', None]
+
+def test_write_behind_holds_writes_until_flush():
+    backend = MemoryStorage()
+    backend.append('log', b'ab', 0)
+    backend.post('old.csv', b'old')
+    storage = WriteBehindStorage(backend)
+
+    etag = storage.put('snapshot', b'one')
+    storage.put('snapshot', b'two', etag)
+    storage.append('log', b'cd', 2)
+    storage.append('log', b'ef', 4)
+    storage.post('report.csv', b'x')
+    storage.seal('log', 6)
+    storage.delete('old.csv')
+
+    assert storage.getRange('log') == b'abcdef'
+    assert not backend.exists('snapshot')
+    assert backend.getRange('log') == b'ab'
+    assert not storage.exists('old.csv') and backend.exists('old.csv')
+    assert [operation for operation, _, _ in storage.pending] == ['put', 'put', 'append', 'post', 'seal', 'delete']
+
+    storage.flush()
+
+    assert storage.pending == []
+    assert backend.get('snapshot').read() == b'two'
+    assert backend.getRange('log') == b'abcdef'
+    assert backend.get('report.csv').read() == b'x'
+    assert not backend.exists('old.csv')
+    with pytest.raises(BackUpConflict):
+        backend.append('log', b'gh', 6)
+
+def test_write_behind_conflict_is_raised_by_flush_and_kept():
+    backend = MemoryStorage()
+    backend.put('snapshot', b'one')
+    storage = WriteBehindStorage(backend)
+
+    _, etag = storage.getIfChanged('snapshot')
+    storage.put('snapshot', b'mine', etag)
+    backend.put('snapshot', b'theirs', backend.getIfChanged('snapshot')[1])
+
+    with pytest.raises(BackUpConflict):
+        storage.flush()
+    assert len(storage.pending) == 1
+    assert backend.get('snapshot').read() == b'theirs'